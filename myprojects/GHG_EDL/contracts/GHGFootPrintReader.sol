@@ -0,0 +1,121 @@
+// SPDX-License-Identifier: MIT
+
+// Read-only aggregator for ProductGHGFootPrint contracts.
+
+// Verifying a supply chain reads the GHG Footprints and the total GHG emissions of
+// every ProductGHGFootPrint contract in the chain. Reading them one contract at a time
+// costs one eth_call per function per contract.
+// This contract reads a list of ProductGHGFootPrint contracts in a single eth_call.
+// It has no state and is never sent a transaction; the Python client
+// (scripts/footprint_reader.py) splits long lists into chunks so that each call stays
+// under the node's gas limit for calls.
+
+// Licensed under MIT License
+
+pragma solidity ^0.8.0;
+
+import "./ProductGHGFootPrint.sol";
+
+contract GHGFootPrintReader {
+    // Data structure for the total GHG emissions of a product or service
+    // with the same fields as returned by ProductGHGFootPrint.get_total_ghg()
+
+    struct total_struct {
+        uint32 total_GHGFootPrint;
+        uint256 commitment_x;
+        bool commitment_y_odd;
+        uint256 r;
+        uint256 r_overflow;
+    }
+
+    // Function to get the GHG Footprints of each ProductGHGFootPrint contract in a list
+    // Anybody can use this function
+
+    function get_ghgfootprints(
+        address[] memory _products
+    )
+        public
+        view
+        returns (ProductGHGFootPrint.GHGFootPrint_struct[][] memory)
+    {
+        ProductGHGFootPrint.GHGFootPrint_struct[][]
+            memory footprints = new ProductGHGFootPrint.GHGFootPrint_struct[][](
+                _products.length
+            );
+        for (uint i = 0; i < _products.length; i++) {
+            footprints[i] = ProductGHGFootPrint(_products[i]).get_ghgfootprints();
+        }
+        return footprints;
+    }
+
+    // Function to get selected GHG Footprints of each ProductGHGFootPrint contract in a list
+    // _GHGFootPrint_IDs[i] are the GHG Footprint IDs to read from _products[i],
+    // an empty list of IDs reads all the GHG Footprints of the contract
+    // Anybody can use this function
+
+    function get_ghgfootprints_by_ids(
+        address[] memory _products,
+        uint16[][] memory _GHGFootPrint_IDs
+    )
+        public
+        view
+        returns (ProductGHGFootPrint.GHGFootPrint_struct[][] memory)
+    {
+        require(
+            _products.length == _GHGFootPrint_IDs.length,
+            "One list of GHG Footprint IDs is needed for each product"
+        );
+        ProductGHGFootPrint.GHGFootPrint_struct[][]
+            memory footprints = new ProductGHGFootPrint.GHGFootPrint_struct[][](
+                _products.length
+            );
+        for (uint i = 0; i < _products.length; i++) {
+            if (_GHGFootPrint_IDs[i].length == 0) {
+                footprints[i] = ProductGHGFootPrint(_products[i])
+                    .get_ghgfootprints();
+            } else {
+                footprints[i] = ProductGHGFootPrint(_products[i])
+                    .get_ghgfootprints_by_ids(_GHGFootPrint_IDs[i]);
+            }
+        }
+        return footprints;
+    }
+
+    // Function to get the total GHG emissions of each ProductGHGFootPrint contract in a list
+    // Anybody can use this function
+
+    function get_total_ghgs(
+        address[] memory _products
+    ) public view returns (total_struct[] memory) {
+        total_struct[] memory totals = new total_struct[](_products.length);
+        for (uint i = 0; i < _products.length; i++) {
+            total_struct memory total;
+            (
+                total.total_GHGFootPrint,
+                total.commitment_x,
+                total.commitment_y_odd,
+                total.r,
+                total.r_overflow
+            ) = ProductGHGFootPrint(_products[i]).get_total_ghg();
+            totals[i] = total;
+        }
+        return totals;
+    }
+
+    // Function to get the GHG Footprints and the total GHG emissions of each
+    // ProductGHGFootPrint contract in a list in one call
+    // Anybody can use this function
+
+    function get_products(
+        address[] memory _products
+    )
+        public
+        view
+        returns (
+            ProductGHGFootPrint.GHGFootPrint_struct[][] memory,
+            total_struct[] memory
+        )
+    {
+        return (get_ghgfootprints(_products), get_total_ghgs(_products));
+    }
+}
@@ -55,28 +55,74 @@ contract ProductGHGFootPrint {
     // GHG data from the supplier can be linked to the suppliers smart contract using
     // the contract address and the GHG Footprint ID
     // The GHG Footprint is stored as a Pedersen Commitment
+    // The fields up to GHGFootPrint_contract are packed into one storage slot (29 bytes).
+    // The commitment is stored compressed: commitment_x and commitment_y_odd are the
+    // 33 bytes of the compressed point. The category is a code, the lookup table of the
+    // codes is CATEGORIES in scripts/footprint_codec.py.
+    // The same structure is used to add GHG Footprints with set_ghgfootprints
 
     struct GHGFootPrint_struct {
         uint16 GHGFootPrint_ID; // unique ID for the GHG Footprint in this smart contract
-        uint16 GHGFootPrint_scope;
+        uint8 GHGFootPrint_scope; // 1, 2 or 3
         uint8 GHGFootPrint_disaggregation; // 0 = no disaggregation, 1+ = specific disaggregation
-        string GHGFootPrint_category; // description of category (e.g. )
+        uint16 GHGFootPrint_category; // category code (e.g. 1 = 'Gross Scope 1 greenhouse gas emissions')
+        uint16 GHGFootPrint_no_units; // number of units used in the product 0 for no units
+        bool GHGFootPrint_commitment_y_odd; // y of the commitment point is odd
         // Data given where data is stored in the suppliers contract
         address GHGFootPrint_contract; // Address of the suppliers contract
+        // Data given for all GHG Footprints
+        uint256 GHGFootPrint_commitment_x; // x of the commitment point
         uint16[] contract_GHGFootPrint_IDs; // array of GHG Footprint IDs in the suppliers contract
         // that should be included in this contract. 0 for no contract GHGFootPrint IDs
         bytes GHGFootPrint_signature; // signature of assurer of the GHG Footprint
-        uint16 GHGFootPrint_no_units; // number of units used in the product 0 for no units
-        // Data given for all GHG Footprints
-        commitment GHGFootPrint_commitment;
     }
 
+    // Events - emitted when the owner changes the data so that indexers can follow the
+    // changes with eth_getLogs instead of reading every contract
+
+    event DescriptionSet(
+        address indexed owner,
+        string owner_name,
+        string productID,
+        string product_name,
+        string status
+    );
+
+    event GHGFootPrintSet(
+        uint16 indexed GHGFootPrint_ID,
+        address indexed GHGFootPrint_contract, // linked suppliers contract, 0 if not linked
+        GHGFootPrint_struct footprint
+    );
+
+    event TotalGHGSet(
+        uint32 total_GHGFootPrint,
+        uint256 commitment_x,
+        bool commitment_y_odd,
+        uint256 r,
+        uint256 r_overflow
+    );
+
     // Constructor function
     // The owner of the smart contract is set to the address of the sender
     // The description of the product or service is initialized and total GHG emissions are set to 0
 
     constructor() {
-        owner = msg.sender;
+        set_owner(msg.sender);
+    }
+
+    // Initializer function for clones deployed by ProductGHGFootPrintFactory
+    // A clone runs the code of a deployed ProductGHGFootPrint contract with its own storage
+    // and no constructor, so the factory sets the owner with this function when it creates the clone
+    // It can only be used once - contracts deployed with the constructor already have an owner
+
+    function initialize(address _owner) public {
+        require(owner == address(0), "Contract is already initialized");
+        require(_owner != address(0), "Owner cannot be the zero address");
+        set_owner(_owner);
+    }
+
+    function set_owner(address _owner) internal {
+        owner = _owner;
         description.owner = owner; // owner of the smart contract i.e. entity that produces the product or service
         // initialize the description
         description.total_GHGFootPrint = 0;
@@ -90,6 +136,7 @@ contract ProductGHGFootPrint {
 
     description_struct private description; // description of the product or service
     GHGFootPrint_struct[] private GHGFootPrints; // array of GHG Footprints
+    mapping(uint16 => uint256) private GHGFootPrint_index; // index + 1 in GHGFootPrints of each GHG Footprint ID, 0 if not stored
     address public owner; // owner of the smart contract which is public
 
     //functions
@@ -119,6 +166,13 @@ contract ProductGHGFootPrint {
         description.status = _status;
         description.ancestor = _ancestor;
         description.descendant = _descendant;
+        emit DescriptionSet(
+            owner,
+            description.owner_name,
+            description.productID,
+            description.product_name,
+            description.status
+        );
         return true;
     }
 
@@ -181,6 +235,13 @@ contract ProductGHGFootPrint {
         description
             .total_GHGFootPrint_commitment
             .r_overflow = _total_GHGFootPrint_r_overflow;
+        emit TotalGHGSet(
+            _total_GHGFootPrint,
+            _total_GHGFootPrint_commitment_x,
+            _total_GHGFootPrint_commitment_y_odd,
+            _total_GHGFootPrint_r,
+            _total_GHGFootPrint_r_overflow
+        );
 
         return true;
     }
@@ -207,52 +268,71 @@ contract ProductGHGFootPrint {
 
     function set_ghgfootprint(
         uint16 _GHGFootPrint_ID,
-        uint16 _GHGFootPrint_scope,
+        uint8 _GHGFootPrint_scope,
         uint8 _GHGFootPrint_disaggregation,
-        string memory _GHGFootPrint_category,
+        uint16 _GHGFootPrint_category,
+        uint16 _GHGFootPrint_no_units,
+        bool _GHGFootPrint_commitment_y_odd,
         address _GHGFootPrint_contract,
+        uint256 _GHGFootPrint_commitment_x,
         uint16[] memory _contract_GHGFootPrint_IDs,
-        bytes memory _GHGFootPrint_signature,
-        uint16 _GHGFootPrint_no_units,
-        uint256 _GHGFootPrint_commitment,
-        bool _GHGFootPrint_commitment_y_odd
+        bytes memory _GHGFootPrint_signature
     ) public returns (bool) {
         require(msg.sender == owner, "Only the owner can add GHG Footprints");
-        require(
-            _GHGFootPrint_scope == 1 ||
-                _GHGFootPrint_scope == 2 ||
-                _GHGFootPrint_scope == 3,
-            "Scope must be 1, 2 or 3"
-        );
-        // Check if the GHG Footprint ID already exists
-        for (uint i = 0; i < GHGFootPrints.length; i++) {
-            require(
-                GHGFootPrints[i].GHGFootPrint_ID != _GHGFootPrint_ID,
-                "GHG Footprint ID already exists"
-            );
-        }
-        // Add GHG Footprint to the array
-        GHGFootPrints.push(
+        add_ghgfootprint(
             GHGFootPrint_struct({
                 GHGFootPrint_ID: _GHGFootPrint_ID,
                 GHGFootPrint_scope: _GHGFootPrint_scope,
                 GHGFootPrint_disaggregation: _GHGFootPrint_disaggregation,
                 GHGFootPrint_category: _GHGFootPrint_category,
+                GHGFootPrint_no_units: _GHGFootPrint_no_units,
+                GHGFootPrint_commitment_y_odd: _GHGFootPrint_commitment_y_odd,
                 GHGFootPrint_contract: _GHGFootPrint_contract,
+                GHGFootPrint_commitment_x: _GHGFootPrint_commitment_x,
                 contract_GHGFootPrint_IDs: _contract_GHGFootPrint_IDs,
-                GHGFootPrint_signature: _GHGFootPrint_signature,
-                GHGFootPrint_no_units: _GHGFootPrint_no_units,
-                GHGFootPrint_commitment: commitment({
-                    commitment_x: _GHGFootPrint_commitment,
-                    commitment_y_odd: _GHGFootPrint_commitment_y_odd,
-                    r: 0,
-                    r_overflow: 0
-                })
+                GHGFootPrint_signature: _GHGFootPrint_signature
             })
         );
         return true;
     }
 
+    // Function to set many GHG Footprints for the product or service in one transaction
+    // Each GHG Footprint is checked and stored in the same way as by set_ghgfootprint
+
+    function set_ghgfootprints(
+        GHGFootPrint_struct[] memory _GHGFootPrints
+    ) public returns (bool) {
+        require(msg.sender == owner, "Only the owner can add GHG Footprints");
+        for (uint i = 0; i < _GHGFootPrints.length; i++) {
+            add_ghgfootprint(_GHGFootPrints[i]);
+        }
+        return true;
+    }
+
+    // Internal function that checks a GHG Footprint and adds it to the array
+
+    function add_ghgfootprint(GHGFootPrint_struct memory _footprint) internal {
+        require(
+            _footprint.GHGFootPrint_scope == 1 ||
+                _footprint.GHGFootPrint_scope == 2 ||
+                _footprint.GHGFootPrint_scope == 3,
+            "Scope must be 1, 2 or 3"
+        );
+        // Check if the GHG Footprint ID already exists
+        require(
+            GHGFootPrint_index[_footprint.GHGFootPrint_ID] == 0,
+            "GHG Footprint ID already exists"
+        );
+        // Add GHG Footprint to the array
+        GHGFootPrints.push(_footprint);
+        GHGFootPrint_index[_footprint.GHGFootPrint_ID] = GHGFootPrints.length;
+        emit GHGFootPrintSet(
+            _footprint.GHGFootPrint_ID,
+            _footprint.GHGFootPrint_contract,
+            _footprint
+        );
+    }
+
     // Function to get all the GHG Footprints for the product or service
     // using the GHG Footprint ID
     // Anybody can use this function
@@ -264,4 +344,32 @@ contract ProductGHGFootPrint {
     {
         return GHGFootPrints;
     }
+
+    // Function to get the GHG Footprints with the given GHG Footprint IDs
+    // e.g. the IDs that a linked contract includes in its own GHG Footprint
+    // IDs that are not stored are left out of the result
+    // Anybody can use this function
+
+    function get_ghgfootprints_by_ids(
+        uint16[] memory _GHGFootPrint_IDs
+    ) public view returns (GHGFootPrint_struct[] memory) {
+        uint found = 0;
+        for (uint i = 0; i < _GHGFootPrint_IDs.length; i++) {
+            if (GHGFootPrint_index[_GHGFootPrint_IDs[i]] != 0) {
+                found++;
+            }
+        }
+        GHGFootPrint_struct[] memory footprints = new GHGFootPrint_struct[](
+            found
+        );
+        found = 0;
+        for (uint i = 0; i < _GHGFootPrint_IDs.length; i++) {
+            uint index = GHGFootPrint_index[_GHGFootPrint_IDs[i]];
+            if (index != 0) {
+                footprints[found] = GHGFootPrints[index - 1];
+                found++;
+            }
+        }
+        return footprints;
+    }
 }
@@ -0,0 +1,78 @@
+// SPDX-License-Identifier: MIT
+
+// Factory for ProductGHGFootPrint contracts.
+
+// Deploying a ProductGHGFootPrint contract for every product stores the full contract code
+// on the blockchain once per product. The factory instead deploys EIP-1167 minimal proxy
+// clones of one deployed ProductGHGFootPrint contract (the implementation). A clone is 45 bytes
+// of code that delegates every call to the implementation and keeps its own storage, so
+// creating a product costs about as much as initializing the owner.
+// Many products can be created in one transaction; the address of each product is emitted in
+// a ProductCreated event so the deploying script can map the products to its data.
+
+// Licensed under MIT License
+
+pragma solidity ^0.8.0;
+
+import "./ProductGHGFootPrint.sol";
+
+contract ProductGHGFootPrintFactory {
+    address public implementation; // ProductGHGFootPrint contract that the clones delegate to
+
+    // Emitted for each product created, index is the position of the product in the
+    // list of owners given to create_products (0 for create_product)
+    event ProductCreated(
+        address indexed owner,
+        address product,
+        uint256 index
+    );
+
+    constructor(address _implementation) {
+        implementation = _implementation;
+    }
+
+    // Function to create one product contract owned by _owner
+    // Anybody can use this function
+
+    function create_product(address _owner) public returns (address) {
+        address product = clone();
+        ProductGHGFootPrint(product).initialize(_owner);
+        emit ProductCreated(_owner, product, 0);
+        return product;
+    }
+
+    // Function to create one product contract for each owner in a list
+    // Anybody can use this function
+
+    function create_products(
+        address[] memory _owners
+    ) public returns (address[] memory) {
+        address[] memory products = new address[](_owners.length);
+        for (uint i = 0; i < _owners.length; i++) {
+            products[i] = clone();
+            ProductGHGFootPrint(products[i]).initialize(_owners[i]);
+            emit ProductCreated(_owners[i], products[i], i);
+        }
+        return products;
+    }
+
+    // Deploys an EIP-1167 minimal proxy of the implementation
+
+    function clone() internal returns (address product) {
+        address target = implementation;
+        assembly {
+            let ptr := mload(0x40)
+            mstore(
+                ptr,
+                0x3d602d80600a3d3981f3363d3d373d3d3d363d73000000000000000000000000
+            )
+            mstore(add(ptr, 0x14), shl(0x60, target))
+            mstore(
+                add(ptr, 0x28),
+                0x5af43d82803e903d91602b57fd5bf30000000000000000000000000000000000
+            )
+            product := create(0, ptr, 0x37)
+        }
+        require(product != address(0), "Product clone could not be created");
+    }
+}
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+# End-to-end benchmark of the stages of deploy.py on synthetic supply chains
+#
+# For each size in SIZES a supply chain is generated with supply_chain_generator.py and
+# loaded into the `data` dictionary that deploy.py works on, then each stage of
+# deploy.main() is timed: commit, deploy, upload, sum_up_footprints,
+# user_sum_up_commitments and verify. The totals are calculated and verified for every
+# final product (products no other product links to). rollup_all times the totals of
+# every product (not only the final ones) in one topological pass.
+# The timings are printed and appended as one JSON line per size to RESULTS_FILE so runs
+# can be compared to find regressions.
+#
+# Run with: brownie run scripts/benchmark.py
+# or, to time the commitments with a pool of 4 worker processes:
+#     brownie run scripts/benchmark.py main 4
+
+import sys
+import json
+import time
+
+# add scripts dir to path to allow deploy.py and its modules to be imported
+sys.path.append("/code/myprojects/GHG_EDL/scripts")
+
+import deploy
+from footprint import data  # the data dictionary used by deploy.py
+from supply_chain_generator import generate_supply_chain, final_products
+from rollup import SupplyChainRollup, product_total
+from tx_pipeline import TransactionPipeline
+from brownie import web3  # type: ignore
+
+SIZES = [
+    dict(
+        companies=3,
+        products_per_company=1,
+        footprints_per_product=7,
+        fan_out=1,
+        depth=2,
+    ),
+    dict(
+        companies=10,
+        products_per_company=2,
+        footprints_per_product=10,
+        fan_out=2,
+        depth=3,
+    ),
+    dict(
+        companies=30,
+        products_per_company=3,
+        footprints_per_product=20,
+        fan_out=3,
+        depth=4,
+    ),
+]
+
+RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def count_footprints(data):
+    """Returns the number of products, footprints and linked footprints in the data."""
+    products = footprints = links = 0
+    for company in data:
+        for product in data[company]:
+            if "Product" in product:
+                products += 1
+                for footprint in data[company][product]["GHG_Footprints"]:
+                    footprints += 1
+                    links += "GHGFootprint_linked_product" in footprint
+    return products, footprints, links
+
+
+def run_size(p, size, seed=1234567890, processes=0):
+    """
+    Generates a supply chain, runs every stage on it and times the stages.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        size (dict): generate_supply_chain arguments.
+        seed (int, optional): Seed of the supply chain. Defaults to 1234567890.
+        processes (int, optional): Worker processes for the commitments, 0 commits in this
+                                   process with create_commitments. Defaults to 0.
+
+    Returns:
+        dict: The size, the counts, the seconds per stage and whether every total verified.
+    """
+    data.clear()
+    data.update(generate_supply_chain(seed=seed, **size))
+    del deploy.user_commitments_tree[:]
+    del deploy.company_commitments_tree[:]
+    products, footprints, links = count_footprints(data)
+    roots = final_products(data)
+    timings = {}
+
+    start = time.perf_counter()
+    if processes > 0:
+        deploy.create_commitments_parallel(p, max_workers=processes)
+    else:
+        deploy.create_commitments(p)
+    timings["commit"] = time.perf_counter() - start
+
+    pipeline = TransactionPipeline(web3)
+    start = time.perf_counter()
+    deploy.deploy_products_with_factory(pipeline)
+    timings["deploy"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    deploy.upload_footprints_pipelined(pipeline)
+    timings["upload"] = time.perf_counter() - start
+    pipeline.close()
+
+    start = time.perf_counter()
+    totals = [
+        deploy.sum_up_footprints(p, data[company][product]["GHG_Footprints"])
+        for company, product in roots
+    ]
+    timings["sum_up_footprints"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rollup_totals = SupplyChainRollup(p, data).rollup_all()
+    timings["rollup_all"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    commitments = [
+        deploy.user_sum_up_commitments(p, data[company][product]["productghgfootprint"])
+        for company, product in roots
+    ]
+    timings["user_sum_up_commitments"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verified = all(
+        p.verify(commitment, sum(total[:3]), sum(total[6:]))
+        and product_total(p, rollup_totals[root]) == product_total(p, total)
+        for root, commitment, total in zip(roots, commitments, totals)
+    )
+    timings["verify"] = time.perf_counter() - start
+
+    return {
+        "size": size,
+        "products": products,
+        "footprints": footprints,
+        "links": links,
+        "final_products": len(roots),
+        "commit_processes": processes,
+        "seconds": timings,
+        "verified": verified,
+    }
+
+
+def main(processes=0):
+    # processes > 0 times create_commitments_parallel with that many worker processes,
+    # e.g. brownie run scripts/benchmark.py main 4
+    processes = int(processes)  # brownie run passes the arguments as strings
+    p = deploy.Ped_scheme()
+    results = []
+    for size in SIZES:
+        print("Benchmarking", size)
+        result = run_size(p, size, processes=processes)
+        results.append(result)
+        with open(RESULTS_FILE, "a") as results_file:
+            results_file.write(json.dumps(result) + "\n")
+
+    stages = list(results[0]["seconds"])
+    print("\n" + "products footprints links " + " ".join(stages) + " verified")
+    for result in results:
+        print(
+            result["products"],
+            result["footprints"],
+            result["links"],
+            " ".join("%.3f" % result["seconds"][stage] for stage in stages),
+            result["verified"],
+        )
+    print("Results appended to", RESULTS_FILE)
@@ -0,0 +1,239 @@
+# Verification of the commitments in a supply chain of ProductGHGFootPrint contracts
+#
+# A product contract can link to GHG Footprint IDs in its suppliers' contracts, which can
+# link to their own suppliers and so on. A supplier used by many intermediate products is
+# reached once per path through the chain, so walking the links recursively fetches and
+# decompresses it again on every path - exponential for diamond shaped supply chains.
+# The verifier first discovers the graph of linked contracts, caching the contract handles
+# per address and the footprints per (contract, linked GHG Footprint IDs) node, then sums
+# the commitments in topological order, calculating the partial sum of each node only once.
+# A node with linked IDs is read with get_ghgfootprints_by_ids, so only the rows being
+# summed are transferred.
+# The graph is discovered breadth first and the footprint arrays of all contracts in one
+# frontier are fetched concurrently, so the node round-trips cost depth x RTT instead of
+# number of contracts x RTT. With a FootprintReader (GHGFootPrintReader contract) each
+# frontier is read with one eth_call per chunk of contracts instead.
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pedersen import accumulate_commitments
+from footprint_codec import COMMITMENT_X, COMMITMENT_Y_ODD, CONTRACT, ID, LINKED_IDS
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def parse_footprint(footprint):
+    """Extracts the fields used for verification from a get_ghgfootprints() entry.
+
+    Args:
+        footprint (tuple): GHGFootPrint_struct as returned by the contract
+
+    Returns:
+        tuple: (GHG Footprint ID, linked contract address or None,
+                tuple of linked GHG Footprint IDs, compressed commitment (x, y odd))
+    """
+    linked_contract = str(footprint[CONTRACT])
+    if linked_contract == ZERO_ADDRESS:
+        linked_contract = None
+    return (
+        footprint[ID],
+        linked_contract,
+        tuple(footprint[LINKED_IDS]),
+        (footprint[COMMITMENT_X], footprint[COMMITMENT_Y_ODD]),
+    )
+
+
+class SupplyChainVerifier:
+    """Sums the commitments of a product contract and all the supplier contracts it links to.
+
+    A node of the supply chain graph is a (contract address, linked GHG Footprint IDs)
+    pair. An empty set of IDs selects every footprint of the contract. A selected
+    footprint that is itself linked is followed to its supplier.
+    """
+
+    def __init__(self, p, contract_at, log=None, max_workers=8, reader=None):
+        """
+        Args:
+            p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+            contract_at (callable): returns the contract handle for an address,
+                                    e.g. ProductGHGFootPrint.at
+            log (list, optional): list that the contract, GHG Footprint ID and commitment
+                                  of every summed footprint is appended to.
+            max_workers (int, optional): maximum number of concurrent contract reads.
+                                         Defaults to 8, 1 reads the contracts one by one.
+            reader (FootprintReader, optional): bulk reader used to fetch the footprint arrays
+                                                of a frontier in a few calls.
+        """
+        self.p = p
+        self.contract_at = contract_at
+        self.log = log
+        self.max_workers = max_workers
+        self.reader = reader
+        self.contracts = {}  # contract handle per address
+        self.footprints = {}  # parsed selected footprints per node
+        self.partial_sums = {}  # commitment per (address, frozenset of IDs) node
+
+    def contract(self, address):
+        """Returns the (cached) contract handle for an address."""
+        if address not in self.contracts:
+            self.contracts[address] = self.contract_at(address)
+        return self.contracts[address]
+
+    def fetch(self, node):
+        """Reads the contract handle and parsed selected footprints of a node from the node.
+
+        Args:
+            node (tuple): (address, frozenset of IDs) node
+
+        Returns:
+            tuple: (contract handle, parsed footprints)
+        """
+        address, ids = node
+        contract = self.contracts.get(address)
+        if contract is None:
+            contract = self.contract_at(address)
+        if len(ids) == 0:
+            footprints = contract.get_ghgfootprints()
+        else:
+            footprints = contract.get_ghgfootprints_by_ids(sorted(ids))
+        return contract, [parse_footprint(footprint) for footprint in footprints]
+
+    def prefetch(self, nodes):
+        """Fetches the selected footprints of several nodes concurrently.
+
+        Args:
+            nodes (list): (address, frozenset of IDs) nodes, already cached nodes are skipped
+        """
+        missing = [node for node in dict.fromkeys(nodes) if node not in self.footprints]
+        if self.reader is not None and len(missing) > 0:
+            for node, footprints in self.reader.get_ghgfootprints_by_ids(
+                missing
+            ).items():
+                self.footprints[node] = [
+                    parse_footprint(footprint) for footprint in footprints
+                ]
+            return
+        if self.max_workers > 1 and len(missing) > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(missing))
+            ) as executor:
+                results = list(executor.map(self.fetch, missing))
+        else:
+            results = [self.fetch(node) for node in missing]
+        for node, (contract, footprints) in zip(missing, results):
+            self.contracts[node[0]] = contract
+            self.footprints[node] = footprints
+
+    def get_footprints(self, node):
+        """Returns the (cached) parsed selected footprints of a node."""
+        if node not in self.footprints:
+            self.prefetch([node])
+        return self.footprints[node]
+
+    def discover(self, root):
+        """Fetches every node reachable from a node, one frontier at a time.
+
+        Args:
+            root (tuple): (address, frozenset of IDs) node to start from
+        """
+        seen = {root}
+        frontier = [root]
+        while frontier:
+            self.prefetch(frontier)
+            next_frontier = []
+            for node in frontier:
+                for child in self.dependencies(node):
+                    if child not in seen:
+                        seen.add(child)
+                        next_frontier.append(child)
+            frontier = next_frontier
+
+    def dependencies(self, node):
+        """Returns the nodes a node links to, once per selected linked footprint."""
+        ids = node[1]
+        return [
+            (linked_contract, frozenset(linked_ids))
+            for fp_id, linked_contract, linked_ids, _ in self.get_footprints(node)
+            if linked_contract is not None and (len(ids) == 0 or fp_id in ids)
+        ]
+
+    def topological_order(self, root):
+        """Discovers the graph below a node and orders it so that suppliers come first.
+
+        Args:
+            root (tuple): (address, frozenset of IDs) node to start from
+
+        Returns:
+            list: nodes without a cached partial sum, every node after all of its dependencies
+
+        Raises:
+            ValueError: If the linked contracts contain a cycle.
+        """
+        order = []
+        state = {}  # 1 = on the current path, 2 = finished
+        stack = [(root, iter(self.dependencies(root)))]
+        state[root] = 1
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                state[node] = 2
+                order.append(node)
+            elif child in self.partial_sums or state.get(child) == 2:
+                continue
+            elif state.get(child) == 1:
+                path = [entry[0][0] for entry in stack]
+                raise ValueError(
+                    "Cycle in linked contracts: "
+                    + " -> ".join(path[path.index(child[0]) :] + [child[0]])
+                )
+            else:
+                state[child] = 1
+                stack.append((child, iter(self.dependencies(child))))
+        return order
+
+    def node_sum(self, node):
+        """Sums the commitments of one node, its dependencies must already be summed."""
+        address, ids = node
+        total = 0
+        selected = []
+        for fp_id, linked_contract, linked_ids, commitment in self.get_footprints(node):
+            if len(ids) > 0 and fp_id not in ids:
+                continue
+            if linked_contract is not None:
+                total = accumulate_commitments(
+                    total, self.partial_sums[(linked_contract, frozenset(linked_ids))]
+                )
+            else:
+                selected.append((fp_id, commitment))
+        points = self.p.uncompress_many([commitment for _, commitment in selected])
+        for (fp_id, _), point in zip(selected, points):
+            if self.log is not None:
+                self.log.append("Contract: " + str(address) + " fp_id:" + str(fp_id))
+                self.log.append(point)
+        return accumulate_commitments(total, *points)
+
+    def sum_commitments(self, contract, linked_fp_ids=()):
+        """Sums the commitments of a contract and its linked supplier contracts.
+
+        Args:
+            contract (ProjectContract or str): contract instance or address
+            linked_fp_ids (list, optional): GHG Footprint IDs to include. Defaults to all.
+
+        Returns:
+            point or int: the total commitment, 0 if there are no commitments
+
+        Raises:
+            ValueError: If the linked contracts contain a cycle.
+        """
+        address = str(getattr(contract, "address", contract))
+        if not isinstance(contract, str):
+            self.contracts.setdefault(address, contract)
+        root = (address, frozenset(linked_fp_ids))
+        if root in self.partial_sums:
+            return self.partial_sums[root]
+        self.discover(root)
+        for node in self.topological_order(root):
+            self.partial_sums[node] = self.node_sum(node)
+        return self.partial_sums[root]
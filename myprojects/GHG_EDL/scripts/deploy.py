@@ -1,7 +1,12 @@
 #!/usr/bin/python3
 
-from brownie.network.contract import ProjectContract  # type: ignore
-from brownie import accounts, ProductGHGFootPrint  # type: ignore
+from brownie import (  # type: ignore
+    accounts,
+    web3,
+    ProductGHGFootPrint,
+    ProductGHGFootPrintFactory,
+)
+from eth_utils import event_abi_to_log_topic
 
 import sys
 
@@ -9,14 +14,32 @@ import sys
 sys.path.append("/code/myprojects/GHG_EDL/scripts")
 
 from footprint import data  # import data from footprint.py stored in a data dictionary
-import tinyec.ec as tiny
+from pedersen import (
+    Ped_scheme,
+    accumulate_commitments,
+)  # Pedersen commitment scheme
+from tx_pipeline import TransactionPipeline
+from footprint_codec import encode_footprint
+from rollup import SupplyChainRollup, product_total
+from footprint_stream import (
+    commit_chunks,
+    commit_footprints,
+    product_chunks,
+    product_keys,
+    read_footprints,
+    sidecar_path,
+    sidecar_supply_chain,
+    write_committed,
+)
 import secrets
 import random
-import json
-import pprint
-from nummaster.basic import sqrtmod
 from operator import add
-import pandas as pd
+
+# Modules only needed by some of the functions below are imported by those functions
+# on first use, so a script that only commits, uploads or verifies does not pay for the
+# others at startup: pandas (print_smart_contract), the process pool
+# (create_commitments_parallel) and the supply chain verifier (user_sum_up_commitments).
+# Measure the startup time of the entry points with startup_benchmark.py.
 
 random.seed(
     1234567890
@@ -35,115 +58,6 @@ def reassamble_64bit_number(number1, number2):
     return number1 << 32 | number2
 
 
-# Utility functions to compress and decompress points on
-# an Elliptic curve
-# from https://cryptobook.nakov.com/asymmetric-key-ciphers/elliptic-curve-cryptography-ecc
-
-
-def uncompress_point(compressed_point, p, a, b):
-    """
-    Uncompresses an elliptic curve point from its compressed form.
-    Args:
-        compressed_point (tuple): A tuple (x, is_odd) where x is the x-coordinate of the point
-                                  and is_odd is a boolean indicating if the y-coordinate is odd.
-        p (int): The prime modulus of the finite field.
-        a (int): The coefficient 'a' in the elliptic curve equation y^2 = x^3 + ax + b.
-        b (int): The coefficient 'b' in the elliptic curve equation y^2 = x^3 + ax + b.
-    Returns:
-        tuple: The uncompressed point (x, y) on the elliptic curve.
-    """
-
-    x, is_odd = compressed_point
-    y = sqrtmod(pow(x, 3, p) + a * x + b, p)
-    if bool(is_odd) == bool(y & 1):
-        return (x, y)
-    return (x, p - y)
-
-
-class Ped_scheme:
-    # Class level variables
-    # Parameters of the elliptic curve
-
-    # Domain parameters for the `secp256k1` curve
-    # (as defined in http://www.secg.org/sec2-v2.pdf)
-    name = "secp256k1"
-    p = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
-    n = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
-    a = 0x0000000000000000000000000000000000000000000000000000000000000000
-    b = 0x0000000000000000000000000000000000000000000000000000000000000007
-    g = (
-        0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
-        0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
-    )
-    h = 1
-    curve = tiny.Curve(a, b, tiny.SubGroup(p, g, n, h), name)
-
-    # Utility functions to compress and decompress points on an Elliptic curve
-
-    def compress_point(self, point):
-        """Compresses a point on an Elliptic Curve. Returns x value and boolean
-
-        Args:
-            point (tinyec point): tinyec point e.g. curve.g.x
-
-        Returns:
-            tuple: (x value of point, boolean)
-        """
-        return (point.x, point.y % 2)
-
-    def uncompress_point_to_tinyec(self, compressed_point):
-        """Uncompress a point on an Elliptic Curve.
-
-        Args:
-            point (compressed point): x value of point and boolean
-
-        Returns:
-            tinyec point: point on elliptic curve
-        """
-        x, is_odd = compressed_point
-        y = sqrtmod(
-            pow(x, 3, Ped_scheme.p) + Ped_scheme.a * x + Ped_scheme.b, Ped_scheme.p
-        )
-        if bool(is_odd) == bool(y & 1):
-            return tiny.Point(Ped_scheme.curve, x, y)
-        return tiny.Point(Ped_scheme.curve, x, Ped_scheme.p - y)
-
-    # Value of H_x is SHA256 of G.x in Bitcoin
-    # https://github.com/AdamISZ/ConfidentialTransactionsDoc/blob/master/essayonCT.pdf
-    # Page 6
-
-    H_x = 36444060476547731421425013472121489344383018981262552973668657287772036414144
-    H_y = uncompress_point((H_x, False), p, a, b)[1]
-    H = tiny.Point(curve, H_x, H_y)
-
-    def commit(self, v):
-        """Generate Pedersen Commitment
-
-        Args:
-            v (integer): value to be committed to
-
-        Returns:
-            tinyec point: point on elliptic curve
-            r (integer): random number below order (p) of elliptic curve
-        """
-        # r = secrets.randbelow(Ped_scheme.curve.field.p) # use secrets library for better randomness
-        r = random.randint(1, Ped_scheme.curve.field.p)
-        return (v * Ped_scheme.curve.g + r * Ped_scheme.H, r)
-
-    def verify(self, c, v, r):
-        """Verify Pedersen Commitment
-
-        Args:
-            c (tinyec point on elliptic curve): pedersen commitment
-            v (integer): value that was committed
-            r (integer): random number used for the commitment
-
-        Returns:
-            True/False : Commitment is verified
-        """
-        return c == v * Ped_scheme.curve.g + r * Ped_scheme.H
-
-
 def deploy_ProductGHGFootPrint():
     """
     Deploys the ProductGHGFootPrint contract for each company and its products.
@@ -219,29 +133,37 @@ def set_description():
                 transaction = data[company][product][
                     "productghgfootprint"
                 ].set_description(
-                    data[company][product]["description"]["owner_name"],  # owner
-                    data[company][product]["description"]["productID"],  # productID
-                    data[company][product]["description"][
-                        "product_name"
-                    ],  # product_name
-                    data[company][product]["description"][
-                        "product_type"
-                    ],  # product_type
-                    data[company][product]["description"]["units"],  # units
-                    data[company][product]["description"][
-                        "date_created"
-                    ],  # date_created
-                    data[company][product]["description"][
-                        "date_updated"
-                    ],  # date_updated
-                    data[company][product]["description"]["status"],  # status
-                    "0x0000000000000000000000000000000000000000",  # ancestor contract
-                    "0x0000000000000000000000000000000000000000",  # descendant contract
+                    *description_args(data[company][product]),
                     {"from": data[company]["account"]},
                 )
                 transaction.wait(1)
 
 
+def description_args(product):
+    """
+    Returns the arguments of ProductGHGFootPrint.set_description for a product.
+
+    Args:
+        product (dict): The product dictionary with its description.
+
+    Returns:
+        tuple: The set_description arguments.
+    """
+    description = product["description"]
+    return (
+        description["owner_name"],  # owner
+        description["productID"],  # productID
+        description["product_name"],  # product_name
+        description["product_type"],  # product_type
+        description["units"],  # units
+        description["date_created"],  # date_created
+        description["date_updated"],  # date_updated
+        description["status"],  # status
+        "0x0000000000000000000000000000000000000000",  # ancestor contract
+        "0x0000000000000000000000000000000000000000",  # descendant contract
+    )
+
+
 def create_commitments(p):
     """
     Creates cryptographic commitments for GHG (Greenhouse Gas) footprint values for each product of each company in the data.
@@ -274,37 +196,91 @@ def create_commitments(p):
 
     If a GHG footprint value is not present, the function sets the commitment and randomness to (0, 0).
 
+    The commitments for each product are created as one batch with `commit_many`
+    and verified with one randomized batch check (`find_invalid_openings`),
+    see `commit_footprints`.
+
     Raises:
         AssertionError: If the commitment verification fails.
     """
     for company in data:
         for product in data[company]:
             if "Product" in product:
+                commit_footprints(p, data[company][product]["GHG_Footprints"])
+    # write data to file for debugging
+    # import pprint; pprint.pprint(str(data))
+
+
+def create_commitments_parallel(p, max_workers=None, seed=1234567890, chunk_size=1000):
+    """
+    Creates the commitments for every GHG footprint value like `create_commitments`, using a process pool.
+
+    The company/product tree is split into shards of at most `chunk_size` footprints,
+    and each shard is committed and batch verified in a worker process.
+    Each shard gets its own random number generator, derived from `seed` and the
+    company, product and chunk number. The commitments are therefore reproducible and
+    do not depend on the number of workers or on the order the shards finish in.
+    With seed=None every shard uses the secure `secrets` random source.
+    The results are merged back into the GHGFootPrint_commitment and
+    GHGFootPrint_commitment_r fields of `data`.
+
+    Args:
+        p: An object that provides methods for creating and verifying cryptographic commitments.
+        max_workers (int, optional): number of worker processes. Defaults to the number of CPUs.
+        seed (int, optional): base seed for the per-shard random numbers. Defaults to 1234567890.
+        chunk_size (int, optional): maximum number of footprints per shard. Defaults to 1000.
+
+    Raises:
+        AssertionError: If the commitment verification fails.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from pedersen import commit_shard, init_commit_worker
+
+    # every worker builds the fixed-base tables in init_commit_worker, workers forked
+    # after this call inherit them and skip the build
+    p.fixed_base_tables()
+
+    shards = []
+    for company in data:
+        for product in data[company]:
+            if "Product" in product:
+                footprints = []
                 for footprint in data[company][product]["GHG_Footprints"]:
                     if "GHGFootprint_value" in footprint:
-                        commitment = p.commit(int(footprint["GHGFootprint_value"]))
-                        footprint["GHGFootPrint_commitment"] = p.compress_point(
-                            commitment[0]
-                        )
-                        footprint["GHGFootPrint_commitment_r"] = commitment[1]
-
-                        assert (
-                            p.verify(
-                                commitment[0],
-                                int(footprint["GHGFootprint_value"]),
-                                commitment[1],
-                            )
-                            == True,
-                            "Commitment failed",
-                        )
+                        footprints.append(footprint)
                     else:
                         footprint["GHGFootPrint_commitment"] = (
                             0,
                             0,
                         )
                         footprint["GHGFootPrint_commitment_r"] = 0
-    # write data to file for debugging
-    # pprint.pprint(str(data))
+                for start in range(0, len(footprints), chunk_size):
+                    shards.append(
+                        (
+                            footprints[start : start + chunk_size],
+                            (company, product, start // chunk_size),
+                        )
+                    )
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=init_commit_worker
+    ) as executor:
+        results = executor.map(
+            commit_shard,
+            [
+                [int(footprint["GHGFootprint_value"]) for footprint in footprints]
+                for footprints, _ in shards
+            ],
+            [seed] * len(shards),
+            [shard_key for _, shard_key in shards],
+        )
+        for (footprints, shard_key), (commitments, invalid) in zip(shards, results):
+            assert len(invalid) == 0, "Commitment failed for GHG Footprint IDs " + str(
+                [footprints[i]["GHGFootPrint_ID"] for i in invalid]
+            )
+            for footprint, commitment in zip(footprints, commitments):
+                footprint["GHGFootPrint_commitment"] = commitment[0]
+                footprint["GHGFootPrint_commitment_r"] = commitment[1]
 
 
 def upload_footprints():
@@ -347,46 +323,531 @@ def upload_footprints():
                         footprint["GHGFootPrint_ID"],
                     )
 
-                    # set contract link data for linked footprints
-                    if (
-                        "GHGFootprint_linked_product" in footprint
-                    ):  # check if the footprint is linked
-                        linked_contract = find_linked_contract(
-                            footprint["GHGFootprint_supplier"],
-                            footprint["GHGFootprint_linked_product"],
-                        )
-                        print("Linked contract is: ", linked_contract)
-                        footprint["GHGFootprint_linked_contract"] = linked_contract
-                    else:
-                        # set contract link data for non-linked footprints to 0
-                        footprint["GHGFootprint_linked_contract"] = (
-                            "0x0000000000000000000000000000000000000000"
-                        )
-                        footprint["GHGFootprint_no_units"] = 0
-                        footprint["GHGFootprint_IDs"] = []
+                    set_footprint_link(footprint)
 
                     # post Blockchain tx to set GHG footprint for each product
                     transaction1 = data[company][product][
                         "productghgfootprint"
                     ].set_ghgfootprint(
-                        footprint["GHGFootPrint_ID"],  # GHGFootPrint_ID
-                        footprint["GHGFootPrint_scope"],  # Scope
-                        footprint["GHGFootPrint_disaggregation"],  # disaggregation
-                        footprint["GHGFootPrint_category"],  # Category
-                        footprint["GHGFootprint_linked_contract"],  # linked contract
-                        footprint["GHGFootprint_IDs"],  # linked GHG FP IDs
-                        0,  # signature
-                        footprint["GHGFootprint_no_units"],  # units
-                        footprint["GHGFootPrint_commitment"][
-                            0
-                        ],  # GHG footprint commitment
-                        footprint["GHGFootPrint_commitment"][1],  # commitment y
+                        *footprint_args(footprint),
                         {"from": data[company]["account"]},
                     )
                     transaction1.wait(1)
                     print("GHG Setting is:", transaction1)
 
 
+def set_footprint_link(footprint):
+    """
+    Sets the contract link data of a footprint before it is uploaded.
+
+    - If the footprint is linked, finds the linked contract and sets it.
+    - If the footprint is not linked, sets the linked contract, units and linked IDs to 0.
+
+    Args:
+        footprint (dict): The GHG footprint dictionary.
+    """
+    # set contract link data for linked footprints
+    if "GHGFootprint_linked_product" in footprint:  # check if the footprint is linked
+        linked_contract = find_linked_contract(
+            footprint["GHGFootprint_supplier"],
+            footprint["GHGFootprint_linked_product"],
+        )
+        print("Linked contract is: ", linked_contract)
+        footprint["GHGFootprint_linked_contract"] = linked_contract
+    else:
+        # set contract link data for non-linked footprints to 0
+        footprint["GHGFootprint_linked_contract"] = (
+            "0x0000000000000000000000000000000000000000"
+        )
+        footprint["GHGFootprint_no_units"] = 0
+        footprint["GHGFootprint_IDs"] = []
+
+
+def footprint_args(footprint):
+    """
+    Returns the arguments of ProductGHGFootPrint.set_ghgfootprint for a footprint.
+
+    The same tuple is one GHGFootPrint_struct entry for set_ghgfootprints. The category is
+    sent as its code and the commitment as x and y odd, see `encode_footprint`.
+
+    Args:
+        footprint (dict): The GHG footprint dictionary with its link data set by `set_footprint_link`.
+
+    Returns:
+        tuple: The set_ghgfootprint arguments.
+
+    Raises:
+        ValueError: If the category has no code in footprint_codec.CATEGORIES.
+    """
+    return encode_footprint(footprint)
+
+
+# Gas estimates used to group footprints into set_ghgfootprints transactions.
+# They are upper bounds: storing a footprint writes the packed header slot, the commitment
+# x slot, the linked IDs array length and one slot per 16 linked IDs (22100 gas for a new
+# slot) and some zero slots and the footprints array length (overhead). The calldata is
+# 12 words plus one per linked ID and costs 16 gas per byte.
+# The duplicate ID check reads the ID index slot of the footprint (2100 gas) and the
+# index is then written (one more new slot), so the cost does not depend on the number
+# of footprints already stored.
+
+TRANSACTION_BASE_GAS = 21000
+GAS_PER_STORAGE_SLOT = 22100
+GAS_PER_FOOTPRINT_OVERHEAD = 12000
+GAS_PER_CALLDATA_BYTE = 16
+GAS_PER_ID_CHECK = 2100
+
+
+def estimate_footprint_gas(footprint):
+    """
+    Estimates the gas needed to add one footprint with set_ghgfootprints.
+
+    Args:
+        footprint (dict): The GHG footprint dictionary with its link data set by `set_footprint_link`.
+
+    Returns:
+        int: Estimated gas.
+    """
+    ids_words = (2 * len(footprint["GHGFootprint_IDs"]) + 31) // 32
+    calldata_words = 12 + len(footprint["GHGFootprint_IDs"])
+    return (
+        GAS_PER_STORAGE_SLOT * (4 + ids_words)
+        + GAS_PER_FOOTPRINT_OVERHEAD
+        + GAS_PER_CALLDATA_BYTE * 32 * calldata_words
+        + GAS_PER_ID_CHECK
+    )
+
+
+def group_footprints_into_batches(footprints, max_batch_gas=10000000):
+    """
+    Groups footprints into batches that can each be added in one set_ghgfootprints transaction.
+
+    Args:
+        footprints (list): GHG footprint dictionaries with their link data set by `set_footprint_link`.
+        max_batch_gas (int, optional): Maximum estimated gas per transaction. Defaults to 10000000.
+
+    Returns:
+        list: Lists of footprints, one list per transaction.
+    """
+    batches = []
+    batch = []
+    batch_gas = TRANSACTION_BASE_GAS
+    for footprint in footprints:
+        gas = estimate_footprint_gas(footprint)
+        if len(batch) > 0 and batch_gas + gas > max_batch_gas:
+            batches.append(batch)
+            batch = []
+            batch_gas = TRANSACTION_BASE_GAS
+        batch.append(footprint)
+        batch_gas += gas
+    if len(batch) > 0:
+        batches.append(batch)
+    return batches
+
+
+def upload_footprints_batched(max_batch_gas=10000000):
+    """
+    Uploads GHG footprints for each product of each company in the data in batches.
+
+    Like `upload_footprints`, but the footprints of each product are grouped into
+    batches below `max_batch_gas` and each batch is posted in one set_ghgfootprints
+    transaction, so a product with hundreds of footprints needs a few transactions.
+
+    Args:
+        max_batch_gas (int, optional): Maximum estimated gas per transaction. Defaults to 10000000.
+
+    Note: Assumes `data` is a predefined global variable containing the necessary information.
+    """
+    for company in data:
+        for product in data[company]:
+            if "Product" in product:
+                footprints = data[company][product]["GHG_Footprints"]
+                for footprint in footprints:
+                    set_footprint_link(footprint)
+                for batch in group_footprints_into_batches(footprints, max_batch_gas):
+                    print(
+                        "Posting transaction for ",
+                        data[company][product]["description"]["owner_name"],
+                        " Footprints:",
+                        [footprint["GHGFootPrint_ID"] for footprint in batch],
+                    )
+                    # post Blockchain tx to set a batch of GHG footprints for the product
+                    transaction1 = data[company][product][
+                        "productghgfootprint"
+                    ].set_ghgfootprints(
+                        [footprint_args(footprint) for footprint in batch],
+                        {"from": data[company]["account"]},
+                    )
+                    transaction1.wait(1)
+                    print("GHG Setting is:", transaction1)
+
+
+def deploy_products_pipelined(pipeline):
+    """
+    Creates an account for each company and deploys a ProductGHGFootPrint contract for
+    each of its products with pipelined transactions.
+
+    Args:
+        pipeline (TransactionPipeline): pipeline to submit the transactions to.
+
+    Raises:
+        ValueError: If a transaction fails.
+
+    Note: Assumes `data` is a predefined global variable containing the necessary information.
+    """
+    deployments = []
+    for company in data:
+        account = accounts.add()
+        print("Account for ", company, "is: ", account)
+        data[company]["account"] = account
+        for product in data[company]:
+            if "Product" in product:
+                transaction = pipeline.submit(
+                    account,
+                    ProductGHGFootPrint.deploy,
+                    label=company + " " + product + " deploy",
+                )
+                deployments.append((company, product, transaction))
+    pipeline.collect()
+    for company, product, transaction in deployments:
+        data[company][product]["productghgfootprint"] = ProductGHGFootPrint.at(
+            transaction.receipt["contractAddress"]
+        )
+        print(
+            "Contract address for ",
+            company,
+            product,
+            "is: ",
+            data[company][product]["productghgfootprint"].address,
+        )
+
+
+def deploy_products_with_factory(pipeline, products_per_transaction=100):
+    """
+    Creates an account for each company and a ProductGHGFootPrint clone for each of its
+    products with a ProductGHGFootPrintFactory.
+
+    The first company deploys one ProductGHGFootPrint contract as the implementation and the
+    factory. Each company then creates its products with create_products, up to
+    `products_per_transaction` products per transaction, and the companies send concurrently.
+    The product addresses are read from the ProductCreated events in the mined receipts
+    returned by the pipeline (see `product_created_events`).
+
+    Args:
+        pipeline (TransactionPipeline): pipeline to submit the transactions to.
+        products_per_transaction (int, optional): Maximum number of products created in one
+                                                  transaction. Defaults to 100.
+
+    Returns:
+        ProjectContract: The factory contract.
+
+    Raises:
+        ValueError: If a transaction fails.
+
+    Note: Assumes `data` is a predefined global variable containing the necessary information.
+    """
+    for company in data:
+        account = accounts.add()
+        print("Account for ", company, "is: ", account)
+        data[company]["account"] = account
+
+    deployer = data[next(iter(data))]["account"]
+    implementation = ProductGHGFootPrint.deploy({"from": deployer})
+    factory = ProductGHGFootPrintFactory.deploy(implementation, {"from": deployer})
+    print("Implementation contract is: ", implementation.address)
+    print("Factory contract is: ", factory.address)
+
+    creations = []
+    for company in data:
+        account = data[company]["account"]
+        products = [product for product in data[company] if "Product" in product]
+        for start in range(0, len(products), products_per_transaction):
+            chunk = products[start : start + products_per_transaction]
+            transaction = pipeline.submit(
+                account,
+                factory.create_products,
+                [account] * len(chunk),
+                label=company + " create products " + str(chunk),
+            )
+            creations.append((company, chunk, transaction))
+    pipeline.collect()
+    for company, chunk, transaction in creations:
+        for event in product_created_events(factory, transaction.receipt):
+            product = chunk[event["index"]]
+            data[company][product]["productghgfootprint"] = ProductGHGFootPrint.at(
+                event["product"]
+            )
+            print(
+                "Contract address for ",
+                company,
+                product,
+                "is: ",
+                event["product"],
+            )
+    return factory
+
+
+def product_created_events(factory, receipt):
+    """
+    Decodes the ProductCreated events of a factory from a mined transaction receipt.
+
+    The receipt of the pipeline is used rather than the brownie transaction: the pipeline
+    sends without waiting for confirmations, so brownie may not have filled in the events
+    of its transaction yet, and after a re-broadcast the mined transaction is not the one
+    brownie sent first.
+
+    Args:
+        factory (ProjectContract): The ProductGHGFootPrintFactory contract.
+        receipt (dict): The mined receipt, e.g. PendingTransaction.receipt.
+
+    Returns:
+        list: The event arguments (owner, product, index) of each ProductCreated log.
+    """
+    event_abi = next(
+        entry
+        for entry in ProductGHGFootPrintFactory.abi
+        if entry["type"] == "event" and entry["name"] == "ProductCreated"
+    )
+    topic = event_abi_to_log_topic(event_abi)
+    event = web3.eth.contract(abi=[event_abi]).events.ProductCreated()
+    return [
+        event.processLog(log)["args"]
+        for log in receipt["logs"]
+        if str(log["address"]).lower() == factory.address.lower()
+        and len(log["topics"]) > 0
+        and bytes(log["topics"][0]) == topic
+    ]
+
+
+def upload_products_pipelined(max_batch_gas=10000000, pipeline=None, use_factory=True):
+    """
+    Deploys the contracts, sets the descriptions and uploads the GHG footprints of every
+    product without waiting for each transaction to be confirmed.
+
+    Does the work of `deploy_ProductGHGFootPrint`, `set_description` and
+    `upload_footprints_batched` with a TransactionPipeline: every account sends its
+    transactions back to back with locally tracked nonces and the accounts send
+    concurrently. The receipts are only collected at the end of each of the two stages -
+    the contracts are deployed first because linked footprints need the addresses of
+    their suppliers' contracts. The load time is then a few blocks instead of one
+    block per transaction. With `use_factory` the products are created as clones by
+    a ProductGHGFootPrintFactory instead of deploying the full contract for each product.
+
+    Args:
+        max_batch_gas (int, optional): Maximum estimated gas per set_ghgfootprints transaction.
+                                       Defaults to 10000000.
+        pipeline (TransactionPipeline, optional): pipeline to submit the transactions to.
+                                                  Defaults to a new pipeline on brownie's web3.
+        use_factory (bool, optional): Create the products with `deploy_products_with_factory`
+                                      instead of `deploy_products_pipelined`. Defaults to True.
+
+    Raises:
+        ValueError: If a transaction fails.
+
+    Note: Assumes `data` is a predefined global variable containing the necessary information.
+    """
+    if pipeline is None:
+        pipeline = TransactionPipeline(web3)
+
+    # stage 1 - create accounts for each company and deploy the contracts
+    if use_factory:
+        deploy_products_with_factory(pipeline)
+    else:
+        deploy_products_pipelined(pipeline)
+
+    # stage 2 - set the descriptions and upload the footprints in batches
+    upload_footprints_pipelined(pipeline, max_batch_gas)
+
+
+def upload_footprints_pipelined(pipeline, max_batch_gas=10000000):
+    """
+    Sets the descriptions and uploads the GHG footprints of every deployed product in
+    batches with pipelined transactions and waits for all of them to be confirmed.
+
+    Args:
+        pipeline (TransactionPipeline): pipeline to submit the transactions to.
+        max_batch_gas (int, optional): Maximum estimated gas per set_ghgfootprints transaction.
+                                       Defaults to 10000000.
+
+    Raises:
+        ValueError: If a transaction fails.
+
+    Note: Assumes `data` is a predefined global variable containing the necessary information.
+    """
+    for company in data:
+        for product in data[company]:
+            if "Product" in product:
+                contract = data[company][product]["productghgfootprint"]
+                pipeline.submit(
+                    data[company]["account"],
+                    contract.set_description,
+                    *description_args(data[company][product]),
+                    label=company + " " + product + " description",
+                )
+                footprints = data[company][product]["GHG_Footprints"]
+                for footprint in footprints:
+                    set_footprint_link(footprint)
+                for batch in group_footprints_into_batches(footprints, max_batch_gas):
+                    pipeline.submit(
+                        data[company]["account"],
+                        contract.set_ghgfootprints,
+                        [footprint_args(footprint) for footprint in batch],
+                        label=company
+                        + " "
+                        + product
+                        + " footprints "
+                        + str([footprint["GHGFootPrint_ID"] for footprint in batch]),
+                    )
+    for transaction in pipeline.collect():
+        print("Confirmed:", transaction.label, transaction.receipt["transactionHash"].hex())
+
+
+def ingest_footprints(
+    p,
+    path,
+    chunk_size=1000,
+    max_batch_gas=10000000,
+    collect_every=100,
+    pipeline=None,
+    sidecar=None,
+    upload_totals=True,
+):
+    """
+    Commits and uploads the GHG footprints in a CSV or JSONL file without loading the file.
+
+    The file has the columns of footprints.csv plus company and product columns (see
+    footprint_stream.py). It is read twice: the first pass only collects the products,
+    which replace the contents of `data` with a default description and are created with
+    `deploy_products_with_factory`, so every supplier contract exists before footprints
+    link to it. The second pass streams the footprints in chunks of `chunk_size`: each
+    chunk is committed, then uploaded in set_ghgfootprints batches through the transaction
+    pipeline. The receipts are collected after every `collect_every` transactions, so the
+    memory used does not grow with the number of footprints in the file.
+    Before a chunk is uploaded its footprints, with the commitment r, are written to the
+    sidecar file - the contracts only store the commitments, so the sidecar is the only
+    record of the r needed to open them. Once every footprint is uploaded, the sidecar is
+    read back (see footprint_stream.sidecar_supply_chain), the total of every product is
+    calculated with a SupplyChainRollup and uploaded with set_total_ghg.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        path (str): CSV or JSONL file path.
+        chunk_size (int, optional): Maximum number of footprints committed at once. Defaults to 1000.
+        max_batch_gas (int, optional): Maximum estimated gas per set_ghgfootprints transaction.
+                                       Defaults to 10000000.
+        collect_every (int, optional): Number of transactions submitted between receipt
+                                       collections. Defaults to 100.
+        pipeline (TransactionPipeline, optional): pipeline to submit the transactions to.
+                                                  Defaults to a new pipeline on brownie's web3.
+        sidecar (str, optional): JSONL file the committed footprints are written to.
+                                 Defaults to the file name with _committed.jsonl.
+        upload_totals (bool, optional): Whether to calculate and upload the product totals
+                                        after the footprints. Defaults to True.
+
+    Returns:
+        dict: The per-scope totals of each (company, product) if upload_totals is set.
+
+    Raises:
+        ValueError: If a footprint has no company or product, a product name does not
+                    contain "Product", a footprint links to a product that is not in the
+                    file, the links form a cycle or a transaction fails.
+        AssertionError: If the commitment verification fails.
+    """
+    if pipeline is None:
+        pipeline = TransactionPipeline(web3)
+
+    # pass 1 - register and create the products
+    data.clear()
+    for company, products in product_keys(path).items():
+        for product in products:
+            if "Product" not in product:
+                raise ValueError(
+                    "Product names must contain 'Product': " + company + " " + product
+                )
+            data.setdefault(company, {}).setdefault(
+                product,
+                {
+                    "description": {
+                        "owner_name": company,
+                        "productID": product,
+                        "product_name": product,
+                        "product_type": "",
+                        "units": "Unit",
+                        "date_created": "",
+                        "date_updated": "",
+                        "status": "Active",
+                    },
+                    "GHG_Footprints": [],
+                },
+            )
+    deploy_products_with_factory(pipeline)
+
+    # pass 2 - stream, commit, record and upload the footprints
+    if sidecar is None:
+        sidecar = sidecar_path(path)
+    with open(sidecar, "w") as sidecar_file:
+        described = set()
+        submitted = 0
+        for company, product, footprints in commit_chunks(
+            p, product_chunks(read_footprints(path), chunk_size)
+        ):
+            for footprint in footprints:
+                try:
+                    set_footprint_link(footprint)
+                except ValueError as error:
+                    raise ValueError(
+                        "Footprint "
+                        + str(footprint["GHGFootPrint_ID"])
+                        + " of "
+                        + company
+                        + " "
+                        + product
+                        + " in "
+                        + path
+                        + " links to an unknown product - "
+                        + str(error)
+                    )
+            write_committed(sidecar_file, company, product, footprints)
+            account = data[company]["account"]
+            contract = data[company][product]["productghgfootprint"]
+            if (company, product) not in described:
+                described.add((company, product))
+                pipeline.submit(
+                    account,
+                    contract.set_description,
+                    *description_args(data[company][product]),
+                    label=company + " " + product + " description",
+                )
+                submitted += 1
+            for batch in group_footprints_into_batches(footprints, max_batch_gas):
+                pipeline.submit(
+                    account,
+                    contract.set_ghgfootprints,
+                    [footprint_args(footprint) for footprint in batch],
+                    label=company
+                    + " "
+                    + product
+                    + " footprints "
+                    + str(batch[0]["GHGFootPrint_ID"])
+                    + " to "
+                    + str(batch[-1]["GHGFootPrint_ID"]),
+                )
+                submitted += 1
+            if submitted >= collect_every:
+                print("Confirmed", len(pipeline.collect()), "transactions")
+                submitted = 0
+    print("Confirmed", len(pipeline.collect()), "transactions")
+    print("Committed footprints with their r written to", sidecar)
+    if not upload_totals:
+        return None
+
+    # pass 3 - total every product from the sidecar and upload the totals
+    totals = SupplyChainRollup(p, sidecar_supply_chain(p, sidecar)).rollup_all()
+    upload_rollup_totals(p, totals, pipeline=pipeline)
+    print("Confirmed", len(pipeline.collect()), "transactions")
+    return totals
+
+
 def find_linked_contract(supplier, product):
     """
     Finds the linked contract address for a given supplier and product.
@@ -405,7 +866,7 @@ def find_linked_contract(supplier, product):
         product_contract = data[supplier][product]["productghgfootprint"].address
         return product_contract
     else:
-        ValueError("Supplier or product not found")
+        raise ValueError("Supplier or product not found: " + str(supplier) + " " + str(product))
 
 
 def find_linked_supplier(supplier, product):
@@ -426,7 +887,7 @@ def find_linked_supplier(supplier, product):
         product_supplier = data[supplier][product]
         return product_supplier
     else:
-        ValueError("Supplier or product not found")
+        raise ValueError("Supplier or product not found: " + str(supplier) + " " + str(product))
 
 
 def get_footprints(contract_address):
@@ -440,10 +901,11 @@ def sum_up_footprints(p, footprints, ids=[], scope=0):
     Sums up the greenhouse gas (GHG) footprints and commitments for a given set of footprints.
 
     Args:
-        p: An object that provides the method `uncompress_point_to_tinyec` to uncompress commitments.
+        p: An object that provides the method `uncompress` to uncompress commitments.
         footprints (list): A list of footprint dictionaries, each containing GHG footprint data.
         ids (list, optional): A list of footprint IDs to filter the footprints. Defaults to an empty list.
-                              This paramter is used for linked footprints.
+                              This paramter is used for linked footprints. A selected footprint
+                              that is itself linked is followed to its supplier.
         scope (int, optional): The scope level to consider for summing up footprints. Defaults to 0.
                                This parameter is used for linked footprints so that the linked footprints
                                go into the parent company's scope.
@@ -472,6 +934,8 @@ def sum_up_footprints(p, footprints, ids=[], scope=0):
     for footprint in footprints:
         # print("Footprint is: ", footprint)
         if "GHGFootprint_linked_product" in footprint:
+            if len(ids) > 0 and footprint["GHGFootPrint_ID"] not in ids:
+                continue  # linked footprint not selected by the downstream link
             linked_supplier = find_linked_supplier(
                 footprint["GHGFootprint_supplier"],
                 footprint["GHGFootprint_linked_product"],
@@ -499,9 +963,7 @@ def sum_up_footprints(p, footprints, ids=[], scope=0):
                     "GHGFootPrint_commitment_r"
                 ]  # place rs in totals[6:]
                 # uncompress the commitment
-                unc_c = p.uncompress_point_to_tinyec(
-                    footprint["GHGFootPrint_commitment"]
-                )
+                unc_c = p.uncompress(footprint["GHGFootPrint_commitment"])
                 totals[scope - 1 + 3] = accumulate_commitments(
                     totals[scope - 1 + 3], unc_c
                 )
@@ -517,9 +979,7 @@ def sum_up_footprints(p, footprints, ids=[], scope=0):
                     "GHGFootPrint_commitment_r"
                 ]
                 # uncompress the commitment
-                unc_c = p.uncompress_point_to_tinyec(
-                    footprint["GHGFootPrint_commitment"]
-                )
+                unc_c = p.uncompress(footprint["GHGFootPrint_commitment"])
                 # accumulate the commitments
                 totals[footprint["GHGFootPrint_scope"] - 1 + 3] = (
                     accumulate_commitments(
@@ -533,26 +993,7 @@ def sum_up_footprints(p, footprints, ids=[], scope=0):
     return totals
 
 
-def accumulate_commitments(*commitments):
-    """Accumulates multiple commitments on an elliptic curve.
-
-    Args:
-        *commitments (tinyec point or int): The commitment points or 0.
-
-    Returns:
-        tinyec point or int: The accumulated commitment point or 0 if all inputs are 0.
-    """
-    pure_commitments = [x for x in commitments if x != 0]  # remove 0 commitments
-    if len(pure_commitments) == 0:
-        return 0  # return zero if no commitments in list
-    else:
-        accumulated = pure_commitments[0]
-        for c in pure_commitments[1:]:
-            accumulated = accumulated + c
-        return accumulated
-
-
-def upload_total_footprint(company, product, v, c, r):
+def upload_total_footprint(company, product, v, c, r, pipeline=None):
     """
     Uploads the total GHG footprint for a product to the blockchain.
 
@@ -568,9 +1009,11 @@ def upload_total_footprint(company, product, v, c, r):
             - c[0] (int): The total GHG footprint commitment x value.
             - c[1] (int): The total GHG footprint commitment even or odd.
         r (int): The total GHG footprint commitment r value.
+        pipeline (TransactionPipeline, optional): If given, the transaction is submitted to the
+                                                  pipeline instead of waiting for a confirmation.
 
     Returns:
-        None
+        PendingTransaction or None: The submitted transaction if a pipeline is given.
 
     Raises:
         ValueError: If the transaction fails.
@@ -580,81 +1023,140 @@ def upload_total_footprint(company, product, v, c, r):
     # split r into two 32 byte values so as not to overflow uint256 in solidity
     r1, r2 = split_64bit_number(r)
     print("r is: ", r1, "r_2 is;", r2)
-    transaction1 = product["productghgfootprint"].set_total_ghg(
+    total_args = (
         v,  # Total GHG footprint value
         c[0],  # Total GHG footprint commitment x value
         c[1],  # Total GHG footprint commitment even or odd
         r1,  # Total GHG footprint commitment r
         r2,  # Total GHG footprint commitment r overflow
+    )
+    if pipeline is not None:
+        return pipeline.submit(
+            company["account"],
+            product["productghgfootprint"].set_total_ghg,
+            *total_args,
+            label=product["description"]["owner_name"] + " total",
+        )
+    transaction1 = product["productghgfootprint"].set_total_ghg(
+        *total_args,
         {"from": company["account"]},
     )
     transaction1.wait(1)
     # print("GHG Setting is:", transaction1)
 
 
-def user_sum_up_commitments(p, contract_address, linked_fp_ids=[]):
+def upload_rollup_totals(p, totals, pipeline=None):
+    """
+    Uploads the totals of several products, e.g. the changed totals of a SupplyChainRollup.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        totals (dict): Per-scope totals (as returned by sum_up_footprints) for each
+                       (company, product).
+        pipeline (TransactionPipeline, optional): If given, the transactions are submitted to
+                                                  the pipeline instead of sent one by one.
+
+    Returns:
+        list: The submitted transactions if a pipeline is given.
+    """
+    submitted = []
+    for (company, product), product_totals in totals.items():
+        value, commitment, r = product_total(p, product_totals)
+        transaction = upload_total_footprint(
+            data[company], data[company][product], value, commitment, r, pipeline=pipeline
+        )
+        if transaction is not None:
+            submitted.append(transaction)
+    return submitted
+
+
+def upload_all_totals(p, pipeline=None):
+    """
+    Calculates the total GHG footprint of every product and uploads them to the blockchain.
+
+    The totals are calculated by a SupplyChainRollup in one topological pass over all
+    products, so the subtotal of a supplier shared by several products is only summed
+    once. The totals match `sum_up_footprints` for each product.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        pipeline (TransactionPipeline, optional): If given, the transactions are submitted to
+                                                  the pipeline, otherwise they are sent one by one.
+
+    Returns:
+        tuple: (rollup, totals) - the SupplyChainRollup with the cached subtotals, e.g. for
+               later incremental updates, and the per-scope totals of each (company, product).
+
+    Raises:
+        ValueError: If the links of the supply chain form a cycle.
+
+    Note: Assumes `data` is a predefined global variable containing the necessary information.
+    """
+    rollup = SupplyChainRollup(p, data)
+    totals = rollup.rollup_all()
+    upload_rollup_totals(p, totals, pipeline=pipeline)
+    return rollup, totals
+
+
+def user_sum_up_commitments(
+    p, contract_address, linked_fp_ids=[], max_workers=8, reader=None, cache=None
+):
     """
     Sums up the commitments for a user's GHG footprints in a smart contract.
+
+    The linked supplier contracts are discovered first and summed in topological order
+    by a SupplyChainVerifier, so each supplier contract is fetched once and each
+    (contract, linked footprint IDs) partial sum is calculated once, however many
+    paths through the supply chain lead to it. The contracts of each level of the
+    supply chain are fetched concurrently, and linked contracts are read with
+    get_ghgfootprints_by_ids so only the linked footprint IDs are transferred.
     Args:
         p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
         contract_address (ProjectContract): The smart contract instance from which to retrieve GHG footprints.
         linked_fp_ids (list, optional): A list of linked footprint IDs. Defaults to an empty list.
+        max_workers (int, optional): Maximum number of concurrent contract reads. Defaults to 8.
+        reader (FootprintReader, optional): Bulk reader (GHGFootPrintReader contract) used to read
+                                            each level of the supply chain in a few calls.
+        cache (ReadCache, optional): Local cache of contract reads, contracts that have not changed
+                                     since they were cached are not read from the node again.
     Returns:
         int: The total commitments for the user's GHG footprints.
+    Raises:
+        ValueError: If the linked contracts contain a cycle.
     """
-    global user_commitments_tree
-    print("Contract address is: ", contract_address)
-    footprints = contract_address.get_ghgfootprints()
-    # print("User Verify footprints are:", list(footprints))
-    total_commitments = 0
-    for footprint in footprints:
-        # print("Footprint is: ", footprint, "in contract", contract_address)
-        # print("linked_fp_ids are: ", linked_fp_ids)
-        # print("total commitments: ", total_commitments)
-        fp_id = footprint[0]
-        scope = footprint[1]
-        disaggregation = footprint[2]
-        category = footprint[3]
-        if footprint[4] != "0x0000000000000000000000000000000000000000":
-            linked_contract: ProjectContract = ProductGHGFootPrint.at(footprint[4])
-        else:
-            linked_contract = footprint[4]
-        signature = footprint[6]
-        units = footprint[7]
-        commitment = footprint[8][0]
-        commitment_y = footprint[8][1]
-        if linked_contract != "0x0000000000000000000000000000000000000000":
-            linked_fp_ids = footprint[5]
-            total_commitments = accumulate_commitments(
-                total_commitments,
-                user_sum_up_commitments(p, linked_contract, linked_fp_ids),
-            )
-            linked_fp_ids = []
-        else:
-            if fp_id in linked_fp_ids or len(linked_fp_ids) == 0:
-                unc_c = p.uncompress_point_to_tinyec((commitment, commitment_y))
-                total_commitments = accumulate_commitments(total_commitments, unc_c)
-                user_commitments_tree.append(
-                    "Contract: " + str(contract_address) + " fp_id:" + str(fp_id)
-                )
-                user_commitments_tree.append(unc_c)
-    return total_commitments
+    from chain_verifier import SupplyChainVerifier
 
+    print("Contract address is: ", contract_address)
+    contract_at = ProductGHGFootPrint.at
+    if cache is not None:
+        contract_at = cache.contract_at(contract_at)
+        contract_address = contract_at(contract_address)
+    verifier = SupplyChainVerifier(
+        p,
+        contract_at,
+        log=user_commitments_tree,
+        max_workers=max_workers,
+        reader=reader,
+    )
+    return verifier.sum_commitments(contract_address, linked_fp_ids)
 
 
-def get_total_footprint(p, contract_address):
+def get_total_footprint(p, contract_address, cache=None):
     """
     Retrieves the total GHG footprint from a smart contract.
     Args:
         p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
         contract_address (ProjectContract): The smart contract instance from which to retrieve the total GHG footprint.
+        cache (ReadCache, optional): Local cache of contract reads. Defaults to reading from the node.
     
     Returns:
         tuple: A tuple containing:
             - fp_value (int): The total GHG footprint value.
-            - total_commitment (tinyec point): The total GHG footprint commitment as a point on the elliptic curve.
+            - total_commitment (point): The total GHG footprint commitment as a point on the elliptic curve.
             - total_r (int): The total GHG footprint commitment r value.
     """
+    if cache is not None:
+        contract_address = cache.contract_at(ProductGHGFootPrint.at)(contract_address)
     total_fp = contract_address.get_total_ghg()
     #print("Total GHG footprint is: ", total_fp)
     fp_value = total_fp[0]
@@ -663,7 +1165,7 @@ def get_total_footprint(p, contract_address):
     fp_commitment_r1 = total_fp[3]
     fp_commitment_r2 = total_fp[4]
 
-    total_commitment = p.uncompress_point_to_tinyec((fp_commitment, fp_commitment_y))
+    total_commitment = p.uncompress((fp_commitment, fp_commitment_y))
     total_r = reassamble_64bit_number(fp_commitment_r1, fp_commitment_r2)
 
     return fp_value, total_commitment, total_r
@@ -695,6 +1197,8 @@ def print_smart_contract(contract):
     #print("Smart Contract ancestor contract is: ", contract["description"]["ancestor"], "\n")
     #print("Smart Contract descendant contract is: ", contract["description"]["descendant"], "\n")
     
+    import pandas as pd  # only needed here, importing it takes most of the startup time
+
     # print the GHG footprints in a DataFrame
     print("GHG Footprints for the contract:\n")
     footprints_df = pd.DataFrame.from_dict(contract["GHG_Footprints"])
@@ -713,19 +1217,29 @@ user_commitments_tree = []
 company_commitments_tree = []
 
 
-def main():
+def main(processes=0):
+    # processes > 0 creates the commitments with a pool of that many worker processes,
+    # e.g. brownie run scripts/deploy.py main 4
+    processes = int(processes)  # brownie run passes the arguments as strings
     # Create a polynomial commitment object
     p = Ped_scheme()
-    deploy_ProductGHGFootPrint()  # deploy the ProductGHGFootPrint contract to the Blockchain for each company and product
-    set_description()  # set the description in the smart contract for each product
-    create_commitments(p)  # create commitments for each GHG footprint for each company
-    upload_footprints()  # upload the GHG footprints for each company to the blockchain and create links between contracts
-
-    # Calculate the total GHG footprint for Company A Product 1 from the sample data (not Blockchain) 
-    print("Calculating total GHG footprint for Company A Product 1 from Sample Data")
-    total_v_c_r = sum_up_footprints(
-        p, data["Company A"]["Product1"]["GHG_Footprints"]
-    )  
+    # create commitments for each GHG footprint for each company
+    if processes > 0:
+        create_commitments_parallel(p, max_workers=processes)
+    else:
+        create_commitments(p)
+    # deploy the ProductGHGFootPrint contract for each company and product, set the descriptions
+    # and upload the GHG footprints in batches with pipelined transactions and create links between contracts
+    upload_products_pipelined()
+
+    # Calculate the total GHG footprint of every product from the sample data (not Blockchain)
+    # in one topological pass and upload the totals with pipelined transactions
+    print("Calculating and uploading the total GHG footprint of every product")
+    pipeline = TransactionPipeline(web3)
+    _, totals = upload_all_totals(p, pipeline=pipeline)
+    pipeline.collect()
+    pipeline.close()
+    total_v_c_r = totals[("Company A", "Product1")]
 
     # Accumulate the total GHG footprint value, commitment, and commitment r
 
@@ -756,16 +1270,6 @@ def main():
         ),
     )
 
-    # Upload the total GHG footprint for Company A Product 1 to the blockchain
-    print("Uploading total GHG footprint for Company A Product 1 to the blockchain")
-    upload_total_footprint(
-        data["Company A"],
-        data["Company A"]["Product1"],
-        total_footprint_value,
-        p.compress_point(total_footprint_commitment),
-        total_footprint_commitment_r,
-    )
-
     # Print the smart contract details for Company A Product 1
     print("Printing smart contract details for Company A Product 1")
 
@@ -783,5 +1287,6 @@ def main():
     # Verify the commitment
 
     print("Verification is :", p.verify(commitment, value, commitment_r))
+    print("Point decompression cache:", p.decompressor.cache_info())
 
     
\ No newline at end of file
@@ -0,0 +1,655 @@
+# Elliptic curve arithmetic for the Pedersen commitment scheme in deploy.py
+#
+# tinyec multiplies points with plain double-and-add in affine coordinates, so every
+# commitment v * G + r * H costs two full 256 bit scalar multiplications with a modular
+# inversion for every point addition.
+# G and H never change, so this module precomputes windowed tables of their multiples once
+# and evaluates scalar multiplications as a short run of table look-ups and additions.
+# Intermediate points are kept in Jacobian coordinates (X, Y, Z) which represent the affine
+# point (X / Z^2, Y / Z^3) so that additions do not need a modular inversion.
+
+import threading
+from collections import OrderedDict
+
+# Domain parameters for the `secp256k1` curve
+# (as defined in http://www.secg.org/sec2-v2.pdf)
+P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+# Jacobian point at infinity - any point with Z == 0
+INFINITY = (1, 1, 0)
+
+
+def inverse_mod(a, m=P):
+    """Modular inverse of a for a prime modulus m (Fermat's little theorem).
+
+    Args:
+        a (int): value to invert, must not be a multiple of m
+        m (int, optional): prime modulus. Defaults to the field prime P.
+
+    Returns:
+        int: a^-1 mod m
+    """
+    return pow(a, m - 2, m)
+
+
+def jacobian_double(point):
+    """Doubles a point in Jacobian coordinates on y^2 = x^3 + 7.
+
+    Args:
+        point (tuple): (X, Y, Z) Jacobian point
+
+    Returns:
+        tuple: 2 * point in Jacobian coordinates
+    """
+    x1, y1, z1 = point
+    if z1 == 0 or y1 == 0:
+        return INFINITY
+    yy = y1 * y1 % P
+    s = 4 * x1 * yy % P
+    m = 3 * x1 * x1 % P  # a == 0 for secp256k1
+    x3 = (m * m - 2 * s) % P
+    y3 = (m * (s - x3) - 8 * yy * yy) % P
+    z3 = 2 * y1 * z1 % P
+    return (x3, y3, z3)
+
+
+def jacobian_add(point1, point2):
+    """Adds two points in Jacobian coordinates.
+
+    Args:
+        point1 (tuple): (X, Y, Z) Jacobian point
+        point2 (tuple): (X, Y, Z) Jacobian point
+
+    Returns:
+        tuple: point1 + point2 in Jacobian coordinates
+    """
+    x1, y1, z1 = point1
+    x2, y2, z2 = point2
+    if z1 == 0:
+        return point2
+    if z2 == 0:
+        return point1
+    z1z1 = z1 * z1 % P
+    z2z2 = z2 * z2 % P
+    u1 = x1 * z2z2 % P
+    u2 = x2 * z1z1 % P
+    s1 = y1 * z2 * z2z2 % P
+    s2 = y2 * z1 * z1z1 % P
+    if u1 == u2:
+        if s1 != s2:
+            return INFINITY
+        return jacobian_double(point1)
+    h = (u2 - u1) % P
+    hh = h * h % P
+    hhh = h * hh % P
+    rr = (s2 - s1) % P
+    v = u1 * hh % P
+    x3 = (rr * rr - hhh - 2 * v) % P
+    y3 = (rr * (v - x3) - s1 * hhh) % P
+    z3 = h * z1 * z2 % P
+    return (x3, y3, z3)
+
+
+def jacobian_add_affine(point1, point2):
+    """Adds an affine point to a Jacobian point (mixed addition, Z2 == 1).
+
+    Args:
+        point1 (tuple): (X, Y, Z) Jacobian point
+        point2 (tuple): (x, y) affine point
+
+    Returns:
+        tuple: point1 + point2 in Jacobian coordinates
+    """
+    x1, y1, z1 = point1
+    x2, y2 = point2
+    if z1 == 0:
+        return (x2, y2, 1)
+    z1z1 = z1 * z1 % P
+    u2 = x2 * z1z1 % P
+    s2 = y2 * z1 * z1z1 % P
+    if x1 == u2:
+        if y1 != s2:
+            return INFINITY
+        return jacobian_double(point1)
+    h = (u2 - x1) % P
+    hh = h * h % P
+    hhh = h * hh % P
+    rr = (s2 - y1) % P
+    v = x1 * hh % P
+    x3 = (rr * rr - hhh - 2 * v) % P
+    y3 = (rr * (v - x3) - y1 * hhh) % P
+    z3 = h * z1 % P
+    return (x3, y3, z3)
+
+
+def to_affine(point):
+    """Converts a Jacobian point to affine coordinates.
+
+    Args:
+        point (tuple): (X, Y, Z) Jacobian point
+
+    Returns:
+        tuple: (x, y) affine point or None for the point at infinity
+    """
+    x, y, z = point
+    if z == 0:
+        return None
+    z_inv = inverse_mod(z)
+    z_inv2 = z_inv * z_inv % P
+    return (x * z_inv2 % P, y * z_inv2 * z_inv % P)
+
+
+def batch_to_affine(points):
+    """Converts many Jacobian points to affine coordinates with a single inversion.
+
+    Uses Montgomery's trick: the Z values are multiplied together, the product is
+    inverted once and the individual inverses are recovered by back substitution.
+
+    Args:
+        points (list): (X, Y, Z) Jacobian points
+
+    Returns:
+        list: (x, y) affine points, None for points at infinity
+    """
+    prefix = []
+    acc = 1
+    for x, y, z in points:
+        prefix.append(acc)
+        if z != 0:
+            acc = acc * z % P
+    acc_inv = inverse_mod(acc)
+    affine = [None] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        x, y, z = points[i]
+        if z == 0:
+            continue
+        z_inv = acc_inv * prefix[i] % P
+        acc_inv = acc_inv * z % P
+        z_inv2 = z_inv * z_inv % P
+        affine[i] = (x * z_inv2 % P, y * z_inv2 * z_inv % P)
+    return affine
+
+
+class FixedBaseTable:
+    """Precomputed windowed table of multiples of a fixed base point.
+
+    The scalar is split into windows of `window` bits. Row i of the table holds
+    j * 2^(window * i) * base for j = 1 .. 2^window - 1 as affine points, so a
+    scalar multiplication is one mixed addition per non-zero window and no doublings.
+    """
+
+    def __init__(self, base, window=8, bits=256):
+        """Builds the table.
+
+        Args:
+            base (tuple): (x, y) affine base point
+            window (int, optional): window width in bits. Defaults to 8.
+            bits (int, optional): maximum scalar size in bits. Defaults to 256.
+        """
+        self.base = base
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.rows = []
+        row_base = (base[0], base[1], 1)
+        for _ in range((bits + window - 1) // window):
+            multiples = [row_base]
+            for _ in range(self.mask - 1):
+                multiples.append(jacobian_add(multiples[-1], row_base))
+            self.rows.append(batch_to_affine(multiples))
+            # the next row starts at 2^window * row_base
+            row_base = jacobian_add(multiples[-1], row_base)
+
+    def multiply(self, k):
+        """Multiplies the base point by a scalar.
+
+        Args:
+            k (int): scalar, reduced modulo the group order N
+
+        Returns:
+            tuple: k * base in Jacobian coordinates
+        """
+        k %= N
+        acc = INFINITY
+        row = 0
+        while k:
+            digit = k & self.mask
+            if digit:
+                acc = jacobian_add_affine(acc, self.rows[row][digit - 1])
+            k >>= self.window
+            row += 1
+        return acc
+
+
+def fixed_base_multi_mul(tables, scalars):
+    """Calculates k_1 * B_1 + ... + k_m * B_m for fixed bases B_i (Straus / Shamir's trick).
+
+    The windows of all scalars are walked in a single pass and added into one
+    accumulator, so the terms share the additions instead of being multiplied
+    separately and summed.
+
+    Args:
+        tables (list): FixedBaseTable for each base, all with the same window width
+        scalars (list): scalar for each base
+
+    Returns:
+        tuple: the linear combination in Jacobian coordinates
+    """
+    window = tables[0].window
+    mask = tables[0].mask
+    ks = [k % N for k in scalars]
+    acc = INFINITY
+    row = 0
+    while any(ks):
+        for i, table in enumerate(tables):
+            digit = ks[i] & mask
+            if digit:
+                acc = jacobian_add_affine(acc, table.rows[row][digit - 1])
+            ks[i] >>= window
+        row += 1
+    return acc
+
+
+def fixed_base_batch_mul(tables, scalars_list):
+    """Calculates k_1 * B_1 + ... + k_m * B_m for fixed bases B_i and many sets of scalars.
+
+    The tables are walked once for the whole batch, row by row. The accumulators are
+    kept in affine coordinates and all additions of one row of one table are done
+    together with a single modular inversion (Montgomery's trick), so an addition costs
+    a few multiplications instead of a Jacobian mixed addition and no conversion to
+    affine coordinates is needed at the end.
+
+    Args:
+        tables (list): FixedBaseTable for each base, all with the same window width
+        scalars_list (list): scalars for each base, one tuple per result
+
+    Returns:
+        list: (x, y) affine linear combination for each tuple of scalars, None for
+              the point at infinity
+    """
+    window = tables[0].window
+    mask = tables[0].mask
+    ks = [[k % N for k in scalars] for scalars in scalars_list]
+    accs = [None] * len(ks)
+    for row in range(len(tables[0].rows)):
+        shift = window * row
+        for i, table in enumerate(tables):
+            table_row = table.rows[row]
+            pending = []  # (index of the accumulator, affine point to add)
+            for j, scalars in enumerate(ks):
+                digit = (scalars[i] >> shift) & mask
+                if not digit:
+                    continue
+                if accs[j] is None:
+                    accs[j] = table_row[digit - 1]
+                else:
+                    pending.append((j, table_row[digit - 1]))
+            if pending:
+                batch_add_affine(accs, pending)
+    return accs
+
+
+def batch_add_affine(accs, pending):
+    """Adds affine points to affine accumulators with one modular inversion.
+
+    Args:
+        accs (list): (x, y) affine accumulators, updated in place
+        pending (list): (index into accs, (x, y) affine point) pairs, an index at most once
+    """
+    # denominator of the slope of each addition, 0 if the result is the point at infinity
+    denominators = []
+    for j, (x2, y2) in pending:
+        x1, y1 = accs[j]
+        if x1 != x2:
+            denominators.append((x2 - x1) % P)
+        elif y1 == y2 and y1 != 0:
+            denominators.append(2 * y1 % P)  # doubling
+        else:
+            denominators.append(0)
+    prefix = []
+    product = 1
+    for d in denominators:
+        prefix.append(product)
+        if d:
+            product = product * d % P
+    product_inv = inverse_mod(product)
+    for index in range(len(pending) - 1, -1, -1):
+        d = denominators[index]
+        j, (x2, y2) = pending[index]
+        if not d:
+            accs[j] = None
+            continue
+        d_inv = product_inv * prefix[index] % P
+        product_inv = product_inv * d % P
+        x1, y1 = accs[j]
+        if x1 != x2:
+            slope = (y2 - y1) * d_inv % P
+        else:
+            slope = 3 * x1 * x1 * d_inv % P
+        x3 = (slope * slope - x1 - x2) % P
+        accs[j] = (x3, (slope * (x1 - x3) - y1) % P)
+
+
+def multi_scalar_mul(points, scalars):
+    """Calculates k_1 * P_1 + ... + k_n * P_n for variable points (Pippenger's bucket method).
+
+    The scalars are cut into windows of c bits. For each window every point is added
+    once into the bucket selected by its digit, and the buckets are combined with
+    running sums, so the cost is about (bits / c) * (n + 2^c) additions instead of
+    n separate scalar multiplications.
+
+    Args:
+        points (list): (X, Y, Z) Jacobian points
+        scalars (list): scalar for each point
+
+    Returns:
+        tuple: the linear combination in Jacobian coordinates
+    """
+    ks = [k % N for k in scalars]
+    if not ks:
+        return INFINITY
+    bits = max(ks).bit_length()
+    c = max(
+        2, min(16, len(ks).bit_length() - 4)
+    )  # about log2(n) - 4, tuned for CPython
+    mask = (1 << c) - 1
+    result = INFINITY
+    for shift in range(((bits + c - 1) // c - 1) * c, -1, -c):
+        for _ in range(c):
+            result = jacobian_double(result)
+        buckets = [INFINITY] * mask
+        for point, k in zip(points, ks):
+            digit = (k >> shift) & mask
+            if digit:
+                if point[2] == 1:
+                    buckets[digit - 1] = jacobian_add_affine(
+                        buckets[digit - 1], (point[0], point[1])
+                    )
+                else:
+                    buckets[digit - 1] = jacobian_add(buckets[digit - 1], point)
+        # sum of j * bucket[j] = bucket[top] + (bucket[top] + bucket[top - 1]) + ...
+        running = INFINITY
+        window_sum = INFINITY
+        for bucket in reversed(buckets):
+            running = jacobian_add(running, bucket)
+            window_sum = jacobian_add(window_sum, running)
+        result = jacobian_add(result, window_sum)
+    return result
+
+
+# Point decompression
+# For secp256k1 P = 3 mod 4, so the square root of a quadratic residue a is
+# a^((P + 1) / 4) mod P - a single modular exponentiation.
+
+SQRT_EXPONENT = (P + 1) // 4
+
+
+def decompress(x, y_odd):
+    """Recovers the affine point from its x coordinate and the parity of y.
+
+    Args:
+        x (int): x coordinate
+        y_odd (bool or int): True/1 if y is odd
+
+    Returns:
+        tuple: (x, y) affine point
+
+    Raises:
+        ValueError: If there is no point on the curve with this x coordinate.
+    """
+    if not 0 <= x < P:
+        raise ValueError("x coordinate is not in the field")
+    rhs = (pow(x, 3, P) + 7) % P
+    y = pow(rhs, SQRT_EXPONENT, P)
+    if y * y % P != rhs:
+        raise ValueError("Point is not on the curve")
+    if bool(y_odd) != bool(y & 1):
+        y = P - y
+    return (x, y)
+
+
+class PointDecompressor:
+    """Point decompression with a bounded LRU cache keyed on (x, y odd).
+
+    The same supplier commitments are read back for every downstream product, so
+    decompressed points are kept in the cache. Hits and misses are counted so that
+    the cache can be sized.
+    """
+
+    def __init__(self, maxsize=65536):
+        """
+        Args:
+            maxsize (int, optional): maximum number of cached points. Defaults to 65536.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decompress(self, compressed_point):
+        """Decompresses a point, using the cache.
+
+        Args:
+            compressed_point (tuple): (x, y odd)
+
+        Returns:
+            tuple: (x, y) affine point
+
+        Raises:
+            ValueError: If there is no point on the curve with this x coordinate.
+        """
+        key = (compressed_point[0], bool(compressed_point[1]))
+        with self._lock:
+            y = self._cache.get(key)
+            if y is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return (key[0], y)
+            self.misses += 1
+        affine = decompress(key[0], key[1])
+        with self._lock:
+            self._cache[key] = affine[1]
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return affine
+
+    def decompress_many(self, compressed_points):
+        """Decompresses a batch of points, each distinct point is decompressed once.
+
+        Args:
+            compressed_points (list): (x, y odd) tuples
+
+        Returns:
+            list: (x, y) affine points in the same order
+
+        Raises:
+            ValueError: If there is no point on the curve for one of the x coordinates.
+        """
+        decompressed = {}
+        points = []
+        for compressed_point in compressed_points:
+            key = (compressed_point[0], bool(compressed_point[1]))
+            if key not in decompressed:
+                decompressed[key] = self.decompress(key)
+            points.append(decompressed[key])
+        return points
+
+    def cache_info(self):
+        """Returns the cache statistics.
+
+        Returns:
+            dict: hits, misses, size and maxsize of the cache
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Empties the cache and resets the statistics."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class JacobianPoint:
+    """Curve point held in Jacobian coordinates.
+
+    Supports the parts of the tinyec Point interface used by deploy.py: addition,
+    comparison and the affine x and y attributes. Sums stay in Jacobian coordinates;
+    the affine coordinates (one modular inversion) are only computed when x or y is read,
+    e.g. when the point is compressed for the blockchain.
+    """
+
+    __slots__ = ("jacobian", "_affine")
+
+    def __init__(self, jacobian):
+        self.jacobian = jacobian
+        self._affine = False  # False = not yet computed, None = point at infinity
+
+    @classmethod
+    def from_affine(cls, affine):
+        """Creates a point from affine coordinates.
+
+        Args:
+            affine (tuple): (x, y) affine point or None for the point at infinity
+
+        Returns:
+            JacobianPoint: the point with Z == 1
+        """
+        if affine is None:
+            return cls(INFINITY)
+        point = cls((affine[0], affine[1], 1))
+        point._affine = affine
+        return point
+
+    @classmethod
+    def lift(cls, point):
+        """Converts a JacobianPoint, tinyec Point or tinyec Inf to a JacobianPoint.
+
+        Args:
+            point: point on the elliptic curve
+
+        Returns:
+            JacobianPoint: the same point in Jacobian coordinates
+        """
+        if isinstance(point, cls):
+            return point
+        if getattr(point, "x", None) is None:  # tinyec Inf
+            return cls(INFINITY)
+        return cls.from_affine((point.x, point.y))
+
+    def affine(self):
+        """Returns the affine coordinates, computing them on first use.
+
+        Returns:
+            tuple: (x, y) affine point or None for the point at infinity
+        """
+        if self._affine is False:
+            self._affine = to_affine(self.jacobian)
+        return self._affine
+
+    def is_infinity(self):
+        return self.jacobian[2] == 0
+
+    @property
+    def x(self):
+        affine = self.affine()
+        return None if affine is None else affine[0]
+
+    @property
+    def y(self):
+        affine = self.affine()
+        return None if affine is None else affine[1]
+
+    def __add__(self, other):
+        if other == 0:  # accumulate_commitments uses 0 for "no commitment"
+            return self
+        other = JacobianPoint.lift(other)
+        if other._affine:
+            return JacobianPoint(jacobian_add_affine(self.jacobian, other._affine))
+        return JacobianPoint(jacobian_add(self.jacobian, other.jacobian))
+
+    __radd__ = __add__
+
+    def __eq__(self, other):
+        if isinstance(other, int) or other is None:
+            return NotImplemented
+        other = JacobianPoint.lift(other)
+        x1, y1, z1 = self.jacobian
+        x2, y2, z2 = other.jacobian
+        if z1 == 0 or z2 == 0:
+            return z1 == 0 and z2 == 0
+        # compare X1 / Z1^2 == X2 / Z2^2 and Y1 / Z1^3 == Y2 / Z2^3 without inversions
+        z1z1 = z1 * z1 % P
+        z2z2 = z2 * z2 % P
+        return (
+            x1 * z2z2 % P == x2 * z1z1 % P and y1 * z2 * z2z2 % P == y2 * z1 * z1z1 % P
+        )
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        affine = self.affine()
+        if affine is None:
+            return "Inf on secp256k1"
+        return "(%d, %d) on secp256k1" % affine
+
+
+# Point arithmetic backends for Ped_scheme
+# A backend creates the points returned by Ped_scheme and converts points passed to
+# accumulate_commitments so that sums are done with the backend's arithmetic.
+
+
+class JacobianBackend:
+    """Points are JacobianPoints - additions need no modular inversion."""
+
+    name = "jacobian"
+
+    def from_jacobian(self, jacobian):
+        return JacobianPoint(jacobian)
+
+    def from_affine(self, affine):
+        return JacobianPoint.from_affine(affine)
+
+    def lift(self, point):
+        return JacobianPoint.lift(point)
+
+
+class TinyecBackend:
+    """Points are tinyec Points - affine arithmetic with an inversion per addition."""
+
+    name = "tinyec"
+
+    def __init__(self, curve):
+        """
+        Args:
+            curve (tinyec Curve): curve used to create the tinyec points
+        """
+        self.curve = curve
+
+    def from_jacobian(self, jacobian):
+        return self.from_affine(to_affine(jacobian))
+
+    def from_affine(self, affine):
+        import tinyec.ec as tiny  # only needed for this backend
+
+        if affine is None:
+            return tiny.Inf(self.curve)
+        return tiny.Point(self.curve, affine[0], affine[1])
+
+    def lift(self, point):
+        if isinstance(point, JacobianPoint):
+            return self.from_affine(point.affine())
+        return point
@@ -0,0 +1,326 @@
+# Incremental index of ProductGHGFootPrint events
+#
+# Following changes to thousands of product contracts by polling get_ghgfootprints() and
+# get_total_ghg() on each of them costs calls per contract per poll. The contracts emit
+# DescriptionSet, GHGFootPrintSet and TotalGHGSet events and the factory emits
+# ProductCreated, so the indexer pulls the logs of a block range with one eth_getLogs
+# call and keeps the products, descriptions, footprints, links and totals in a SQLite
+# database. The last indexed block is stored in the same database transaction as the
+# data of its range, so an interrupted sync resumes from the checkpoint without gaps or
+# duplicates.
+# A range that the node refuses (too many logs) is split in half and retried.
+
+import json
+import sqlite3
+
+from eth_utils import event_abi_to_log_topic
+
+from footprint_codec import decode_footprint
+
+PRODUCT_EVENTS = ("DescriptionSet", "GHGFootPrintSet", "TotalGHGSet")
+FACTORY_EVENTS = ("ProductCreated",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (name TEXT PRIMARY KEY, block INTEGER);
+CREATE TABLE IF NOT EXISTS products (
+    address TEXT PRIMARY KEY, owner TEXT, factory TEXT, block INTEGER);
+CREATE TABLE IF NOT EXISTS descriptions (
+    address TEXT PRIMARY KEY, owner TEXT, owner_name TEXT, productID TEXT,
+    product_name TEXT, status TEXT, block INTEGER);
+CREATE TABLE IF NOT EXISTS footprints (
+    address TEXT, fp_id INTEGER, scope INTEGER, disaggregation INTEGER, category TEXT,
+    linked_contract TEXT, linked_ids TEXT, no_units INTEGER, commitment_x TEXT,
+    commitment_y_odd INTEGER, block INTEGER, PRIMARY KEY (address, fp_id));
+CREATE TABLE IF NOT EXISTS links (
+    address TEXT, fp_id INTEGER, linked_contract TEXT, linked_id INTEGER,
+    PRIMARY KEY (address, fp_id, linked_id));
+CREATE INDEX IF NOT EXISTS links_by_supplier ON links (linked_contract, linked_id);
+CREATE TABLE IF NOT EXISTS totals (
+    address TEXT PRIMARY KEY, total INTEGER, commitment_x TEXT, commitment_y_odd INTEGER,
+    r TEXT, r_overflow TEXT, block INTEGER);
+"""
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+class EventIndexer:
+    """Indexes the events of ProductGHGFootPrint contracts and their factories in SQLite."""
+
+    def __init__(
+        self,
+        web3,
+        product_abi,
+        factory_abi=None,
+        factories=(),
+        products=(),
+        path="ghg_events.sqlite",
+        start_block=0,
+        confirmations=0,
+        step=2000,
+    ):
+        """
+        Args:
+            web3 (Web3): connection to the node, e.g. brownie.web3
+            product_abi (list): ABI of ProductGHGFootPrint, e.g. ProductGHGFootPrint.abi
+            factory_abi (list, optional): ABI of ProductGHGFootPrintFactory.
+            factories (list, optional): factory addresses, their products are indexed
+                                        from the block they are created in.
+            products (list, optional): product addresses to index. If neither factories nor
+                                       products are given every contract emitting the events
+                                       is indexed.
+            path (str, optional): SQLite database file. Defaults to "ghg_events.sqlite".
+            start_block (int, optional): first block of the first sync. Defaults to 0.
+            confirmations (int, optional): number of most recent blocks left out because
+                                           they may still be reorganised. Defaults to 0.
+            step (int, optional): number of blocks per eth_getLogs call to start with.
+                                  Defaults to 2000.
+        """
+        self.web3 = web3
+        self.confirmations = confirmations
+        self.step = step
+        self.factories = {str(address) for address in factories}
+        self.watch_all = not factories and not products
+        self.product_contract = web3.eth.contract(abi=product_abi)
+        self.factory_contract = (
+            web3.eth.contract(abi=factory_abi) if factory_abi is not None else None
+        )
+        self.events = {}  # topic -> event for decoding
+        self.add_events(self.product_contract, product_abi, PRODUCT_EVENTS)
+        if self.factory_contract is not None:
+            self.add_events(self.factory_contract, factory_abi, FACTORY_EVENTS)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(
+            "INSERT OR IGNORE INTO checkpoint VALUES ('last_block', ?)",
+            (start_block - 1,),
+        )
+        self.connection.commit()
+        self.watch(products)
+        self.calls = 0
+
+    def add_events(self, contract, abi, names):
+        for entry in abi:
+            if entry["type"] == "event" and entry["name"] in names:
+                topic = "0x" + event_abi_to_log_topic(entry).hex()
+                self.events[topic] = getattr(contract.events, entry["name"])()
+
+    def watch(self, addresses, block=None):
+        """Adds product contracts to index."""
+        with self.connection:
+            for address in addresses:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO products (address, block) VALUES (?, ?)",
+                    (str(address), block),
+                )
+
+    @property
+    def last_block(self):
+        return self.connection.execute(
+            "SELECT block FROM checkpoint WHERE name = 'last_block'"
+        ).fetchone()[0]
+
+    def is_product(self, address):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM products WHERE address = ?", (address,)
+            ).fetchone()
+            is not None
+        )
+
+    def sync(self, to_block=None):
+        """
+        Indexes the logs from the block after the checkpoint up to a block.
+
+        Args:
+            to_block (int, optional): last block to index. Defaults to the latest block
+                                      less the confirmations.
+
+        Returns:
+            int: number of events indexed
+        """
+        if to_block is None:
+            to_block = self.web3.eth.block_number - self.confirmations
+        indexed = 0
+        start = self.last_block + 1
+        while start <= to_block:
+            end = min(to_block, start + self.step - 1)
+            try:
+                self.calls += 1
+                logs = self.web3.eth.get_logs(
+                    {
+                        "fromBlock": start,
+                        "toBlock": end,
+                        "topics": [list(self.events)],
+                    }
+                )
+            except Exception:
+                # most likely too many logs in the range - retry with a smaller range
+                if end == start:
+                    raise
+                self.step = max(1, (end - start + 1) // 2)
+                continue
+            with self.connection:  # one database transaction per range
+                for log in sorted(
+                    logs, key=lambda log: (log["blockNumber"], log["logIndex"])
+                ):
+                    indexed += self.index_log(log)
+                self.connection.execute(
+                    "UPDATE checkpoint SET block = ? WHERE name = 'last_block'", (end,)
+                )
+            start = end + 1
+        return indexed
+
+    def index_log(self, log):
+        """Stores one log, returns 1 if it was indexed and 0 if it was ignored."""
+        topic = log["topics"][0]
+        topic = topic.hex() if not isinstance(topic, str) else topic
+        if not topic.startswith("0x"):
+            topic = "0x" + topic
+        event = self.events.get(topic)
+        address = str(log["address"])
+        if event is None:
+            return 0
+        name = event.event_name
+        if name in FACTORY_EVENTS:
+            if address not in self.factories:
+                return 0
+        elif not self.watch_all and not self.is_product(address):
+            return 0
+        args = event.processLog(log)["args"]
+        block = log["blockNumber"]
+
+        if name == "ProductCreated":
+            self.connection.execute(
+                "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)",
+                (str(args["product"]), str(args["owner"]), address, block),
+            )
+        elif name == "DescriptionSet":
+            self.connection.execute(
+                "INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    address,
+                    str(args["owner"]),
+                    args["owner_name"],
+                    args["productID"],
+                    args["product_name"],
+                    args["status"],
+                    block,
+                ),
+            )
+        elif name == "GHGFootPrintSet":
+            footprint = decode_footprint(args["footprint"])  # category code to text
+            linked_contract = footprint["GHGFootprint_linked_contract"]
+            linked_ids = footprint["GHGFootprint_IDs"]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO footprints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    address,
+                    footprint["GHGFootPrint_ID"],
+                    footprint["GHGFootPrint_scope"],
+                    footprint["GHGFootPrint_disaggregation"],
+                    footprint["GHGFootPrint_category"],
+                    linked_contract,
+                    json.dumps(linked_ids),
+                    footprint["GHGFootprint_no_units"],
+                    str(footprint["GHGFootPrint_commitment"][0]),
+                    footprint["GHGFootPrint_commitment"][1],
+                    block,
+                ),
+            )
+            if linked_contract != ZERO_ADDRESS:
+                for linked_id in linked_ids:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?)",
+                        (
+                            address,
+                            footprint["GHGFootPrint_ID"],
+                            linked_contract,
+                            linked_id,
+                        ),
+                    )
+        elif name == "TotalGHGSet":
+            self.connection.execute(
+                "INSERT OR REPLACE INTO totals VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    address,
+                    args["total_GHGFootPrint"],
+                    str(args["commitment_x"]),
+                    int(args["commitment_y_odd"]),
+                    str(args["r"]),
+                    str(args["r_overflow"]),
+                    block,
+                ),
+            )
+        return 1
+
+    # Queries of the index
+
+    def products(self):
+        """Returns the addresses of the indexed product contracts."""
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT address FROM products ORDER BY block"
+            )
+        ]
+
+    def footprints(self, address):
+        """Returns the indexed footprints of a product as dicts, ordered by ID."""
+        cursor = self.connection.execute(
+            "SELECT fp_id, scope, disaggregation, category, linked_contract, linked_ids, "
+            "no_units, commitment_x, commitment_y_odd, block FROM footprints "
+            "WHERE address = ? ORDER BY fp_id",
+            (str(address),),
+        )
+        return [
+            {
+                "GHGFootPrint_ID": row[0],
+                "GHGFootPrint_scope": row[1],
+                "GHGFootPrint_disaggregation": row[2],
+                "GHGFootPrint_category": row[3],
+                "GHGFootprint_linked_contract": row[4],
+                "GHGFootprint_IDs": json.loads(row[5]),
+                "GHGFootprint_no_units": row[6],
+                "GHGFootPrint_commitment": (int(row[7]), row[8]),
+                "block": row[9],
+            }
+            for row in cursor
+        ]
+
+    def customers(self, address, fp_id=None):
+        """Returns the (product address, GHG Footprint ID) of the footprints linking to a
+        supplier contract, or to one of its GHG Footprint IDs."""
+        if fp_id is None:
+            cursor = self.connection.execute(
+                "SELECT DISTINCT address, fp_id FROM links WHERE linked_contract = ?",
+                (str(address),),
+            )
+        else:
+            cursor = self.connection.execute(
+                "SELECT address, fp_id FROM links WHERE linked_contract = ? AND linked_id = ?",
+                (str(address), fp_id),
+            )
+        return [tuple(row) for row in cursor]
+
+    def total(self, address):
+        """Returns the indexed total of a product like get_total_ghg(), or None."""
+        row = self.connection.execute(
+            "SELECT total, commitment_x, commitment_y_odd, r, r_overflow FROM totals "
+            "WHERE address = ?",
+            (str(address),),
+        ).fetchone()
+        if row is None:
+            return None
+        return (row[0], int(row[1]), bool(row[2]), int(row[3]), int(row[4]))
+
+    def description(self, address):
+        """Returns the indexed (owner, owner_name, productID, product_name, status), or None."""
+        return self.connection.execute(
+            "SELECT owner, owner_name, productID, product_name, status FROM descriptions "
+            "WHERE address = ?",
+            (str(address),),
+        ).fetchone()
+
+    def close(self):
+        self.connection.close()
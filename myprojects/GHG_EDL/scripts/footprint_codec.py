@@ -0,0 +1,149 @@
+# Encoding of GHG footprints for the ProductGHGFootPrint contract
+#
+# The contract stores a footprint in a packed GHGFootPrint_struct: the ID, scope,
+# disaggregation, category code, number of units, commitment y parity and linked
+# contract address share one storage slot, the commitment x value takes a second one.
+# Together x and the y parity are the 33 bytes of a compressed point. The category is
+# stored as a uint16 code instead of the category text; CATEGORIES is the lookup table
+# of the codes. Codes are the positions in CATEGORIES, so new categories must only ever
+# be appended - changing the order changes the meaning of footprints already on chain.
+# encode_footprint converts a footprint of the `data` dictionary to the struct tuple for
+# set_ghgfootprints and decode_footprint converts a struct read from the contract (or
+# from a GHGFootPrintSet event) back to the dictionary shape.
+
+from collections.abc import Mapping
+
+# Category lookup table - code 0 is an uncategorised footprint
+CATEGORIES = (
+    "",
+    "Gross Scope 1 greenhouse gas emissions",
+    "Gross location based Scope 2 greenhouse gas emissions",
+    "Gross market based Scope 2 greenhouse gas emissions",
+    "Total indirect Scope 3 greenhouse gas emissions",
+    "Purchased Goods and services",
+    "Capital goods",
+    "Fuel and energy related activities",
+    "Upstream transportation and distribution",
+    "Waste generated in operations",
+    "Business travel",
+    "Employee commuting",
+    "Upstream leased assets",
+    "Downstream transportation and distribution",
+    "Processing of sold products",
+    "Product usage",
+    "End of life treatment of sold products",
+    "Downstream leased assets",
+    "Franchises",
+    "Investments",
+)
+
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+# Fields of GHGFootPrint_struct in the order of the contract
+FOOTPRINT_FIELDS = (
+    "GHGFootPrint_ID",
+    "GHGFootPrint_scope",
+    "GHGFootPrint_disaggregation",
+    "GHGFootPrint_category",
+    "GHGFootPrint_no_units",
+    "GHGFootPrint_commitment_y_odd",
+    "GHGFootPrint_contract",
+    "GHGFootPrint_commitment_x",
+    "contract_GHGFootPrint_IDs",
+    "GHGFootPrint_signature",
+)
+
+# Positions of the fields used by the verifier
+ID = FOOTPRINT_FIELDS.index("GHGFootPrint_ID")
+COMMITMENT_Y_ODD = FOOTPRINT_FIELDS.index("GHGFootPrint_commitment_y_odd")
+CONTRACT = FOOTPRINT_FIELDS.index("GHGFootPrint_contract")
+COMMITMENT_X = FOOTPRINT_FIELDS.index("GHGFootPrint_commitment_x")
+LINKED_IDS = FOOTPRINT_FIELDS.index("contract_GHGFootPrint_IDs")
+
+
+def category_code(category):
+    """
+    Returns the code of a category.
+
+    Args:
+        category (str): category text, e.g. "Gross Scope 1 greenhouse gas emissions"
+
+    Returns:
+        int: position of the category in CATEGORIES
+
+    Raises:
+        ValueError: If the category is not in CATEGORIES.
+    """
+    code = CATEGORY_CODES.get(category)
+    if code is None:
+        raise ValueError(
+            "Unknown GHG footprint category '"
+            + str(category)
+            + "', append it to CATEGORIES"
+        )
+    return code
+
+
+def category_name(code):
+    """
+    Returns the category text of a code.
+
+    Raises:
+        ValueError: If the code is not in CATEGORIES.
+    """
+    if not 0 <= code < len(CATEGORIES):
+        raise ValueError("Unknown GHG footprint category code " + str(code))
+    return CATEGORIES[code]
+
+
+def encode_footprint(footprint):
+    """
+    Returns the GHGFootPrint_struct tuple of a footprint for set_ghgfootprints.
+
+    Args:
+        footprint (dict): The GHG footprint dictionary with its link data and commitment set.
+
+    Returns:
+        tuple: The struct fields in the order of FOOTPRINT_FIELDS.
+    """
+    return (
+        footprint["GHGFootPrint_ID"],  # GHGFootPrint_ID
+        footprint["GHGFootPrint_scope"],  # Scope
+        footprint["GHGFootPrint_disaggregation"],  # disaggregation
+        category_code(footprint["GHGFootPrint_category"]),  # Category code
+        footprint["GHGFootprint_no_units"],  # units
+        bool(footprint["GHGFootPrint_commitment"][1]),  # commitment y odd
+        footprint["GHGFootprint_linked_contract"],  # linked contract
+        footprint["GHGFootPrint_commitment"][0],  # GHG footprint commitment x
+        footprint["GHGFootprint_IDs"],  # linked GHG FP IDs
+        0,  # signature
+    )
+
+
+def decode_footprint(struct):
+    """
+    Converts a GHGFootPrint_struct read from the contract to the footprint dictionary shape.
+
+    Args:
+        struct (tuple or dict): struct as returned by get_ghgfootprints or decoded from
+                                a GHGFootPrintSet event.
+
+    Returns:
+        dict: The footprint with the category text, the linked contract (the zero address
+              if not linked), the linked IDs and the compressed commitment (x, y odd).
+    """
+    if isinstance(struct, Mapping):
+        struct = [struct[field] for field in FOOTPRINT_FIELDS]
+    return {
+        "GHGFootPrint_ID": struct[ID],
+        "GHGFootPrint_scope": struct[1],
+        "GHGFootPrint_disaggregation": struct[2],
+        "GHGFootPrint_category": category_name(struct[3]),
+        "GHGFootprint_no_units": struct[4],
+        "GHGFootprint_linked_contract": str(struct[CONTRACT]),
+        "GHGFootprint_IDs": list(struct[LINKED_IDS]),
+        "GHGFootPrint_commitment": (
+            struct[COMMITMENT_X],
+            int(struct[COMMITMENT_Y_ODD]),
+        ),
+    }
@@ -0,0 +1,141 @@
+# Python client for the GHGFootPrintReader aggregator contract
+#
+# Reads the GHG Footprints and total GHG emissions of many ProductGHGFootPrint contracts
+# with one eth_call per chunk of contracts instead of two eth_calls per contract.
+# A call that reads too many contracts runs out of gas on the node, so a chunk that fails
+# with a gas (or response size) error is split in half and retried and later chunks use
+# the smaller size. Any other error, e.g. a revert or a lost connection, is raised at once.
+# get_ghgfootprints_by_ids reads only the GHG Footprint IDs a link selects from each contract.
+
+# Parts of the error messages of nodes for a call over the gas or response size limit
+GAS_ERRORS = (
+    "out of gas",
+    "gas required exceeds",
+    "exceeds block gas limit",
+    "response size",
+    "response too large",
+)
+
+
+def is_gas_error(error):
+    """Returns whether an error of a call means it needed too much gas or returned too much.
+
+    The node's error reaches us as a ValueError (web3), ContractLogicError (web3) or
+    VirtualMachineError (brownie), so the message is checked instead of the type.
+    """
+    message = str(error).lower()
+    return any(text in message for text in GAS_ERRORS)
+
+
+class FootprintReader:
+    """Bulk reader for ProductGHGFootPrint contracts using a deployed GHGFootPrintReader."""
+
+    def __init__(self, reader_contract, chunk_size=100):
+        """
+        Args:
+            reader_contract (ProjectContract): deployed GHGFootPrintReader contract
+            chunk_size (int, optional): number of product contracts read in one call to start with.
+                                        Defaults to 100.
+        """
+        self.reader_contract = reader_contract
+        self.chunk_size = chunk_size
+        self.calls = 0  # number of eth_calls made, for sizing the chunks
+
+    def read_chunked(self, function_name, addresses, *arguments):
+        """Calls a reader function for a list of addresses in chunks.
+
+        Args:
+            function_name (str): name of the GHGFootPrintReader function to call
+            addresses (list): product contract addresses
+            *arguments (list): further per-address argument lists, chunked with the addresses
+
+        Returns:
+            list: result of the function for each address, in the order of the addresses
+
+        Raises:
+            Exception: The error from the node if a single contract cannot be read or the
+                       call failed for another reason than gas.
+        """
+        addresses = [str(address) for address in addresses]
+        results = []
+        start = 0
+        while start < len(addresses):
+            chunk = addresses[start : start + self.chunk_size]
+            chunk_arguments = [
+                argument[start : start + len(chunk)] for argument in arguments
+            ]
+            try:
+                self.calls += 1
+                result = getattr(self.reader_contract, function_name)(
+                    chunk, *chunk_arguments
+                )
+            except Exception as error:
+                # over the node's gas limit for calls - retry with smaller chunks
+                if len(chunk) == 1 or not is_gas_error(error):
+                    raise
+                self.chunk_size = max(1, len(chunk) // 2)
+                continue
+            if function_name == "get_products":
+                result = zip(result[0], [tuple(total) for total in result[1]])
+            results.extend(result)
+            start += len(chunk)
+        return results
+
+    def get_ghgfootprints(self, addresses):
+        """Reads the GHG Footprints of many product contracts.
+
+        Args:
+            addresses (list): product contract addresses
+
+        Returns:
+            dict: get_ghgfootprints() result for each address
+        """
+        return dict(
+            zip(map(str, addresses), self.read_chunked("get_ghgfootprints", addresses))
+        )
+
+    def get_ghgfootprints_by_ids(self, nodes):
+        """Reads selected GHG Footprints of many product contracts.
+
+        Args:
+            nodes (list): (address, GHG Footprint IDs) pairs, empty IDs select every footprint
+
+        Returns:
+            dict: get_ghgfootprints_by_ids() result for each (address, frozenset of IDs)
+        """
+        nodes = [(str(address), frozenset(ids)) for address, ids in nodes]
+        results = self.read_chunked(
+            "get_ghgfootprints_by_ids",
+            [address for address, _ in nodes],
+            [sorted(ids) for _, ids in nodes],
+        )
+        return dict(zip(nodes, results))
+
+    def get_total_ghgs(self, addresses):
+        """Reads the total GHG emissions of many product contracts.
+
+        Args:
+            addresses (list): product contract addresses
+
+        Returns:
+            dict: get_total_ghg() result for each address
+        """
+        return {
+            address: tuple(total)
+            for address, total in zip(
+                map(str, addresses), self.read_chunked("get_total_ghgs", addresses)
+            )
+        }
+
+    def get_products(self, addresses):
+        """Reads the GHG Footprints and total GHG emissions of many product contracts.
+
+        Args:
+            addresses (list): product contract addresses
+
+        Returns:
+            dict: (get_ghgfootprints() result, get_total_ghg() result) for each address
+        """
+        return dict(
+            zip(map(str, addresses), self.read_chunked("get_products", addresses))
+        )
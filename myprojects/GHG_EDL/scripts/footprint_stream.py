@@ -0,0 +1,318 @@
+# Streaming ingestion of GHG footprints from CSV or JSONL files
+#
+# The footprints are read in the column layout that print_smart_contract writes to
+# footprints.csv, with two more columns, company and product, naming the entry of the
+# `data` dictionary the footprint belongs to. JSONL files have one footprint per line
+# with the same keys. Empty CSV cells are left out of the footprint dictionary, so a
+# linked footprint has no GHGFootprint_value as in footprint.py.
+# Every stage is a generator that holds at most one chunk of footprints, so memory
+# stays flat whatever the size of the inventory:
+#     read_footprints -> product_chunks -> commit_chunks -> upload
+# The rows of a product do not have to be next to each other in the file, but chunks
+# only contain consecutive rows of the same product.
+# The contract stores only the commitments, so the r of every committed footprint is
+# written to a JSONL sidecar file as the chunks stream past - without it the uploaded
+# commitments could never be opened. The sidecar is read back by read_footprints and
+# sidecar_supply_chain reduces it to the footprints the product totals need.
+# The sidecar holds the blinding factors r, so it must be kept as private as the values.
+
+import ast
+import csv
+import json
+import os
+
+from pedersen import accumulate_commitments
+
+COMPANY_COLUMN = "company"
+PRODUCT_COLUMN = "product"
+
+# Parsers of the footprint columns, other columns are kept as text
+INTEGER_COLUMNS = [
+    "GHGFootPrint_ID",
+    "GHGFootPrint_scope",
+    "GHGFootPrint_disaggregation",
+    "GHGFootPrint_commitment_r",
+    "GHGFootprint_no_units",
+]
+LITERAL_COLUMNS = ["GHGFootPrint_commitment", "GHGFootprint_IDs"]  # tuples and lists
+
+
+def parse_value(value):
+    """Parses a GHG footprint value, "1000.0" as written by pandas becomes 1000."""
+    value = float(value)
+    if value.is_integer():
+        return int(value)
+    return value
+
+
+def parse_csv_row(row):
+    """
+    Converts a CSV row to a footprint dictionary.
+
+    Args:
+        row (dict): CSV row from csv.DictReader.
+
+    Returns:
+        dict: The footprint, with the company and product columns and without empty cells.
+    """
+    footprint = {}
+    for column, cell in row.items():
+        if column is None or column == "" or cell is None or cell == "":
+            continue  # pandas index column or empty cell
+        if column in INTEGER_COLUMNS:
+            footprint[column] = int(float(cell)) if "." in cell else int(cell)
+        elif column in LITERAL_COLUMNS:
+            footprint[column] = ast.literal_eval(cell)
+        elif column == "GHGFootprint_value":
+            footprint[column] = parse_value(cell)
+        else:
+            footprint[column] = cell
+    if "GHGFootPrint_commitment" in footprint:
+        footprint["GHGFootPrint_commitment"] = tuple(
+            footprint["GHGFootPrint_commitment"]
+        )
+    return footprint
+
+
+def read_footprints(path):
+    """
+    Reads footprints from a CSV or JSONL file one at a time.
+
+    Args:
+        path (str): File path, files ending in .jsonl or .json are read as JSONL, others as CSV.
+
+    Yields:
+        dict: Footprint dictionaries with "company" and "product" keys.
+
+    Raises:
+        ValueError: If a footprint has no company or product.
+    """
+    with open(path, newline="") as file:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = (parse_csv_row(row) for row in csv.DictReader(file))
+        for line, footprint in enumerate(rows, start=1):
+            if COMPANY_COLUMN not in footprint or PRODUCT_COLUMN not in footprint:
+                raise ValueError(
+                    "Footprint "
+                    + str(line)
+                    + " in "
+                    + path
+                    + " has no company or product"
+                )
+            if "GHGFootprint_IDs" in footprint:
+                footprint["GHGFootprint_IDs"] = list(footprint["GHGFootprint_IDs"])
+            if "GHGFootPrint_commitment" in footprint:  # a JSON list
+                footprint["GHGFootPrint_commitment"] = tuple(
+                    footprint["GHGFootPrint_commitment"]
+                )
+            yield footprint
+
+
+def product_keys(path):
+    """
+    Reads the products in a file without keeping the footprints.
+
+    Args:
+        path (str): CSV or JSONL file path.
+
+    Returns:
+        dict: List of product names for each company, in the order they first appear.
+    """
+    products = {}
+    for footprint in read_footprints(path):
+        company_products = products.setdefault(footprint[COMPANY_COLUMN], [])
+        if footprint[PRODUCT_COLUMN] not in company_products:
+            company_products.append(footprint[PRODUCT_COLUMN])
+    return products
+
+
+def product_chunks(footprints, chunk_size=1000):
+    """
+    Groups consecutive footprints of the same product into chunks.
+
+    Args:
+        footprints (iterable): Footprint dictionaries with "company" and "product" keys.
+        chunk_size (int, optional): Maximum number of footprints per chunk. Defaults to 1000.
+
+    Yields:
+        tuple: (company, product, list of footprints without the company and product keys)
+    """
+    key = None
+    chunk = []
+    for footprint in footprints:
+        footprint_key = (footprint.pop(COMPANY_COLUMN), footprint.pop(PRODUCT_COLUMN))
+        if chunk and (footprint_key != key or len(chunk) >= chunk_size):
+            yield key[0], key[1], chunk
+            chunk = []
+        key = footprint_key
+        chunk.append(footprint)
+    if chunk:
+        yield key[0], key[1], chunk
+
+
+def commit_footprints(p, footprints):
+    """
+    Creates the commitments of a list of footprints like `create_commitments` does for a product.
+
+    The values are committed as one batch with `commit_many` and verified with one randomized
+    batch check. Footprints without a value get the commitment (0, 0) and r 0.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        footprints (list): Footprint dictionaries, updated in place.
+
+    Raises:
+        AssertionError: If the commitment verification fails.
+    """
+    committed = [
+        footprint for footprint in footprints if "GHGFootprint_value" in footprint
+    ]
+    values = [int(footprint["GHGFootprint_value"]) for footprint in committed]
+    commitments = p.commit_many(values)
+    for footprint, commitment in zip(committed, commitments):
+        footprint["GHGFootPrint_commitment"] = commitment[0]
+        footprint["GHGFootPrint_commitment_r"] = commitment[1]
+
+    invalid = p.find_invalid_openings(
+        [
+            (commitment[0], value, commitment[1])
+            for commitment, value in zip(commitments, values)
+        ]
+    )
+    assert len(invalid) == 0, "Commitment failed for GHG Footprint IDs " + str(
+        [committed[i]["GHGFootPrint_ID"] for i in invalid]
+    )
+
+    for footprint in footprints:
+        if "GHGFootprint_value" not in footprint:
+            footprint["GHGFootPrint_commitment"] = (
+                0,
+                0,
+            )
+            footprint["GHGFootPrint_commitment_r"] = 0
+
+
+def commit_chunks(p, chunks):
+    """
+    Commits the footprint values of each chunk.
+
+    Footprints that already have a commitment in the file keep it, so a file written
+    by print_smart_contract can be uploaded again.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        chunks (iterable): (company, product, footprints) chunks from `product_chunks`.
+
+    Yields:
+        tuple: (company, product, footprints) with GHGFootPrint_commitment and
+               GHGFootPrint_commitment_r set.
+    """
+    for company, product, footprints in chunks:
+        commit_footprints(
+            p,
+            [
+                footprint
+                for footprint in footprints
+                if "GHGFootPrint_commitment" not in footprint
+            ],
+        )
+        yield company, product, footprints
+
+
+def sidecar_path(path):
+    """Returns the default sidecar file of an ingested file, e.g. inventory_committed.jsonl."""
+    return os.path.splitext(path)[0] + "_committed.jsonl"
+
+
+def write_committed(file, company, product, footprints):
+    """
+    Appends committed footprints to an open sidecar file, one JSON line per footprint.
+
+    The lines have the company and product columns, so the sidecar can be read with
+    `read_footprints` and ingested again - the footprints keep their commitments.
+
+    Args:
+        file (file): sidecar file opened for writing, flushed after the footprints.
+        company (str): company of the footprints.
+        product (str): product of the footprints.
+        footprints (list): footprints with GHGFootPrint_commitment and
+                           GHGFootPrint_commitment_r set.
+    """
+    for footprint in footprints:
+        row = dict(footprint)
+        row[COMPANY_COLUMN] = company
+        row[PRODUCT_COLUMN] = product
+        file.write(json.dumps(row, default=str) + "\n")
+    file.flush()
+
+
+def sidecar_supply_chain(p, path):
+    """
+    Reads a sidecar into the smallest `data` dictionary with the same product totals.
+
+    The file is read twice. The first pass collects the GHG Footprint IDs that linked
+    footprints select from their suppliers. The second pass keeps the linked footprints
+    and the selected footprints, and adds the value, commitment and r of every other
+    footprint into one footprint per product and scope (with GHG Footprint ID None, so no
+    link selects it). Memory grows with the number of links, not of footprints.
+    The result can be passed to SupplyChainRollup to calculate the totals.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        path (str): sidecar file written by `write_committed`.
+
+    Returns:
+        dict: GHG_Footprints of each product of each company, as in footprint.py.
+    """
+    selected = set()
+    for footprint in read_footprints(path):
+        if "GHGFootprint_linked_product" in footprint:
+            for fp_id in footprint.get("GHGFootprint_IDs", []):
+                selected.add(
+                    (
+                        footprint["GHGFootprint_supplier"],
+                        footprint["GHGFootprint_linked_product"],
+                        fp_id,
+                    )
+                )
+
+    data = {}
+    summed = {}  # summed footprint per (company, product, scope)
+    for footprint in read_footprints(path):
+        company = footprint.pop(COMPANY_COLUMN)
+        product = footprint.pop(PRODUCT_COLUMN)
+        footprints = data.setdefault(company, {}).setdefault(
+            product, {"GHG_Footprints": []}
+        )["GHG_Footprints"]
+        if (
+            "GHGFootprint_linked_product" in footprint
+            or (company, product, footprint["GHGFootPrint_ID"]) in selected
+        ):
+            footprints.append(footprint)
+            continue
+        if "GHGFootprint_value" not in footprint:
+            continue  # no value, commitment (0, 0)
+        key = (company, product, footprint["GHGFootPrint_scope"])
+        if key not in summed:
+            summed[key] = {
+                "GHGFootPrint_ID": None,
+                "GHGFootPrint_scope": footprint["GHGFootPrint_scope"],
+                "GHGFootprint_value": 0,
+                "GHGFootPrint_commitment": 0,
+                "GHGFootPrint_commitment_r": 0,
+            }
+            footprints.append(summed[key])
+        total = summed[key]
+        total["GHGFootprint_value"] += footprint["GHGFootprint_value"]
+        total["GHGFootPrint_commitment"] = accumulate_commitments(
+            total["GHGFootPrint_commitment"],
+            p.uncompress(footprint["GHGFootPrint_commitment"]),
+        )
+        total["GHGFootPrint_commitment_r"] += footprint["GHGFootPrint_commitment_r"]
+    for total in summed.values():
+        total["GHGFootPrint_commitment"] = p.compress_point(
+            total["GHGFootPrint_commitment"]
+        )
+    return data
@@ -0,0 +1,476 @@
+# Pedersen commitment scheme for the GHG Footprint BlockChain Project
+# The scheme has no dependency on brownie so that it can be imported by worker processes
+# and by scripts that do not connect to a blockchain.
+# tinyec and nummaster are only imported when a tinyec point or a point on another curve
+# is needed - the commitments use the arithmetic in ec_arithmetic.py.
+
+import random
+import secrets
+
+from ec_arithmetic import (
+    FixedBaseTable,
+    JacobianBackend,
+    JacobianPoint,
+    PointDecompressor,
+    batch_to_affine,
+    fixed_base_batch_mul,
+    fixed_base_multi_mul,
+    multi_scalar_mul,
+)
+from ec_arithmetic import P as SECP256K1_P
+
+# Utility functions to compress and decompress points on
+# an Elliptic curve
+# from https://cryptobook.nakov.com/asymmetric-key-ciphers/elliptic-curve-cryptography-ecc
+
+# Decompression engine for secp256k1 points with an LRU cache of decompressed points
+# shared by uncompress_point and Ped_scheme
+
+point_decompressor = PointDecompressor()
+
+
+def uncompress_point(compressed_point, p, a, b):
+    """
+    Uncompresses an elliptic curve point from its compressed form.
+    Points on secp256k1 are decompressed by the cached `point_decompressor`.
+    Args:
+        compressed_point (tuple): A tuple (x, is_odd) where x is the x-coordinate of the point
+                                  and is_odd is a boolean indicating if the y-coordinate is odd.
+        p (int): The prime modulus of the finite field.
+        a (int): The coefficient 'a' in the elliptic curve equation y^2 = x^3 + ax + b.
+        b (int): The coefficient 'b' in the elliptic curve equation y^2 = x^3 + ax + b.
+    Returns:
+        tuple: The uncompressed point (x, y) on the elliptic curve.
+    Raises:
+        ValueError: If a secp256k1 point is not on the curve.
+    """
+
+    if (p, a, b) == (SECP256K1_P, 0, 7):
+        return point_decompressor.decompress(compressed_point)
+
+    from nummaster.basic import sqrtmod
+
+    x, is_odd = compressed_point
+    y = sqrtmod(pow(x, 3, p) + a * x + b, p)
+    if bool(is_odd) == bool(y & 1):
+        return (x, y)
+    return (x, p - y)
+
+
+class TinyecAttribute:
+    """Class attribute of Ped_scheme holding a tinyec object, created on first access.
+
+    Only the tinyec point interface (uncompress_point_to_tinyec, TinyecBackend) needs
+    tinyec, so it is not imported by scripts that use the default backend.
+    """
+
+    def __init__(self, create):
+        """
+        Args:
+            create (callable): creates the tinyec object from the Ped_scheme class
+        """
+        self.create = create
+        self.value = None
+
+    def __get__(self, instance, owner):
+        if self.value is None:
+            self.value = self.create(owner)
+        return self.value
+
+
+def tinyec_curve(scheme):
+    # tinyec Curve of the Ped_scheme domain parameters
+    import tinyec.ec as tiny
+
+    return tiny.Curve(
+        scheme.a,
+        scheme.b,
+        tiny.SubGroup(scheme.p, scheme.g, scheme.n, scheme.h),
+        scheme.name,
+    )
+
+
+def tinyec_h(scheme):
+    # tinyec Point of the Ped_scheme generator H
+    import tinyec.ec as tiny
+
+    return tiny.Point(scheme.curve, scheme.H_x, scheme.H_y)
+
+
+class Ped_scheme:
+    # Class level variables
+    # Parameters of the elliptic curve
+
+    # Domain parameters for the `secp256k1` curve
+    # (as defined in http://www.secg.org/sec2-v2.pdf)
+    name = "secp256k1"
+    p = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+    n = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+    a = 0x0000000000000000000000000000000000000000000000000000000000000000
+    b = 0x0000000000000000000000000000000000000000000000000000000000000007
+    g = (
+        0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+        0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
+    )
+    h = 1
+    curve = TinyecAttribute(tinyec_curve)
+
+    # Cached decompression engine used for every commitment read back from the chain
+    decompressor = point_decompressor
+
+    # Utility functions to compress and decompress points on an Elliptic curve
+
+    def compress_point(self, point):
+        """Compresses a point on an Elliptic Curve. Returns x value and boolean
+
+        Args:
+            point (tinyec point): tinyec point e.g. curve.g.x
+
+        Returns:
+            tuple: (x value of point, boolean)
+        """
+        return (point.x, point.y % 2)
+
+    def uncompress_point_to_tinyec(self, compressed_point):
+        """Uncompress a point on an Elliptic Curve.
+
+        Args:
+            point (compressed point): x value of point and boolean
+
+        Returns:
+            tinyec point: point on elliptic curve
+        """
+        import tinyec.ec as tiny
+
+        x, y = Ped_scheme.decompressor.decompress(compressed_point)
+        return tiny.Point(Ped_scheme.curve, x, y)
+
+    def uncompress(self, compressed_point):
+        """Uncompress a point on an Elliptic Curve into a Ped_scheme.backend point.
+
+        Args:
+            point (compressed point): x value of point and boolean
+
+        Returns:
+            point on elliptic curve created by Ped_scheme.backend
+        """
+        return Ped_scheme.backend.from_affine(
+            Ped_scheme.decompressor.decompress(compressed_point)
+        )
+
+    def uncompress_many(self, compressed_points):
+        """Uncompress a batch of points on an Elliptic Curve into Ped_scheme.backend points.
+
+        Args:
+            compressed_points (list): x value of point and boolean for each point
+
+        Returns:
+            list: points on elliptic curve created by Ped_scheme.backend
+        """
+        return [
+            Ped_scheme.backend.from_affine(affine)
+            for affine in Ped_scheme.decompressor.decompress_many(compressed_points)
+        ]
+
+    # Value of H_x is SHA256 of G.x in Bitcoin
+    # https://github.com/AdamISZ/ConfidentialTransactionsDoc/blob/master/essayonCT.pdf
+    # Page 6
+
+    H_x = 36444060476547731421425013472121489344383018981262552973668657287772036414144
+    H_y = uncompress_point((H_x, False), p, a, b)[1]
+    H = TinyecAttribute(tinyec_h)
+
+    # Point arithmetic backend used for the points returned by commit and uncompress
+    # and for accumulating commitments. JacobianBackend keeps sums in Jacobian
+    # coordinates so additions need no modular inversion.
+    # Set Ped_scheme.backend = ec_arithmetic.TinyecBackend(Ped_scheme.curve) for tinyec
+    # affine points.
+
+    backend = JacobianBackend()
+
+    # Fixed-base tables of multiples of G and H
+    # built on first use and shared by all instances for every commit and verify
+
+    g_table = None
+    h_table = None
+
+    @classmethod
+    def fixed_base_tables(cls):
+        """Returns the precomputed tables for G and H, building them on first use.
+
+        Returns:
+            tuple: (FixedBaseTable for G, FixedBaseTable for H)
+        """
+        if cls.g_table is None or cls.h_table is None:
+            cls.g_table = FixedBaseTable(cls.g)
+            cls.h_table = FixedBaseTable((cls.H_x, cls.H_y))
+        return cls.g_table, cls.h_table
+
+    def commitment_point(self, v, r):
+        """Calculates v * G + r * H using the fixed-base tables.
+
+        Args:
+            v (integer): value to be committed to
+            r (integer): random number used for the commitment
+
+        Returns:
+            point on elliptic curve created by Ped_scheme.backend
+        """
+        return Ped_scheme.backend.from_jacobian(
+            fixed_base_multi_mul(Ped_scheme.fixed_base_tables(), (v, r))
+        )
+
+    def commit(self, v):
+        """Generate Pedersen Commitment
+
+        Args:
+            v (integer): value to be committed to
+
+        Returns:
+            point on elliptic curve created by Ped_scheme.backend
+            r (integer): random number below order (p) of elliptic curve
+        """
+        # r = secrets.randbelow(Ped_scheme.p) # use secrets library for better randomness
+        r = random.randint(1, Ped_scheme.p)
+        return (self.commitment_point(v, r), r)
+
+    def verify(self, c, v, r):
+        """Verify Pedersen Commitment
+
+        Args:
+            c (point on elliptic curve): pedersen commitment (tinyec or JacobianPoint)
+            v (integer): value that was committed
+            r (integer): random number used for the commitment
+
+        Returns:
+            True/False : Commitment is verified
+        """
+        # compared in Jacobian coordinates - no conversion to affine needed
+        return JacobianPoint.lift(c) == JacobianPoint(
+            fixed_base_multi_mul(Ped_scheme.fixed_base_tables(), (v, r))
+        )
+
+    def commit_many(self, values, rng=None):
+        """Generate Pedersen Commitments for a batch of values
+
+        The commitments v * G + r * H of the whole batch are evaluated in one walk over
+        the fixed-base tables (`fixed_base_batch_mul`): the additions of each table row
+        are done in affine coordinates for all values together, sharing one modular
+        inversion.
+
+        Args:
+            values (list of integers): values to be committed to
+            rng (random.Random, optional): source of the random numbers r.
+                                           Defaults to the module-level `random`.
+
+        Returns:
+            list: (compressed commitment, r) for each value, in the same order.
+                  The compressed commitments are ready for upload_footprints.
+        """
+        if rng is None:
+            rng = random
+        rs = [rng.randint(1, Ped_scheme.p) for _ in values]
+        tables = Ped_scheme.fixed_base_tables()
+        affine = fixed_base_batch_mul(tables, list(zip(values, rs)))
+        return [
+            ((point[0], point[1] % 2) if point is not None else (0, 0), r)
+            for point, r in zip(affine, rs)
+        ]
+
+    def verify_many(self, commitments, values, rs):
+        """Verify a batch of Pedersen Commitments
+
+        Args:
+            commitments (list): compressed commitments (x, y odd) or points on the elliptic curve
+            values (list of integers): values that were committed
+            rs (list of integers): random numbers used for the commitments
+
+        Returns:
+            list: True/False for each commitment
+        """
+        tables = Ped_scheme.fixed_base_tables()
+        expected = [fixed_base_multi_mul(tables, (v, r)) for v, r in zip(values, rs)]
+        # compressed commitments are compared with the compressed expected points,
+        # which are converted to affine together with one modular inversion
+        compressed = [isinstance(c, tuple) for c in commitments]
+        affine = batch_to_affine(
+            [e for e, is_compressed in zip(expected, compressed) if is_compressed]
+        )
+        affine.reverse()
+        results = []
+        for c, e, is_compressed in zip(commitments, expected, compressed):
+            if is_compressed:
+                point = affine.pop()
+                results.append(
+                    point is not None
+                    and c[0] == point[0]
+                    and bool(c[1]) == bool(point[1] & 1)
+                )
+            else:
+                results.append(JacobianPoint.lift(c) == JacobianPoint(e))
+        return results
+
+    # Randomized batch verification of Pedersen openings
+    # N openings (c_i, v_i, r_i) are all valid (with overwhelming probability) if for
+    # random weights w_i:  sum(w_i * c_i) - sum(w_i * v_i) * G - sum(w_i * r_i) * H == 0
+    # The left hand side is a single multi-scalar multiplication.
+
+    def opening_point(self, c):
+        """Converts a commitment to a Jacobian point for batch verification.
+
+        Args:
+            c: compressed commitment (x, y odd) or point on the elliptic curve
+
+        Returns:
+            tuple: (X, Y, Z) Jacobian point or None if c is not a point on the curve
+        """
+        if isinstance(c, tuple):
+            try:
+                affine = Ped_scheme.decompressor.decompress(c)
+            except ValueError:
+                return None
+            return (affine[0], affine[1], 1)
+        return JacobianPoint.lift(c).jacobian
+
+    def batch_check(self, points, values, rs):
+        """Checks a batch of openings with one random linear combination.
+
+        Args:
+            points (list): (X, Y, Z) Jacobian commitment points
+            values (list of integers): values that were committed
+            rs (list of integers): random numbers used for the commitments
+
+        Returns:
+            True/False : all openings are verified
+        """
+        # the weights must be unpredictable to whoever produced the commitments
+        weights = [secrets.randbits(128) | 1 for _ in points]
+        combined_v = sum(w * v for w, v in zip(weights, values))
+        combined_r = sum(w * r for w, r in zip(weights, rs))
+        return JacobianPoint(multi_scalar_mul(points, weights)) == JacobianPoint(
+            fixed_base_multi_mul(
+                Ped_scheme.fixed_base_tables(), (combined_v, combined_r)
+            )
+        )
+
+    def batch_verify(self, openings):
+        """Verify a batch of Pedersen Commitments with one multi-scalar multiplication
+
+        Args:
+            openings (list): (commitment, value, r) tuples. The commitment can be
+                             compressed (x, y odd) or a point on the elliptic curve.
+
+        Returns:
+            True/False : all commitments are verified
+        """
+        return len(self.find_invalid_openings(openings)) == 0
+
+    def find_invalid_openings(self, openings):
+        """Verify a batch of Pedersen Commitments and find the ones that fail
+
+        The whole batch is checked with one random linear combination. If that fails
+        the batch is split in half and each half is checked again (bisection) until
+        the failing openings are isolated.
+
+        Args:
+            openings (list): (commitment, value, r) tuples. The commitment can be
+                             compressed (x, y odd) or a point on the elliptic curve.
+
+        Returns:
+            list: indices of the openings that are not verified, empty if all are verified
+        """
+        points = [self.opening_point(opening[0]) for opening in openings]
+        invalid = [i for i, point in enumerate(points) if point is None]
+        candidates = [i for i, point in enumerate(points) if point is not None]
+
+        pending = [candidates] if candidates else []
+        while pending:
+            indices = pending.pop()
+            if self.batch_check(
+                [points[i] for i in indices],
+                [openings[i][1] for i in indices],
+                [openings[i][2] for i in indices],
+            ):
+                continue
+            if len(indices) == 1:
+                invalid.append(indices[0])
+            else:
+                middle = len(indices) // 2
+                pending.append(indices[middle:])
+                pending.append(indices[:middle])
+        return sorted(invalid)
+
+
+def accumulate_commitments(*commitments):
+    """Accumulates multiple commitments on an elliptic curve.
+
+    The sum is calculated with the arithmetic of Ped_scheme.backend, so with the
+    Jacobian backend no modular inversion is done while accumulating.
+
+    Args:
+        *commitments (point or int): The commitment points or 0.
+
+    Returns:
+        point or int: The accumulated commitment point or 0 if all inputs are 0.
+    """
+    pure_commitments = [x for x in commitments if x != 0]  # remove 0 commitments
+    if len(pure_commitments) == 0:
+        return 0  # return zero if no commitments in list
+    else:
+        accumulated = Ped_scheme.backend.lift(pure_commitments[0])
+        for c in pure_commitments[1:]:
+            accumulated = accumulated + Ped_scheme.backend.lift(c)
+        return accumulated
+
+
+# Worker for parallel commitment generation (see create_commitments_parallel in deploy.py)
+# Each shard of footprint values gets its own random number generator, so shards can be
+# committed in any order and on any process.
+
+
+def shard_rng(seed, *shard_key):
+    """Creates the random number generator for one shard of footprints.
+
+    Args:
+        seed (int or None): base seed. None uses the operating system's secure
+                            random source (secrets) instead of a reproducible stream.
+        *shard_key: values identifying the shard, e.g. company, product and chunk number
+
+    Returns:
+        random.Random: generator that is independent of every other shard
+    """
+    if seed is None:
+        return secrets.SystemRandom()
+    # string seeds are hashed with SHA-512, so the stream is reproducible across runs
+    return random.Random(":".join(str(part) for part in (seed,) + shard_key))
+
+
+def init_commit_worker():
+    """Builds the fixed-base tables in a commitment worker process before its first shard.
+
+    Used as the process pool initializer, so workers started with spawn (which do not
+    inherit the parent's tables) build them once instead of in the first commit_shard.
+    """
+    Ped_scheme.fixed_base_tables()
+
+
+def commit_shard(values, seed, shard_key):
+    """Creates and batch verifies the commitments for one shard of footprint values.
+
+    Args:
+        values (list of integers): values to be committed to
+        seed (int or None): base seed passed to shard_rng
+        shard_key (tuple): values identifying the shard
+
+    Returns:
+        tuple: (list of (compressed commitment, r), indices of commitments that failed verification)
+    """
+    p = Ped_scheme()
+    commitments = p.commit_many(values, shard_rng(seed, *shard_key))
+    invalid = p.find_invalid_openings(
+        [
+            (commitment[0], value, commitment[1])
+            for commitment, value in zip(commitments, values)
+        ]
+    )
+    return commitments, invalid
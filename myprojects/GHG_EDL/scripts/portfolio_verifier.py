@@ -0,0 +1,334 @@
+#!/usr/bin/python3
+
+# Parallel verification of a portfolio of ProductGHGFootPrint contracts
+#
+# For each product contract address the total is read with get_total_ghg() as in
+# get_total_footprint, the disclosed value and r are checked against the total commitment
+# and the commitments of the product and its linked suppliers are summed as in
+# user_sum_up_commitments and compared with the total commitment.
+# The products are spread over a process pool. Each worker process opens its own HTTP
+# connection to the node and keeps its own Ped_scheme and SupplyChainVerifier, so the
+# curve tables are built once per worker and a supplier shared by products verified in
+# the same worker is read and summed once.
+# The report has one JSON line per product with the result of each check and the seconds
+# per step. Lines are written as products finish, so a long run can be followed while it
+# runs and the finished products are kept if it is interrupted.
+# With --cache the contract reads are kept in a local SQLite database (read_cache.py)
+# shared by the workers, so a repeated audit only reads the products whose owner sent a
+# transaction since the last run.
+#
+# Run with brownie - the node and the contract ABI are taken from the active network and
+# project, the addresses are read from ADDRESSES_FILE:
+#     brownie run scripts/portfolio_verifier.py
+# or without brownie:
+#     python scripts/portfolio_verifier.py --rpc http://127.0.0.1:8545 \
+#         --abi build/contracts/ProductGHGFootPrint.json [--cache contract_reads.sqlite] \
+#         addresses.txt
+
+import sys
+import json
+import os
+import time
+import argparse
+
+# add scripts dir to path to allow the verifier modules to be imported
+sys.path.append("/code/myprojects/GHG_EDL/scripts")
+
+from pedersen import Ped_scheme
+from chain_verifier import SupplyChainVerifier
+from read_cache import ReadCache
+
+ADDRESSES_FILE = "portfolio_addresses.txt"
+REPORT_FILE = "verification_report.jsonl"
+
+
+class Web3Product:
+    """Read functions of a ProductGHGFootPrint contract called through web3.
+
+    Has the call interface of a brownie contract (contract.get_total_ghg()) used by
+    SupplyChainVerifier and ReadCache.
+    """
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.address = contract.address
+
+    def __str__(self):
+        return self.address
+
+    def owner(self):
+        return self.contract.functions.owner().call()
+
+    def get_description(self, block_identifier="latest"):
+        return self.contract.functions.get_description().call(
+            block_identifier=block_identifier
+        )
+
+    def get_total_ghg(self, block_identifier="latest"):
+        return self.contract.functions.get_total_ghg().call(
+            block_identifier=block_identifier
+        )
+
+    def get_ghgfootprints(self, block_identifier="latest"):
+        return self.contract.functions.get_ghgfootprints().call(
+            block_identifier=block_identifier
+        )
+
+    def get_ghgfootprints_by_ids(self, ids, block_identifier="latest"):
+        return self.contract.functions.get_ghgfootprints_by_ids(list(ids)).call(
+            block_identifier=block_identifier
+        )
+
+
+def web3_contract_at(web3, abi):
+    """Returns a function creating the Web3Product of an address, like ProductGHGFootPrint.at."""
+    from web3 import Web3
+
+    def contract_at(address):
+        return Web3Product(
+            web3.eth.contract(address=Web3.toChecksumAddress(str(address)), abi=abi)
+        )
+
+    return contract_at
+
+
+# State of a worker process, set up once by init_worker
+
+worker = {}
+
+
+def init_worker(rpc_url, abi, max_workers, cache_path=None):
+    """
+    Connects a worker process to the node and creates its Ped_scheme and verifier.
+
+    Args:
+        rpc_url (str): HTTP endpoint of the node
+        abi (list): ABI of ProductGHGFootPrint
+        max_workers (int): concurrent contract reads per worker
+        cache_path (str, optional): SQLite database of the ReadCache. Defaults to reading
+                                    every contract from the node.
+    """
+    from web3 import Web3
+
+    p = Ped_scheme()
+    Ped_scheme.fixed_base_tables()  # build the tables before the first product is timed
+    web3 = Web3(Web3.HTTPProvider(rpc_url))
+    contract_at = web3_contract_at(web3, abi)
+    if cache_path is not None:
+        worker["cache"] = ReadCache(web3, cache_path)
+        contract_at = worker["cache"].contract_at(contract_at)
+
+    worker["p"] = p
+    worker["contract_at"] = contract_at
+    worker["verifier"] = SupplyChainVerifier(p, contract_at, max_workers=max_workers)
+
+
+def check_product(p, contract_at, verifier, address):
+    """
+    Verifies the total GHG footprint of one product contract.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        contract_at (callable): returns the contract handle for an address
+        verifier (SupplyChainVerifier): verifier used to sum the footprint commitments
+        address (str): product contract address
+
+    Returns:
+        dict: the report line - address, value, the checks, passed, error and seconds per step.
+    """
+    result = {
+        "address": address,
+        "value": None,
+        "opens": False,
+        "matches_footprints": False,
+        "passed": False,
+        "error": None,
+        "seconds": {},
+    }
+    seconds = result["seconds"]
+    start = time.perf_counter()
+    try:
+        step = time.perf_counter()
+        contract = contract_at(address)
+        total = contract.get_total_ghg()
+        value = total[0]
+        commitment = p.uncompress((total[1], total[2]))
+        r = total[3] << 32 | total[4]  # as reassamble_64bit_number in deploy.py
+        seconds["get_total_footprint"] = time.perf_counter() - step
+        result["value"] = value
+
+        step = time.perf_counter()
+        result["opens"] = p.verify(commitment, value, r)
+        seconds["verify"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        footprints_commitment = verifier.sum_commitments(contract)
+        seconds["user_sum_up_commitments"] = time.perf_counter() - step
+        result["matches_footprints"] = (
+            footprints_commitment != 0 and footprints_commitment == commitment
+        )
+        result["passed"] = result["opens"] and result["matches_footprints"]
+    except Exception as error:  # a bad product must not stop the portfolio
+        result["error"] = type(error).__name__ + ": " + str(error)
+    seconds["total"] = time.perf_counter() - start
+    return result
+
+
+def verify_product(address):
+    """
+    Verifies the total GHG footprint of one product contract in a worker process.
+
+    Args:
+        address (str): product contract address
+
+    Returns:
+        dict: the report line of `check_product` with the worker's process ID and the
+              worker's ReadCache statistics so far if it has a cache.
+    """
+    result = check_product(
+        worker["p"], worker["contract_at"], worker["verifier"], address
+    )
+    result["worker"] = os.getpid()
+    if "cache" in worker:
+        result["read_cache"] = worker["cache"].cache_info()
+    return result
+
+
+def read_addresses(path):
+    """Reads product contract addresses, one per line, skipping blank lines and # comments."""
+    with open(path) as file:
+        return [
+            line.split("#")[0].strip()
+            for line in file
+            if line.split("#")[0].strip() != ""
+        ]
+
+
+def verify_portfolio(
+    addresses,
+    rpc_url,
+    abi,
+    report_path=REPORT_FILE,
+    processes=None,
+    max_workers=4,
+    cache_path=None,
+):
+    """
+    Verifies many product contracts with a process pool and writes a JSON line per product.
+
+    Args:
+        addresses (list): product contract addresses
+        rpc_url (str): HTTP endpoint of the node
+        abi (list): ABI of ProductGHGFootPrint
+        report_path (str, optional): JSONL report file, overwritten. Defaults to REPORT_FILE.
+        processes (int, optional): number of worker processes. Defaults to the number of CPUs.
+        max_workers (int, optional): concurrent contract reads per worker. Defaults to 4.
+        cache_path (str, optional): SQLite database of the ReadCache shared by the workers.
+                                    Defaults to reading every contract from the node.
+
+    Returns:
+        dict: summary - number of products, passed, failed and the wall clock seconds.
+    """
+    # imported here, the verification service uses this module without a process pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    start = time.perf_counter()
+    passed = failed = 0
+    with open(report_path, "w") as report, ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=init_worker,
+        initargs=(rpc_url, abi, max_workers, cache_path),
+    ) as executor:
+        chunksize = max(1, len(addresses) // (4 * (processes or os.cpu_count() or 1)))
+        for result in executor.map(verify_product, addresses, chunksize=chunksize):
+            report.write(json.dumps(result) + "\n")
+            report.flush()
+            if result["passed"]:
+                passed += 1
+            else:
+                failed += 1
+                print("FAILED", result["address"], result["error"] or "")
+    summary = {
+        "products": len(addresses),
+        "passed": passed,
+        "failed": failed,
+        "seconds": time.perf_counter() - start,
+    }
+    print(
+        "Verified",
+        summary["products"],
+        "products:",
+        passed,
+        "passed,",
+        failed,
+        "failed in %.2f s" % summary["seconds"],
+    )
+    return summary
+
+
+def main(
+    addresses_path=ADDRESSES_FILE,
+    report_path=REPORT_FILE,
+    processes=None,
+    cache_path=None,
+):
+    # brownie entry point - the node and ABI of the active network and project,
+    # e.g. with the read cache:
+    #     brownie run scripts/portfolio_verifier.py main addresses.txt report.jsonl 4 reads.sqlite
+    from brownie import web3, ProductGHGFootPrint  # type: ignore
+
+    import portfolio_verifier  # the pool pickles functions of the module by this name
+
+    portfolio_verifier.verify_portfolio(
+        read_addresses(addresses_path),
+        web3.provider.endpoint_uri,
+        ProductGHGFootPrint.abi,
+        report_path,
+        None if processes is None else int(processes),  # brownie passes strings
+        cache_path=cache_path,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Verify the total GHG footprint of ProductGHGFootPrint contracts."
+    )
+    parser.add_argument(
+        "addresses", help="file with one product contract address per line"
+    )
+    parser.add_argument(
+        "--rpc", default="http://127.0.0.1:8545", help="node HTTP endpoint"
+    )
+    parser.add_argument(
+        "--abi",
+        default="build/contracts/ProductGHGFootPrint.json",
+        help="brownie build file or ABI JSON of ProductGHGFootPrint",
+    )
+    parser.add_argument("--report", default=REPORT_FILE, help="JSONL report file")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="concurrent contract reads per process",
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        help="SQLite file caching the contract reads between runs",
+    )
+    args = parser.parse_args()
+    with open(args.abi) as abi_file:
+        abi = json.load(abi_file)
+    if isinstance(abi, dict):
+        abi = abi["abi"]  # brownie build file
+    summary = verify_portfolio(
+        read_addresses(args.addresses),
+        args.rpc,
+        abi,
+        args.report,
+        args.processes,
+        args.max_workers,
+        args.cache,
+    )
+    sys.exit(1 if summary["failed"] else 0)
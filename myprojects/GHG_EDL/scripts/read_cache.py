@@ -0,0 +1,265 @@
+# Persistent local cache of ProductGHGFootPrint reads
+#
+# Verifying a portfolio reads every contract from the node although the data rarely
+# changes after it is uploaded. The results of get_ghgfootprints, get_ghgfootprints_by_ids,
+# get_total_ghg and get_description are kept in a SQLite database with the contract address
+# and the block number they were read at.
+# Only the owner of a ProductGHGFootPrint contract can change its state, so the contract
+# cannot have changed while the owner's transaction count (nonce) stays the same. Each
+# cached read stores the owner's nonce at its block; a later read is served from the cache
+# if the owner's nonce is unchanged and read again from the node otherwise. The nonce is
+# fetched once per owner per session, so a repeated audit costs two calls per company
+# (the nonce and the code check below).
+# Any transaction of the owner invalidates all of the owner's contracts, which is
+# conservative.
+# The nonce only counts the transactions of an externally owned account. A contract's
+# nonce only increases when it creates a contract, so a contract owner (e.g. a multisig
+# wallet) can change the product without changing its nonce. Owners with code at the
+# cache's block are therefore read from the node on every call and nothing is cached for
+# them, as are contracts without an owner (clones that are not initialized yet).
+# The reads, nonces and owner code checks are taken at the block the cache was created
+# at, which suits a one-shot audit. A long-running process such as the verification
+# service would never see new uploads, so it calls refresh() before a query or creates
+# the cache with max_age - refresh() moves the cache to the latest block and forgets the
+# nonces and code checks, the database keeps the reads to compare the new nonces with.
+# The counters and the per-session dicts are shared by the reading threads of
+# SupplyChainVerifier and are only changed under the lock.
+
+import json
+import sqlite3
+import threading
+import time
+
+
+def to_plain(value):
+    """Converts a contract call result to JSON types (tuples become lists, bytes hex strings)."""
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    return str(value)  # addresses and strings
+
+
+class ReadCache:
+    """SQLite cache of ProductGHGFootPrint read calls."""
+
+    FUNCTIONS = (
+        "get_ghgfootprints",
+        "get_ghgfootprints_by_ids",
+        "get_total_ghg",
+        "get_description",
+    )
+
+    def __init__(
+        self, web3, path="contract_reads.sqlite", block_number=None, max_age=None
+    ):
+        """
+        Args:
+            web3 (Web3): connection to the node, e.g. brownie.web3
+            path (str, optional): SQLite database file. Defaults to "contract_reads.sqlite".
+            block_number (int, optional): block that the reads and nonces are taken at.
+                                          Defaults to the latest block when the cache is created.
+            max_age (float, optional): seconds after which a call refreshes the cache to the
+                                       latest block. Defaults to keeping the block.
+        """
+        self.web3 = web3
+        self.max_age = max_age
+        # the worker processes of portfolio_verifier share the database file
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS owners (address TEXT PRIMARY KEY, owner TEXT)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS reads ("
+            "address TEXT, function TEXT, arguments TEXT, block INTEGER, "
+            "owner_nonce INTEGER, result TEXT, "
+            "PRIMARY KEY (address, function, arguments))"
+        )
+        self.connection.commit()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rpc_calls = 0
+        self.refresh(block_number)
+
+    def refresh(self, block_number=None):
+        """
+        Moves the cache to a new block and starts a new session.
+
+        The owner nonces and code checks of the previous block are forgotten, so the next
+        read of every owner's contracts checks the owner's nonce at the new block.
+
+        Args:
+            block_number (int, optional): block that the reads and nonces are taken at.
+                                          Defaults to the latest block.
+        """
+        if block_number is None:
+            self.count("rpc_calls")
+            block_number = self.web3.eth.block_number
+        with self.lock:
+            self.block_number = block_number
+            # owner nonce and whether the owner has code at self.block_number, per owner
+            self.nonces = {}
+            self.contract_owners = {}
+            self.refreshed = time.monotonic()
+
+    def count(self, counter):
+        """Adds one to the hits, misses or rpc_calls counter."""
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def owner_of(self, cached_contract):
+        """
+        Returns the owner of a contract if its reads can be cached.
+
+        The owner of an initialized contract never changes and is kept in the database.
+
+        Args:
+            cached_contract (CachedContract): contract to read
+
+        Returns:
+            str: the owner, None if the contract has no owner yet or the owner is a contract
+                 (whose nonce does not count its transactions).
+        """
+        address = cached_contract.address
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT owner FROM owners WHERE address = ?", (address,)
+            ).fetchone()
+        if row is not None:
+            owner = row[0]
+        else:
+            self.count("rpc_calls")
+            owner = str(cached_contract.contract.owner())
+            if int(owner, 16) == 0:
+                return None  # not initialized, initialize() can still set the owner
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO owners VALUES (?, ?)", (address, owner)
+                )
+                self.connection.commit()
+        is_contract = self.contract_owners.get(owner)
+        if is_contract is None:
+            self.count("rpc_calls")
+            is_contract = len(self.web3.eth.get_code(owner, self.block_number)) > 0
+            with self.lock:
+                self.contract_owners[owner] = is_contract
+        if is_contract:
+            return None
+        return owner
+
+    def owner_nonce(self, owner):
+        """Returns the transaction count of an owner at the cache's block."""
+        nonce = self.nonces.get(owner)
+        if nonce is None:
+            self.count("rpc_calls")
+            nonce = self.web3.eth.get_transaction_count(owner, self.block_number)
+            with self.lock:
+                self.nonces[owner] = nonce
+        return nonce
+
+    def call(self, cached_contract, function_name, *args):
+        """
+        Returns the result of a read call from the cache or the node.
+
+        Args:
+            cached_contract (CachedContract): contract to read
+            function_name (str): one of ReadCache.FUNCTIONS
+            *args: call arguments
+
+        Returns:
+            list: the call result with tuples as lists
+        """
+        if (
+            self.max_age is not None
+            and time.monotonic() - self.refreshed > self.max_age
+        ):
+            self.refresh()
+        owner = self.owner_of(cached_contract)
+        if owner is None:
+            return self.read(cached_contract, function_name, *args)
+        address = cached_contract.address
+        arguments = json.dumps(to_plain(args))
+        nonce = self.owner_nonce(owner)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT owner_nonce, result FROM reads "
+                "WHERE address = ? AND function = ? AND arguments = ?",
+                (address, function_name, arguments),
+            ).fetchone()
+        if row is not None and row[0] == nonce:
+            self.count("hits")
+            return json.loads(row[1])
+        result = self.read(cached_contract, function_name, *args)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO reads VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    address,
+                    function_name,
+                    arguments,
+                    self.block_number,
+                    nonce,
+                    json.dumps(result),
+                ),
+            )
+            self.connection.commit()
+        return result
+
+    def read(self, cached_contract, function_name, *args):
+        """Reads a call result from the node at the cache's block, without caching it."""
+        with self.lock:
+            self.misses += 1
+            self.rpc_calls += 1
+        return to_plain(
+            getattr(cached_contract.contract, function_name)(
+                *args, block_identifier=self.block_number
+            )
+        )
+
+    def contract_at(self, contract_at):
+        """Wraps a contract_at function (e.g. ProductGHGFootPrint.at) to return cached contracts.
+
+        The contract handle is only created when a read is not in the cache.
+        """
+        return lambda address: CachedContract(self, address, contract_at)
+
+    def cache_info(self):
+        return {"hits": self.hits, "misses": self.misses, "rpc_calls": self.rpc_calls}
+
+    def close(self):
+        self.connection.close()
+
+
+class CachedContract:
+    """ProductGHGFootPrint read functions served through a ReadCache."""
+
+    def __init__(self, cache, address, contract_at):
+        self.cache = cache
+        self.address = str(getattr(address, "address", address))
+        self.contract_at = contract_at
+        self._contract = None
+
+    @property
+    def contract(self):
+        """The contract handle, created on first use."""
+        if self._contract is None:
+            self._contract = self.contract_at(self.address)
+        return self._contract
+
+    def __str__(self):
+        return self.address
+
+    def get_ghgfootprints(self):
+        return self.cache.call(self, "get_ghgfootprints")
+
+    def get_ghgfootprints_by_ids(self, ids):
+        return self.cache.call(self, "get_ghgfootprints_by_ids", list(ids))
+
+    def get_total_ghg(self):
+        return self.cache.call(self, "get_total_ghg")
+
+    def get_description(self):
+        return self.cache.call(self, "get_description")
@@ -0,0 +1,383 @@
+# Incremental rollup of product totals over the supply chain in `data`
+#
+# sum_up_footprints calculates the total of one product from scratch, following every
+# linked footprint to its supplier. When a supplier restates one footprint, every
+# product downstream has to be summed again in full.
+# The rollup keeps the graph of the supply chain and a cached subtotal per node.
+# rollup_all orders the nodes of every product topologically and sums each node once
+# from the subtotals of its suppliers, so a supplier shared by many products is summed
+# once for the whole portfolio.
+# A node is a (company, product, linked GHG Footprint IDs) triple as in sum_up_footprints:
+# no IDs select every footprint of the product, otherwise only the selected ones.
+# The subtotal of a node has two parts:
+#   flat  - [value, commitment, r] of the selected footprints of a node with IDs. They go
+#           into the scope of the downstream footprint that links to the node.
+#   fixed - [values, commitments, rs] per scope, like the totals of sum_up_footprints, of
+#           the footprints of a node without IDs and of the linked suppliers.
+# A restated footprint changes the subtotals of the nodes selecting it by the difference
+# of the values, commitments and rs. The differences are passed up the graph to the
+# affected nodes only, in topological order so a node reached on several paths is
+# updated once, and the totals of the products that changed are returned.
+# The commitment difference is C_new - C_old, with -C_old being the point with the same
+# x and the other parity of y, so no commitment is recalculated.
+
+from operator import add
+
+from pedersen import accumulate_commitments
+
+
+def zero_totals():
+    """Returns the totals of no footprints: values [0:3], commitments [3:6], rs [6:]."""
+    return [0, 0, 0, 0, 0, 0, 0, 0, 0]
+
+
+def add_totals(totals, other):
+    """Returns the sum of two totals lists."""
+    return (
+        list(map(add, totals[0:3], other[0:3]))
+        + list(map(accumulate_commitments, totals[3:6], other[3:6]))
+        + list(map(add, totals[6:], other[6:]))
+    )
+
+
+def place(flat, scope):
+    """Returns the totals with a [value, commitment, r] subtotal in a scope."""
+    totals = zero_totals()
+    totals[scope - 1] = flat[0]
+    totals[scope - 1 + 3] = flat[1]
+    totals[scope - 1 + 6] = flat[2]
+    return totals
+
+
+class SupplyChainRollup:
+    """Cached per-scope subtotals of the products in `data`, updated incrementally."""
+
+    def __init__(self, p, data):
+        """
+        Args:
+            p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+            data (dict): Supply chain data in the shape of footprint.py.
+        """
+        self.p = p
+        self.data = data
+        self.flat = {}  # [value, commitment, r] per node with IDs
+        self.fixed = {}  # per-scope totals per node
+        self.parents = {}  # (parent node, scope of the linking footprint) per node
+        self.nodes = {}  # computed nodes per (company, product)
+
+    def product(self, company, product):
+        """Returns the product dictionary of a company.
+
+        Raises:
+            ValueError: If the company or product is not in the data.
+        """
+        if company not in self.data or product not in self.data[company]:
+            raise ValueError(
+                "Supplier or product not found: " + str(company) + " " + str(product)
+            )
+        return self.data[company][product]
+
+    def children(self, node):
+        """
+        Returns the supplier nodes that a node links to.
+
+        Args:
+            node (tuple): (company, product, frozenset of linked GHG Footprint IDs)
+
+        Returns:
+            list: (supplier node, scope of the linking footprint) for each selected linked footprint.
+        """
+        company, product, ids = node
+        children = []
+        for footprint in self.product(company, product)["GHG_Footprints"]:
+            if len(ids) > 0 and footprint["GHGFootPrint_ID"] not in ids:
+                continue  # not selected by the downstream link
+            if "GHGFootprint_linked_product" in footprint:
+                child = (
+                    footprint["GHGFootprint_supplier"],
+                    footprint["GHGFootprint_linked_product"],
+                    frozenset(footprint["GHGFootprint_IDs"]),
+                )
+                children.append((child, footprint["GHGFootPrint_scope"]))
+        return children
+
+    def topological_order(self, roots):
+        """
+        Orders the nodes reachable from some nodes so that suppliers come before their customers.
+
+        Nodes whose subtotal is already cached are left out, together with their suppliers.
+        The graph is walked depth first with an explicit stack, so long supply chains do
+        not hit the recursion limit, and every node and link is visited once.
+
+        Args:
+            roots (list): nodes to start from.
+
+        Returns:
+            list: nodes without a cached subtotal, suppliers first.
+
+        Raises:
+            ValueError: If the links of the supply chain form a cycle.
+        """
+        order = []
+        state = {}  # 1 = on the current path, 2 = done
+        for root in roots:
+            if root in self.fixed or state.get(root) == 2:
+                continue
+            state[root] = 1
+            stack = [(root, iter(self.children(root)))]
+            while stack:
+                node, children = stack[-1]
+                for child, _ in children:
+                    if child in self.fixed or state.get(child) == 2:
+                        continue
+                    if state.get(child) == 1:
+                        raise ValueError(
+                            "Supply chain links form a cycle at " + str(child[:2])
+                        )
+                    state[child] = 1
+                    stack.append((child, iter(self.children(child))))
+                    break
+                else:
+                    stack.pop()
+                    state[node] = 2
+                    order.append(node)
+        return order
+
+    def compute(self, node):
+        """
+        Calculates and caches the subtotal of a node from the cached subtotals of its suppliers.
+
+        Args:
+            node (tuple): (company, product, frozenset of linked GHG Footprint IDs)
+        """
+        company, product, ids = node
+        flat = [0, 0, 0]
+        fixed = zero_totals()
+        for footprint in self.product(company, product)["GHG_Footprints"]:
+            if len(ids) > 0 and footprint["GHGFootPrint_ID"] not in ids:
+                continue  # not selected by the downstream link
+            if "GHGFootprint_linked_product" not in footprint:
+                own = [
+                    footprint["GHGFootprint_value"],
+                    self.p.uncompress(footprint["GHGFootPrint_commitment"]),
+                    footprint["GHGFootPrint_commitment_r"],
+                ]
+                if len(ids) > 0:
+                    flat = [
+                        flat[0] + own[0],
+                        accumulate_commitments(flat[1], own[1]),
+                        flat[2] + own[2],
+                    ]
+                else:
+                    fixed = add_totals(
+                        fixed, place(own, footprint["GHGFootPrint_scope"])
+                    )
+        for child, scope in self.children(node):
+            fixed = add_totals(
+                fixed, add_totals(place(self.flat[child], scope), self.fixed[child])
+            )
+            self.parents.setdefault(child, []).append((node, scope))
+        self.flat[node] = flat
+        self.fixed[node] = fixed
+        self.nodes.setdefault((company, product), []).append(node)
+
+    def subtotal(self, node):
+        """
+        Returns the subtotal of a node, calculating it and its suppliers' subtotals once.
+
+        Args:
+            node (tuple): (company, product, frozenset of linked GHG Footprint IDs)
+
+        Returns:
+            tuple: (flat, fixed) subtotal of the node.
+
+        Raises:
+            ValueError: If the links of the supply chain form a cycle.
+        """
+        for supplier in self.topological_order([node]):
+            self.compute(supplier)
+        return self.flat[node], self.fixed[node]
+
+    def products(self):
+        """Returns the (company, product) of every product in the data."""
+        return [
+            (company, product)
+            for company in self.data
+            for product in self.data[company]
+            if "Product" in product
+        ]
+
+    def rollup_all(self):
+        """
+        Calculates the totals of every product in the data.
+
+        All products are ordered topologically first and each node is summed once from
+        the subtotals of its suppliers, so the time is linear in the number of
+        footprints and links however many products share a supplier.
+
+        Returns:
+            dict: values [0:3], commitments [3:6] and commitments r [6:] per scope for each
+                  (company, product), like sum_up_footprints.
+
+        Raises:
+            ValueError: If the links of the supply chain form a cycle.
+        """
+        roots = [
+            (company, product, frozenset()) for company, product in self.products()
+        ]
+        for node in self.topological_order(roots):
+            self.compute(node)
+        return {root[:2]: list(self.fixed[root]) for root in roots}
+
+    def totals(self, company, product):
+        """
+        Returns the totals of a product like sum_up_footprints, from the cache if possible.
+
+        Args:
+            company (str): company name
+            product (str): product name
+
+        Returns:
+            list: values [0:3], commitments [3:6] and commitments r [6:] per scope.
+        """
+        return list(self.subtotal((company, product, frozenset()))[1])
+
+    def update_footprint(self, company, product, fp_id, value, commitment, r):
+        """
+        Replaces the value and commitment of a footprint and updates the affected subtotals.
+
+        The footprint in `data` is updated too. Only the nodes that select the footprint
+        and the nodes downstream of them are touched.
+
+        Args:
+            company (str): company name
+            product (str): product name
+            fp_id (int): GHG Footprint ID of a footprint that is not linked
+            value (int): new GHG footprint value
+            commitment (tuple): new compressed commitment (x, y odd)
+            r (int): new commitment r
+
+        Returns:
+            dict: New totals for each (company, product) whose cached total changed.
+
+        Raises:
+            ValueError: If the footprint does not exist or is linked.
+        """
+        footprint = None
+        for candidate in self.product(company, product)["GHG_Footprints"]:
+            if candidate["GHGFootPrint_ID"] == fp_id:
+                footprint = candidate
+                break
+        if footprint is None or "GHGFootprint_linked_product" in footprint:
+            raise ValueError(
+                "No footprint "
+                + str(fp_id)
+                + " with a value in "
+                + str(company)
+                + " "
+                + str(product)
+            )
+
+        old_commitment = footprint["GHGFootPrint_commitment"]
+        delta = [
+            value - footprint["GHGFootprint_value"],
+            accumulate_commitments(
+                self.p.uncompress(commitment),
+                self.p.uncompress((old_commitment[0], int(not old_commitment[1]))),
+            ),
+            r - footprint["GHGFootPrint_commitment_r"],
+        ]
+        footprint["GHGFootprint_value"] = value
+        footprint["GHGFootPrint_commitment"] = commitment
+        footprint["GHGFootPrint_commitment_r"] = r
+
+        # differences of the nodes that select the footprint
+        deltas = {}
+        for node in self.nodes.get((company, product), []):
+            ids = node[2]
+            if len(ids) == 0:
+                deltas[node] = (
+                    [0, 0, 0],
+                    place(delta, footprint["GHGFootPrint_scope"]),
+                )
+            elif fp_id in ids:
+                deltas[node] = (delta, zero_totals())
+        return self.propagate(deltas)
+
+    def restate_footprint(self, company, product, fp_id, value):
+        """
+        Commits a new value for a footprint and updates the affected subtotals.
+
+        Args:
+            company (str): company name
+            product (str): product name
+            fp_id (int): GHG Footprint ID of a footprint that is not linked
+            value (int): new GHG footprint value
+
+        Returns:
+            dict: New totals for each (company, product) whose cached total changed.
+        """
+        commitment, r = self.p.commit_many([int(value)])[0]
+        return self.update_footprint(company, product, fp_id, value, commitment, r)
+
+    def propagate(self, deltas):
+        """
+        Applies subtotal differences to nodes and passes them on to the nodes downstream.
+
+        Args:
+            deltas (dict): (flat, fixed) difference per changed node.
+
+        Returns:
+            dict: New totals for each (company, product) whose cached total changed.
+        """
+        # affected nodes and the number of affected suppliers each one waits for
+        waiting = {node: 0 for node in deltas}
+        stack = list(deltas)
+        while stack:
+            node = stack.pop()
+            for parent, _ in self.parents.get(node, []):
+                if parent not in waiting:
+                    waiting[parent] = 0
+                    stack.append(parent)
+                waiting[parent] += 1
+
+        changed = {}
+        ready = [node for node, count in waiting.items() if count == 0]
+        while ready:
+            node = ready.pop()
+            flat, fixed = deltas.get(node, ([0, 0, 0], zero_totals()))
+            self.flat[node] = [
+                self.flat[node][0] + flat[0],
+                accumulate_commitments(self.flat[node][1], flat[1]),
+                self.flat[node][2] + flat[2],
+            ]
+            self.fixed[node] = add_totals(self.fixed[node], fixed)
+            if len(node[2]) == 0:
+                changed[node[:2]] = list(self.fixed[node])
+            for parent, scope in self.parents.get(node, []):
+                parent_flat, parent_fixed = deltas.get(
+                    parent, ([0, 0, 0], zero_totals())
+                )
+                deltas[parent] = (
+                    parent_flat,
+                    add_totals(parent_fixed, add_totals(place(flat, scope), fixed)),
+                )
+                waiting[parent] -= 1
+                if waiting[parent] == 0:
+                    ready.append(parent)
+        return changed
+
+
+def product_total(p, totals):
+    """
+    Returns the total value, compressed commitment and r of per-scope totals.
+
+    Args:
+        p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+        totals (list): values [0:3], commitments [3:6] and commitments r [6:] per scope.
+
+    Returns:
+        tuple: (value, compressed commitment (x, y odd), r) as used by upload_total_footprint.
+    """
+    commitment = accumulate_commitments(totals[3], totals[4], totals[5])
+    return sum(totals[:3]), p.compress_point(commitment), sum(totals[6:])
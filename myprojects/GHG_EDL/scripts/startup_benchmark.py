@@ -0,0 +1,206 @@
+#!/usr/bin/python3
+
+# Cold-start benchmark of the entry point scripts
+#
+# The scripts mostly run in short-lived container jobs, where importing the script and its
+# modules can take longer than the work itself. For each entry point in ENTRY_POINTS a new
+# Python process imports the script with `python -X importtime` and the seconds of the
+# import are measured. The entry points run with brownie first load the brownie project
+# (not timed), as `brownie run` does before it imports the script. Each entry point is
+# started REPEAT times and the median is reported with its slowest direct imports, so a
+# new heavy import at module level shows up by name.
+# The results are printed and appended as one JSON line to RESULTS_FILE so runs can be
+# compared. With --budget the exit status is 1 if an entry point takes longer.
+#
+# Run from the project directory with:
+#     python scripts/startup_benchmark.py [--repeat 5] [--budget 1.0] [deploy ...]
+
+import sys
+import json
+import os
+import subprocess
+import time
+import argparse
+from statistics import median
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPTS_DIR)
+
+# entry point script -> whether it needs a loaded brownie project
+ENTRY_POINTS = {
+    "deploy": True,
+    "benchmark": True,
+    "portfolio_verifier": False,
+    "verification_service": False,
+}
+
+REPEAT = 3
+SLOWEST = 5
+RESULTS_FILE = "startup_results.jsonl"
+
+# marker written to stderr between the setup and the timed import
+MARKER = "-- startup_benchmark import --"
+
+CHILD_CODE = """
+import sys, time
+sys.path.insert(0, {scripts_dir!r})
+if {brownie!r}:
+    from brownie import project
+    project.load({project_dir!r})._add_to_main_namespace()
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Returns the direct imports of the timed import from `python -X importtime` output.
+
+    Args:
+        stderr (str): stderr of the child process
+
+    Returns:
+        dict: cumulative seconds per module imported by the script itself, i.e. not
+              counting the modules those modules import.
+    """
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    imports = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        # importtime indents a module by two spaces per level of nesting,
+        # the script is the outermost module and its direct imports are one level in
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            imports[name.strip()] = int(cumulative) / 1e6
+    return imports
+
+
+def measure(module, brownie, repeat=REPEAT):
+    """
+    Imports an entry point in `repeat` new processes and times the imports.
+
+    Args:
+        module (str): name of the script in the scripts directory
+        brownie (bool): whether to load the brownie project before the import
+        repeat (int, optional): number of processes started. Defaults to REPEAT.
+
+    Returns:
+        dict: the entry point, the median seconds of the import and of the whole process,
+              and the median seconds of the slowest direct imports, or the error.
+    """
+    code = CHILD_CODE.format(
+        scripts_dir=SCRIPTS_DIR,
+        project_dir=PROJECT_DIR,
+        brownie=brownie,
+        marker=MARKER,
+        module=module,
+    )
+    imports_seconds = []
+    process_seconds = []
+    imports = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        child = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=PROJECT_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        process_seconds.append(time.perf_counter() - start)
+        if child.returncode != 0:
+            return {
+                "entry_point": module,
+                "error": (
+                    child.stderr.strip().splitlines()
+                    or ["exit status " + str(child.returncode)]
+                )[-1],
+            }
+        imports_seconds.append(float(child.stdout.strip().splitlines()[-1]))
+        for name, seconds in parse_importtime(child.stderr).items():
+            imports.setdefault(name, []).append(seconds)
+    slowest = sorted(
+        ((name, median(seconds)) for name, seconds in imports.items()),
+        key=lambda item: -item[1],
+    )[:SLOWEST]
+    return {
+        "entry_point": module,
+        "import_seconds": median(imports_seconds),
+        "process_seconds": median(process_seconds),
+        "slowest_imports": dict(slowest),
+    }
+
+
+def main(entry_points=None, repeat=REPEAT, budget=None):
+    """
+    Measures the cold-start time of the entry points and appends the results to RESULTS_FILE.
+
+    Args:
+        entry_points (list, optional): names of the entry points. Defaults to ENTRY_POINTS.
+        repeat (int, optional): processes started per entry point. Defaults to REPEAT.
+        budget (float, optional): maximum seconds of an import.
+
+    Returns:
+        bool: True if every entry point was imported within the budget.
+    """
+    if entry_points is None:
+        entry_points = list(ENTRY_POINTS)
+    results = []
+    within_budget = True
+    for module in entry_points:
+        if module not in ENTRY_POINTS:
+            raise ValueError("Unknown entry point " + module)
+        result = measure(module, ENTRY_POINTS[module], repeat)
+        results.append(result)
+        if "error" in result:
+            within_budget = False
+            print(module, "failed:", result["error"])
+            continue
+        over = budget is not None and result["import_seconds"] > budget
+        within_budget = within_budget and not over
+        print(
+            module,
+            "import %.3f s" % result["import_seconds"],
+            "process %.3f s" % result["process_seconds"],
+            "OVER BUDGET" if over else "",
+        )
+        for name, seconds in result["slowest_imports"].items():
+            print("    %-30s %.3f s" % (name, seconds))
+
+    with open(RESULTS_FILE, "a") as results_file:
+        results_file.write(
+            json.dumps(
+                {
+                    "time": time.time(),
+                    "python": sys.version.split()[0],
+                    "results": results,
+                }
+            )
+            + "\n"
+        )
+    print("Results appended to", RESULTS_FILE)
+    return within_budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the cold-start time of the entry point scripts."
+    )
+    parser.add_argument(
+        "entry_points", nargs="*", help="entry points to measure, default all"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=REPEAT, help="processes started per entry point"
+    )
+    parser.add_argument(
+        "--budget", type=float, default=None, help="maximum seconds of an import"
+    )
+    args = parser.parse_args()
+    sys.exit(0 if main(args.entry_points or None, args.repeat, args.budget) else 1)
@@ -0,0 +1,164 @@
+# Synthetic supply chains in the schema of the data dictionary in footprint.py
+#
+# The companies are split into tiers: tier 0 sells the final products and each product of
+# tier t links to products of tier t + 1, so the supply chain is a DAG of the given depth
+# and a supplier product is usually shared by several customers (diamond shaped).
+# The same arguments and seed always give the same data, so benchmark runs can be compared.
+
+import random
+
+# Categories of the non-linked footprints for each scope
+CATEGORIES = {
+    1: ["Gross Scope 1 greenhouse gas emissions"],
+    2: [
+        "Gross location based Scope 2 greenhouse gas emissions",
+        "Gross market based Scope 2 greenhouse gas emissions",
+    ],
+    3: [
+        "Total indirect Scope 3 greenhouse gas emissions",
+        "Purchased Goods and services",
+        "Upstream transportation and distribution",
+        "Downstream transportation and distribution",
+        "Waste generated in operations",
+    ],
+}
+
+FIRST_FOOTPRINT_ID = 1000
+
+
+def company_name(number):
+    return "Company " + str(number)
+
+
+def product_name(number):
+    return "Product" + str(number)
+
+
+def generate_supply_chain(
+    companies=10,
+    products_per_company=2,
+    footprints_per_product=10,
+    fan_out=2,
+    depth=3,
+    seed=1234567890,
+):
+    """
+    Generates a random supply chain in the schema of the `data` dictionary in footprint.py.
+
+    Args:
+        companies (int, optional): Number of companies. Defaults to 10.
+        products_per_company (int, optional): Number of products of each company. Defaults to 2.
+        footprints_per_product (int, optional): Number of GHG footprints of each product,
+                                                including the linked ones. Defaults to 10.
+        fan_out (int, optional): Number of linked footprints of each product that is not in
+                                 the last tier. Defaults to 2.
+        depth (int, optional): Number of tiers in the supply chain. Defaults to 3.
+        seed (int, optional): Seed of the random numbers. Defaults to 1234567890.
+
+    Returns:
+        dict: The supply chain data, companies of tier 0 first.
+
+    Raises:
+        ValueError: If there are fewer companies than tiers or more links than footprints.
+    """
+    if companies < depth:
+        raise ValueError("At least one company is needed per tier")
+    if fan_out > footprints_per_product:
+        raise ValueError("fan_out cannot be larger than footprints_per_product")
+    rng = random.Random(seed)
+
+    # companies are dealt to the tiers in turn, company i is in tier i % depth
+    tiers = [
+        [company for company in range(companies) if company % depth == tier]
+        for tier in range(depth)
+    ]
+    footprint_ids = list(
+        range(FIRST_FOOTPRINT_ID, FIRST_FOOTPRINT_ID + footprints_per_product)
+    )
+
+    data = {}
+    for tier, tier_companies in enumerate(tiers):
+        suppliers = []
+        if tier + 1 < depth:
+            suppliers = [
+                (company_name(company), product_name(product))
+                for company in tiers[tier + 1]
+                for product in range(1, products_per_company + 1)
+            ]
+        for company in tier_companies:
+            name = company_name(company)
+            data[name] = {}
+            for product in range(1, products_per_company + 1):
+                links = fan_out if suppliers else 0
+                footprints = []
+                for index, fp_id in enumerate(footprint_ids):
+                    if index >= footprints_per_product - links:
+                        supplier, linked_product = rng.choice(suppliers)
+                        footprints.append(
+                            {
+                                "GHGFootPrint_ID": fp_id,
+                                "GHGFootPrint_scope": 3,
+                                "GHGFootPrint_disaggregation": 2,
+                                "GHGFootPrint_category": "Purchased Goods and services",
+                                "GHGFootprint_supplier": supplier,
+                                "GHGFootprint_no_units": rng.randint(1, 10),
+                                "GHGFootprint_linked_product": linked_product,
+                                "GHGFootprint_IDs": sorted(
+                                    rng.sample(
+                                        footprint_ids,
+                                        rng.randint(1, len(footprint_ids)),
+                                    )
+                                ),
+                            }
+                        )
+                    else:
+                        scope = rng.randint(1, 3)
+                        footprints.append(
+                            {
+                                "GHGFootPrint_ID": fp_id,
+                                "GHGFootPrint_scope": scope,
+                                "GHGFootPrint_disaggregation": rng.randint(0, 1),
+                                "GHGFootPrint_category": rng.choice(CATEGORIES[scope]),
+                                "GHGFootprint_value": rng.randint(1, 5000),
+                            }
+                        )
+                data[name][product_name(product)] = {
+                    "description": {
+                        "owner_name": name,
+                        "productID": str(product),
+                        "product_name": "Synthetic product " + str(product),
+                        "product_type": rng.choice(["Consumer", "Industrial"]),
+                        "units": "Unit",
+                        "date_created": "22/10/2024",
+                        "date_updated": "",
+                        "status": "Active",
+                    },
+                    "GHG_Footprints": footprints,
+                }
+    return data
+
+
+def final_products(data):
+    """
+    Returns the products that no other product links to.
+
+    Args:
+        data (dict): Supply chain data.
+
+    Returns:
+        list: (company, product) pairs.
+    """
+    linked = {
+        (footprint["GHGFootprint_supplier"], footprint["GHGFootprint_linked_product"])
+        for company in data
+        for product in data[company]
+        if "Product" in product
+        for footprint in data[company][product]["GHG_Footprints"]
+        if "GHGFootprint_linked_product" in footprint
+    }
+    return [
+        (company, product)
+        for company in data
+        for product in data[company]
+        if "Product" in product and (company, product) not in linked
+    ]
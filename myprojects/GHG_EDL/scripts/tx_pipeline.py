@@ -0,0 +1,239 @@
+# Pipelined transaction submission for brownie accounts
+#
+# Sending a transaction and waiting for one confirmation before sending the next costs one
+# block per transaction, and every other account is idle in the meantime.
+# The pipeline keeps the next nonce of each account locally, so an account can send its
+# transactions back to back with required_confs 0 without asking the node for the nonce,
+# and each account sends from its own thread so different accounts send concurrently.
+# The receipts are collected afterwards: a transaction that is not mined within the timeout
+# is re-broadcast with the same nonce and higher fees, and a send that fails is
+# retried with the same nonce so that later nonces of the account do not get stuck.
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class NonceManager:
+    """Hands out consecutive nonces per account, starting from the account's nonce on the node."""
+
+    def __init__(self):
+        self.nonces = {}  # next nonce per account address
+        self.lock = threading.Lock()
+
+    def next_nonce(self, account):
+        """Returns the next nonce of an account and reserves it."""
+        with self.lock:
+            address = str(account)
+            if address not in self.nonces:
+                self.nonces[address] = account.nonce
+            nonce = self.nonces[address]
+            self.nonces[address] += 1
+            return nonce
+
+
+class PendingTransaction:
+    """A transaction submitted to the pipeline."""
+
+    def __init__(self, account, function, args, label):
+        self.account = account
+        self.function = function  # contract function or ContractContainer.deploy
+        self.args = args
+        self.label = label  # shown in progress and error messages
+        self.nonce = None
+        self.tx = None  # brownie TransactionReceipt of the last broadcast
+        # hashes of every broadcast, a re-broadcast may lose to the original
+        self.txids = []
+        self.receipt = None  # mined receipt from the node
+        self.error = None
+        self.attempts = 0
+        self.future = None
+
+    def send(self, fees=None):
+        """Broadcasts the transaction with its nonce without waiting for it to be mined.
+
+        Args:
+            fees (dict, optional): fee parameters of a re-broadcast, gas_price or max_fee and
+                                   priority_fee. Defaults to the fees brownie chooses.
+        """
+        params = {"from": self.account, "nonce": self.nonce, "required_confs": 0}
+        if fees is not None:
+            params.update(fees)
+        self.attempts += 1
+        self.tx = self.function(*self.args, params)
+        self.txids.append(self.tx.txid)
+        return self.tx
+
+    @property
+    def status(self):
+        """1 if mined successfully, 0 if reverted, None if not mined (yet)."""
+        if self.receipt is None:
+            return None
+        return self.receipt["status"]
+
+
+class TransactionPipeline:
+    """Sends transactions of many accounts without waiting and collects the receipts at the end."""
+
+    def __init__(
+        self, web3, timeout=120, retries=3, retry_delay=1, gas_price_increment=1.125
+    ):
+        """
+        Args:
+            web3 (Web3): connection used to wait for receipts, e.g. brownie.web3
+            timeout (int, optional): seconds to wait for a receipt before re-broadcasting.
+                                     Defaults to 120.
+            retries (int, optional): number of times a failed send or a transaction that is not
+                                     mined is retried. Defaults to 3.
+            retry_delay (int, optional): seconds to wait before retrying a failed send. Defaults to 1.
+            gas_price_increment (float, optional): fee multiplier of a re-broadcast.
+                                                   Defaults to 1.125, the minimum most nodes accept
+                                                   to replace a pending transaction.
+        """
+        self.web3 = web3
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.gas_price_increment = gas_price_increment
+        self.nonces = NonceManager()
+        # one single thread executor per account keeps its nonces in order
+        self.senders = {}
+        self.failed_accounts = set()  # accounts with a nonce that could not be sent
+        self.pending = []
+
+    def submit(self, account, function, *args, label=None):
+        """Queues a transaction, it is sent from the account's thread as soon as possible.
+
+        Args:
+            account (Account): sending account
+            function (callable): contract function, e.g. contract.set_description, or
+                                 ProductGHGFootPrint.deploy
+            *args: function arguments, without the transaction parameters
+            label (str, optional): name of the transaction in messages
+
+        Returns:
+            PendingTransaction: the queued transaction
+        """
+        transaction = PendingTransaction(
+            account, function, args, label or str(function)
+        )
+        address = str(account)
+        if address not in self.senders:
+            self.senders[address] = ThreadPoolExecutor(max_workers=1)
+        transaction.future = self.senders[address].submit(self._send, transaction)
+        self.pending.append(transaction)
+        return transaction
+
+    def _send(self, transaction):
+        """Assigns the nonce and broadcasts a transaction, retrying with the same nonce."""
+        address = str(transaction.account)
+        if address in self.failed_accounts:
+            # the node will not mine nonces after a gap
+            transaction.error = ValueError(
+                "An earlier transaction of the account failed"
+            )
+            return None
+        transaction.nonce = self.nonces.next_nonce(transaction.account)
+        while True:
+            try:
+                return transaction.send()
+            except Exception as error:
+                if transaction.attempts > self.retries:
+                    transaction.error = error
+                    self.failed_accounts.add(address)
+                    return None
+                time.sleep(self.retry_delay)
+
+    def _wait(self, transaction):
+        """Waits for the receipt of a transaction, re-broadcasting it if it is not mined."""
+        while transaction.error is None and transaction.receipt is None:
+            try:
+                transaction.receipt = self.web3.eth.wait_for_transaction_receipt(
+                    transaction.tx.txid, timeout=self.timeout
+                )
+            except Exception as error:
+                transaction.receipt = self._mined_receipt(transaction.txids[:-1])
+                if transaction.receipt is not None:
+                    break
+                if transaction.attempts > self.retries:
+                    transaction.error = error
+                    break
+                try:
+                    transaction.send(self.bumped_fees(transaction.tx))
+                except Exception as send_error:
+                    # e.g. the original was mined in the meantime - wait for it again
+                    print("Re-broadcast of", transaction.label, "failed:", send_error)
+        if transaction.error is None and transaction.status != 1:
+            transaction.error = ValueError("Transaction reverted")
+        return transaction
+
+    def bumped_fees(self, tx):
+        """
+        Returns the fees of a re-broadcast, the fees of `tx` raised by gas_price_increment.
+
+        A node only replaces a pending transaction with the same nonce if the fees are higher,
+        for an EIP-1559 transaction both the max fee and the priority fee.
+
+        Args:
+            tx (TransactionReceipt): the last broadcast of the transaction
+
+        Returns:
+            dict: gas_price, or max_fee and priority_fee for an EIP-1559 transaction
+        """
+
+        def bump(fee):
+            return max(int(fee * self.gas_price_increment), fee + 1)
+
+        max_fee = getattr(tx, "max_fee", None)
+        if max_fee is not None:
+            priority_fee = getattr(tx, "priority_fee", None)
+            if priority_fee is None:
+                priority_fee = self.web3.eth.max_priority_fee
+            return {"max_fee": bump(max_fee), "priority_fee": bump(priority_fee)}
+        gas_price = tx.gas_price
+        if gas_price is None:
+            gas_price = self.web3.eth.gas_price
+        return {"gas_price": bump(gas_price)}
+
+    def _mined_receipt(self, txids):
+        """Returns the receipt of the first of the transaction hashes that was mined, or None."""
+        for txid in txids:
+            try:
+                return self.web3.eth.get_transaction_receipt(txid)
+            except Exception:
+                continue
+        return None
+
+    def collect(self):
+        """Waits until every submitted transaction is mined.
+
+        Returns:
+            list: the PendingTransactions in submission order, with their receipts
+
+        Raises:
+            ValueError: If a transaction could not be sent, was not mined or reverted.
+        """
+        pending, self.pending = self.pending, []
+        for transaction in pending:
+            transaction.future.result()
+        failed = []
+        for transaction in pending:
+            if transaction.error is None:
+                self._wait(transaction)
+            if transaction.error is not None:
+                failed.append(transaction)
+        if failed:
+            raise ValueError(
+                "Transactions failed: "
+                + ", ".join(
+                    "{} (nonce {}): {}".format(t.label, t.nonce, t.error)
+                    for t in failed
+                )
+            )
+        return pending
+
+    def close(self):
+        """Stops the sender threads."""
+        for sender in self.senders.values():
+            sender.shutdown()
+        self.senders = {}
@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+
+# Long-running verification service for interactive audit queries
+#
+# Every `brownie run` pays for the imports, the Ped_scheme fixed-base tables and the
+# connection to the network before the first query. The service loads them once and
+# answers verify and sum queries over HTTP on a local port or a Unix socket while it
+# runs. The contract handles are kept for the lifetime of the service and the point
+# decompression cache stays warm between queries. The footprints and totals are read
+# again for every query, so an answer always reflects the chain.
+#
+# Queries are GET requests with query parameters or POST requests with a JSON body,
+# answers are JSON:
+#     /health                                  uptime, number of queries, cache statistics
+#     /verify?address=0x..                     checks of a product total (as portfolio_verifier)
+#     /sum?address=0x..&ids=1000,1001          sum of the footprint commitments of a product
+#                                              (all footprints without ids), as
+#                                              user_sum_up_commitments
+#     /open  {"commitment": [x, y_odd], "value": v, "r": r}
+#                                              whether the value and r open a commitment
+#
+# Run with brownie, the node and contract ABI are taken from the active network and project:
+#     brownie run scripts/verification_service.py
+# or without brownie:
+#     python scripts/verification_service.py --rpc http://127.0.0.1:8545 \
+#         --abi build/contracts/ProductGHGFootPrint.json --unix-socket /tmp/ghg.sock
+
+import sys
+import json
+import os
+import time
+import argparse
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+# add scripts dir to path to allow the verifier modules to be imported
+sys.path.append("/code/myprojects/GHG_EDL/scripts")
+
+from pedersen import Ped_scheme
+from chain_verifier import SupplyChainVerifier
+from portfolio_verifier import check_product, web3_contract_at
+
+HOST = "127.0.0.1"
+PORT = 8600
+
+
+class VerificationService:
+    """Answers verification queries with a warm Ped_scheme and cached contract handles."""
+
+    def __init__(self, p, contract_at, max_workers=4):
+        """
+        Args:
+            p (Ped_scheme): An instance of the Ped_scheme class for cryptographic operations.
+            contract_at (callable): returns the contract handle for an address,
+                                    e.g. ProductGHGFootPrint.at
+            max_workers (int, optional): concurrent contract reads per query. Defaults to 4.
+        """
+        self.p = p
+        self.contract_at = contract_at
+        self.max_workers = max_workers
+        self.contracts = {}  # contract handle per address, kept between queries
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.queries = 0
+        Ped_scheme.fixed_base_tables()  # build the tables before the first query
+
+    def contract(self, address):
+        """Returns the cached contract handle for an address."""
+        address = str(address)
+        with self.lock:
+            contract = self.contracts.get(address)
+        if contract is None:
+            contract = self.contract_at(address)
+            with self.lock:
+                self.contracts[address] = contract
+        return contract
+
+    def verifier(self):
+        """Returns a SupplyChainVerifier for one query, sharing the contract handles."""
+        return SupplyChainVerifier(self.p, self.contract, max_workers=self.max_workers)
+
+    def health(self, params):
+        return {
+            "status": "ok",
+            "uptime": time.time() - self.started,
+            "queries": self.queries,
+            "contracts": len(self.contracts),
+            "decompression_cache": Ped_scheme.decompressor.cache_info(),
+        }
+
+    def verify(self, params):
+        return check_product(self.p, self.contract, self.verifier(), params["address"])
+
+    def sum(self, params):
+        ids = params.get("ids") or []
+        if isinstance(ids, str):
+            ids = [int(fp_id) for fp_id in ids.split(",") if fp_id != ""]
+        start = time.perf_counter()
+        commitment = self.verifier().sum_commitments(
+            self.contract(params["address"]), ids
+        )
+        return {
+            "address": params["address"],
+            "ids": list(ids),
+            "commitment": (
+                None if commitment == 0 else list(self.p.compress_point(commitment))
+            ),
+            "seconds": time.perf_counter() - start,
+        }
+
+    def open(self, params):
+        commitment = self.p.uncompress(tuple(params["commitment"]))
+        return {
+            "valid": self.p.verify(commitment, int(params["value"]), int(params["r"]))
+        }
+
+    def handle(self, path, params):
+        """
+        Answers a query.
+
+        Args:
+            path (str): query name - health, verify, sum or open
+            params (dict): query parameters
+
+        Returns:
+            tuple: (HTTP status, JSON answer)
+        """
+        method = {
+            "health": self.health,
+            "verify": self.verify,
+            "sum": self.sum,
+            "open": self.open,
+        }.get(path)
+        if method is None:
+            return 404, {"error": "Unknown query " + path}
+        with self.lock:
+            self.queries += 1
+        try:
+            return 200, method(params)
+        except KeyError as error:
+            return 400, {"error": "Missing parameter " + str(error)}
+        except ValueError as error:
+            return 400, {"error": str(error)}
+        except Exception as error:  # e.g. the node cannot be reached
+            return 500, {"error": type(error).__name__ + ": " + str(error)}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a VerificationService (set as the server's `service`)."""
+
+    def answer(self, params):
+        status, answer = self.server.service.handle(
+            urlparse(self.path).path.strip("/"), params
+        )
+        body = json.dumps(answer).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.answer(dict(parse_qsl(urlparse(self.path).query)))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            params = None
+        if not isinstance(params, dict):
+            self.send_error(400, "Body must be a JSON object")
+            return
+        params.update(parse_qsl(urlparse(self.path).query))
+        self.answer(params)
+
+    def address_string(self):
+        # a Unix socket has no client address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(service, host=HOST, port=PORT, unix_socket=None):
+    """
+    Serves queries until interrupted.
+
+    Args:
+        service (VerificationService): service answering the queries
+        host (str, optional): address to listen on. Defaults to HOST.
+        port (int, optional): port to listen on. Defaults to PORT.
+        unix_socket (str, optional): path of a Unix socket to listen on instead of a port.
+    """
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, RequestHandler)
+        print("Verification service listening on", unix_socket)
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+        print("Verification service listening on http://%s:%d" % (host, port))
+    server.service = service
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if unix_socket is not None and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+def main(host=HOST, port=PORT, unix_socket=None):
+    # brownie entry point - contract handles of the active network and project
+    from brownie import ProductGHGFootPrint  # type: ignore
+
+    serve(
+        VerificationService(Ped_scheme(), ProductGHGFootPrint.at),
+        host,
+        port,
+        unix_socket,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve GHG footprint verification queries."
+    )
+    parser.add_argument(
+        "--rpc", default="http://127.0.0.1:8545", help="node HTTP endpoint"
+    )
+    parser.add_argument(
+        "--abi",
+        default="build/contracts/ProductGHGFootPrint.json",
+        help="brownie build file or ABI JSON of ProductGHGFootPrint",
+    )
+    parser.add_argument("--host", default=HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on")
+    parser.add_argument(
+        "--unix-socket", default=None, help="listen on a Unix socket instead"
+    )
+    args = parser.parse_args()
+    with open(args.abi) as abi_file:
+        abi = json.load(abi_file)
+    if isinstance(abi, dict):
+        abi = abi["abi"]  # brownie build file
+    from web3 import Web3
+
+    contract_at = web3_contract_at(Web3(Web3.HTTPProvider(args.rpc)), abi)
+    serve(
+        VerificationService(Ped_scheme(), contract_at),
+        args.host,
+        args.port,
+        args.unix_socket,
+    )
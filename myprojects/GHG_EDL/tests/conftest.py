@@ -0,0 +1,24 @@
+#!/usr/bin/python3
+
+# The modules in scripts/ import each other as top-level modules (the scripts add the
+# scripts directory to sys.path), so the tests do the same.
+# The tests of the pure Python modules run with plain pytest. The tests that import
+# deploy.py need the loaded brownie project and are skipped without it, run them with
+# `brownie test`.
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"
+)
+sys.path.insert(0, SCRIPTS_DIR)
+
+from pedersen import Ped_scheme  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def p():
+    return Ped_scheme()
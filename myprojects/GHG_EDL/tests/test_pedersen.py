@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+import random
+
+from ec_arithmetic import (
+    N,
+    P,
+    batch_add_affine,
+    decompress,
+    fixed_base_batch_mul,
+    fixed_base_multi_mul,
+    jacobian_double,
+    to_affine,
+)
+from pedersen import Ped_scheme, accumulate_commitments
+
+
+def not_on_curve_x():
+    """Returns an x value with no point on secp256k1."""
+    x = 1
+    while True:
+        try:
+            decompress(x, 0)
+        except ValueError:
+            return x
+        x += 1
+
+
+def test_fixed_base_batch_mul_matches_multi_mul():
+    tables = Ped_scheme.fixed_base_tables()
+    rng = random.Random(1)
+    scalars = [(rng.randrange(N), rng.randrange(N)) for _ in range(50)]
+    scalars += [(0, 0), (1, 0), (0, 1), (N - 1, 1), (2**255, 2**8)]
+    expected = [to_affine(fixed_base_multi_mul(tables, pair)) for pair in scalars]
+    assert fixed_base_batch_mul(tables, scalars) == expected
+    assert expected[50] is None  # 0 * G + 0 * H
+
+
+def test_batch_add_affine_doubling_and_cancellation():
+    g = Ped_scheme.g
+    accs = [g, g, g]
+    h = (Ped_scheme.H_x, Ped_scheme.H_y)
+    batch_add_affine(accs, [(0, g), (1, (g[0], P - g[1])), (2, h)])
+    assert accs[0] == to_affine(jacobian_double((g[0], g[1], 1)))
+    assert accs[1] is None
+    assert accs[2] == to_affine(
+        fixed_base_multi_mul(Ped_scheme.fixed_base_tables(), (1, 1))
+    )
+
+
+def test_commit_many_matches_commitment_point(p):
+    values = [0, 1, 7, 10**9] + list(range(100, 140))
+    commitments = p.commit_many(values, rng=random.Random(2))
+    for value, (commitment, r) in zip(values, commitments):
+        assert commitment == p.compress_point(p.commitment_point(value, r))
+    assert all(
+        p.verify_many([c for c, _ in commitments], values, [r for _, r in commitments])
+    )
+
+
+def test_batch_verify_finds_invalid_openings(p):
+    values = list(range(1, 21))
+    openings = [
+        (commitment, value, r)
+        for value, (commitment, r) in zip(values, p.commit_many(values))
+    ]
+    assert p.batch_verify(openings)
+    assert p.find_invalid_openings(openings) == []
+
+    openings[3] = (openings[3][0], openings[3][1] + 1, openings[3][2])
+    openings[7] = (openings[7][0], openings[7][1], openings[7][2] + 1)
+    openings[12] = ((not_on_curve_x(), 0), openings[12][1], openings[12][2])
+    assert not p.batch_verify(openings)
+    assert p.find_invalid_openings(openings) == [3, 7, 12]
+
+
+def test_accumulated_commitments_open_to_the_sums(p):
+    values = [5, 11, 13]
+    commitments = p.commit_many(values)
+    total = accumulate_commitments(*[p.uncompress(c) for c, _ in commitments])
+    assert p.verify(total, sum(values), sum(r for _, r in commitments))
+    assert accumulate_commitments(0, 0) == 0
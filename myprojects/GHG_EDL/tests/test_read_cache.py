@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+import time
+
+import pytest
+
+from read_cache import ReadCache
+
+OWNER = "0x" + "11" * 20
+CONTRACT_OWNER = "0x" + "22" * 20
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+class FakeEth:
+    """The calls of web3.eth used by ReadCache, with nonces and code set by the tests."""
+
+    def __init__(self):
+        self.block_number = 10
+        self.nonces = {}
+        self.code = {}
+
+    def get_transaction_count(self, address, block_identifier):
+        return self.nonces.get(address, 0)
+
+    def get_code(self, address, block_identifier):
+        return self.code.get(address, b"")
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+
+class FakeProduct:
+    """A ProductGHGFootPrint contract that counts the total reads from the node."""
+
+    def __init__(self, address, owner):
+        self.address = address
+        self._owner = owner
+        self.total = [1, 2, True, 3, 0]
+        self.reads = 0
+
+    def owner(self):
+        return self._owner
+
+    def get_total_ghg(self, block_identifier=None):
+        self.reads += 1
+        return tuple(self.total)
+
+
+@pytest.fixture
+def web3():
+    return FakeWeb3()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "reads.sqlite")
+
+
+def reader(cache, product):
+    return cache.contract_at(lambda address: product)(product.address)
+
+
+def test_unchanged_owner_nonce_is_served_from_the_cache(web3, path):
+    product = FakeProduct("0x" + "aa" * 20, OWNER)
+    for _ in range(3):  # a new session each time, e.g. a repeated audit
+        cache = ReadCache(web3, path)
+        assert reader(cache, product).get_total_ghg() == [1, 2, True, 3, 0]
+        cache.close()
+    assert product.reads == 1
+    assert cache.cache_info()["hits"] == 1
+
+
+def test_owner_transaction_invalidates_the_cached_reads(web3, path):
+    product = FakeProduct("0x" + "aa" * 20, OWNER)
+    cache = ReadCache(web3, path)
+    reader(cache, product).get_total_ghg()
+    cache.close()
+
+    product.total[0] = 5
+    web3.eth.nonces[OWNER] = 1
+    cache = ReadCache(web3, path)
+    assert reader(cache, product).get_total_ghg()[0] == 5
+    assert product.reads == 2
+
+
+def test_contract_owner_is_never_cached(web3, path):
+    # a contract's nonce does not count the transactions it sends
+    web3.eth.code[CONTRACT_OWNER] = b"\x60\x80"
+    product = FakeProduct("0x" + "bb" * 20, CONTRACT_OWNER)
+    cache = ReadCache(web3, path)
+    for value in (1, 2):
+        product.total[0] = value
+        assert reader(cache, product).get_total_ghg()[0] == value
+    assert product.reads == 2
+    assert cache.cache_info()["hits"] == 0
+
+
+def test_contract_without_owner_is_never_cached(web3, path):
+    product = FakeProduct("0x" + "cc" * 20, ZERO_ADDRESS)
+    cache = ReadCache(web3, path)
+    reader(cache, product).get_total_ghg()
+    reader(cache, product).get_total_ghg()
+    assert product.reads == 2
+
+
+def test_refresh_sees_new_transactions(web3, path):
+    product = FakeProduct("0x" + "aa" * 20, OWNER)
+    cache = ReadCache(web3, path)
+    reader(cache, product).get_total_ghg()
+
+    product.total[0] = 5
+    web3.eth.nonces[OWNER] = 1
+    web3.eth.block_number = 11
+    # the session keeps the nonce of its block
+    assert reader(cache, product).get_total_ghg()[0] == 1
+    cache.refresh()
+    assert cache.block_number == 11
+    assert reader(cache, product).get_total_ghg()[0] == 5
+    assert product.reads == 2
+
+
+def test_max_age_refreshes_the_cache(web3, path):
+    product = FakeProduct("0x" + "aa" * 20, OWNER)
+    cache = ReadCache(web3, path, max_age=0.01)
+    reader(cache, product).get_total_ghg()
+
+    product.total[0] = 5
+    web3.eth.nonces[OWNER] = 1
+    time.sleep(0.02)
+    assert reader(cache, product).get_total_ghg()[0] == 5
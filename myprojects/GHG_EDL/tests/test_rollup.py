@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+import random
+
+import pytest
+
+from footprint_stream import commit_footprints
+from rollup import SupplyChainRollup, product_total
+from supply_chain_generator import generate_supply_chain
+
+# sum_up_footprints is the reference, it needs the loaded brownie project
+deploy = pytest.importorskip("deploy", reason="deploy.py needs the brownie project")
+
+
+@pytest.fixture
+def data(p):
+    """A committed synthetic supply chain in deploy.data, restored afterwards."""
+    saved = dict(deploy.data)
+    deploy.data.clear()
+    deploy.data.update(
+        generate_supply_chain(
+            companies=8, products_per_company=2, footprints_per_product=6, depth=3
+        )
+    )
+    for company, product in products(deploy.data):
+        commit_footprints(p, deploy.data[company][product]["GHG_Footprints"])
+    yield deploy.data
+    deploy.data.clear()
+    deploy.data.update(saved)
+
+
+def products(data):
+    return [
+        (company, product)
+        for company in data
+        for product in data[company]
+        if "Product" in product
+    ]
+
+
+def same_totals(p, totals, expected):
+    """Compares totals with points as commitments, 0 for an empty scope."""
+    if totals[:3] != expected[:3] or totals[6:] != expected[6:]:
+        return False
+    for commitment, expected_commitment in zip(totals[3:6], expected[3:6]):
+        if commitment == 0 or expected_commitment == 0:
+            if commitment != expected_commitment:
+                return False
+        elif p.compress_point(commitment) != p.compress_point(expected_commitment):
+            return False
+    return True
+
+
+def test_rollup_matches_sum_up_footprints(p, data):
+    rollup = SupplyChainRollup(p, data)
+    totals = rollup.rollup_all()
+    assert set(totals) == set(products(data))
+    for company, product in products(data):
+        expected = deploy.sum_up_footprints(p, data[company][product]["GHG_Footprints"])
+        assert same_totals(p, totals[(company, product)], expected)
+        value, commitment, r = product_total(p, totals[(company, product)])
+        assert p.verify(p.uncompress(commitment), value, r)
+
+
+def test_restated_footprint_updates_the_downstream_totals(p, data):
+    rollup = SupplyChainRollup(p, data)
+    rollup.rollup_all()
+    rng = random.Random(3)
+    for _ in range(5):
+        company, product = rng.choice(products(data))
+        footprint = rng.choice(
+            [
+                footprint
+                for footprint in data[company][product]["GHG_Footprints"]
+                if "GHGFootprint_linked_product" not in footprint
+            ]
+        )
+        changed = rollup.restate_footprint(
+            company, product, footprint["GHGFootPrint_ID"], rng.randint(1, 10**6)
+        )
+        assert (company, product) in changed
+        for key in products(data):
+            expected = deploy.sum_up_footprints(
+                p, data[key[0]][key[1]]["GHG_Footprints"]
+            )
+            assert same_totals(p, rollup.totals(*key), expected)
+            if key in changed:
+                assert same_totals(p, changed[key], expected)
+
+
+def test_update_of_a_linked_footprint_is_rejected(p, data):
+    rollup = SupplyChainRollup(p, data)
+    for company, product in products(data):
+        for footprint in data[company][product]["GHG_Footprints"]:
+            if "GHGFootprint_linked_product" in footprint:
+                with pytest.raises(ValueError):
+                    rollup.restate_footprint(
+                        company, product, footprint["GHGFootPrint_ID"], 1
+                    )
+                return
+    pytest.fail("The supply chain has no linked footprint")
@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+# The decoding of event logs and the contract handles go through the web3 API, so these
+# tests run against the web3 version pinned in requirements.txt without a node.
+
+import pytest
+from eth_abi import encode_abi
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+
+from event_indexer import EventIndexer
+from portfolio_verifier import web3_contract_at
+
+# event ABIs of ProductGHGFootPrintFactory.sol and ProductGHGFootPrint.sol
+PRODUCT_CREATED = {
+    "type": "event",
+    "name": "ProductCreated",
+    "anonymous": False,
+    "inputs": [
+        {"name": "owner", "type": "address", "indexed": True},
+        {"name": "product", "type": "address", "indexed": False},
+        {"name": "index", "type": "uint256", "indexed": False},
+    ],
+}
+DESCRIPTION_SET = {
+    "type": "event",
+    "name": "DescriptionSet",
+    "anonymous": False,
+    "inputs": [
+        {"name": "owner", "type": "address", "indexed": True},
+        {"name": "owner_name", "type": "string", "indexed": False},
+        {"name": "productID", "type": "string", "indexed": False},
+        {"name": "product_name", "type": "string", "indexed": False},
+        {"name": "status", "type": "string", "indexed": False},
+    ],
+}
+TOTAL_GHG_SET = {
+    "type": "event",
+    "name": "TotalGHGSet",
+    "anonymous": False,
+    "inputs": [
+        {"name": "total_GHGFootPrint", "type": "uint32", "indexed": False},
+        {"name": "commitment_x", "type": "uint256", "indexed": False},
+        {"name": "commitment_y_odd", "type": "bool", "indexed": False},
+        {"name": "r", "type": "uint256", "indexed": False},
+        {"name": "r_overflow", "type": "uint256", "indexed": False},
+    ],
+}
+OWNER_FUNCTION = {
+    "type": "function",
+    "name": "owner",
+    "stateMutability": "view",
+    "inputs": [],
+    "outputs": [{"name": "", "type": "address"}],
+}
+
+FACTORY = to_checksum_address("0x" + "fa" * 20)
+PRODUCT = to_checksum_address("0x" + "0b" * 20)
+OWNER = to_checksum_address("0x" + "11" * 20)
+
+
+def event_log(address, event_abi, indexed, values, log_index=0):
+    """Builds a log of an event as eth_getLogs returns it."""
+    inputs = [i for i in event_abi["inputs"] if not i["indexed"]]
+    return {
+        "address": address,
+        "blockNumber": 5,
+        "blockHash": HexBytes("0x" + "00" * 32),
+        "transactionHash": HexBytes("0x" + "00" * 32),
+        "transactionIndex": 0,
+        "logIndex": log_index,
+        "removed": False,
+        "topics": [HexBytes(event_abi_to_log_topic(event_abi))]
+        + [HexBytes(bytes(12) + bytes.fromhex(address[2:])) for address in indexed],
+        "data": HexBytes(encode_abi([i["type"] for i in inputs], values)),
+    }
+
+
+def test_event_indexer_decodes_logs(tmp_path):
+    indexer = EventIndexer(
+        Web3(),
+        [DESCRIPTION_SET, TOTAL_GHG_SET],
+        [PRODUCT_CREATED],
+        factories=[FACTORY],
+        path=str(tmp_path / "events.sqlite"),
+    )
+    logs = [
+        event_log(FACTORY, PRODUCT_CREATED, [OWNER], [PRODUCT, 0]),
+        event_log(
+            PRODUCT,
+            DESCRIPTION_SET,
+            [OWNER],
+            ["Company A", "P1", "Product1", "Active"],
+            1,
+        ),
+        event_log(PRODUCT, TOTAL_GHG_SET, [], [42, 7, True, 9, 0], 2),
+        # not created by the factory
+        event_log(OWNER, TOTAL_GHG_SET, [], [1, 1, False, 1, 0], 3),
+    ]
+    assert [indexer.index_log(log) for log in logs] == [1, 1, 1, 0]
+    assert indexer.products() == [PRODUCT]
+    assert indexer.connection.execute(
+        "SELECT total, commitment_x, commitment_y_odd, r FROM totals WHERE address = ?",
+        (PRODUCT,),
+    ).fetchall() == [(42, "7", 1, "9")]
+
+
+def test_web3_contract_at_checksums_the_address():
+    product = web3_contract_at(Web3(), [OWNER_FUNCTION])(PRODUCT.lower())
+    assert product.address == PRODUCT
+
+
+def test_product_created_events_of_the_factory_only(monkeypatch):
+    deploy = pytest.importorskip("deploy", reason="deploy.py needs the brownie project")
+
+    class Factory:
+        abi = [PRODUCT_CREATED]
+        address = FACTORY
+
+    monkeypatch.setattr(deploy, "ProductGHGFootPrintFactory", Factory)
+    monkeypatch.setattr(deploy, "web3", Web3())
+    receipt = {
+        "logs": [
+            event_log(FACTORY, PRODUCT_CREATED, [OWNER], [PRODUCT, 0]),
+            event_log(OWNER, PRODUCT_CREATED, [OWNER], [OWNER, 1], 1),
+            event_log(FACTORY, TOTAL_GHG_SET, [], [1, 1, False, 1, 0], 2),
+        ]
+    }
+    events = deploy.product_created_events(Factory, receipt)
+    assert [(e["owner"], e["product"], e["index"]) for e in events] == [
+        (OWNER, PRODUCT, 0)
+    ]
@@ -1,9 +1,13 @@
 #!/usr/bin/python3
 
 import ast
+import builtins
 import importlib
+import os
 import sys
+import time
 import warnings
+from contextlib import contextmanager
 from hashlib import sha1
 from importlib.machinery import SourceFileLoader
 from pathlib import Path, WindowsPath
@@ -14,7 +18,16 @@ from brownie.exceptions import ProjectNotFound
 from brownie.project.main import Project, check_for_project, get_loaded_projects
 from brownie.utils import color
 
-_import_cache: Dict = {}
+_import_cache: Dict = {}  # import path -> (module, file signature, project)
+_ast_hash_cache: Dict = {}  # script path -> (file signatures of the script and its imports, hash)
+_ast_dump_cache: Dict = {}  # file path -> (file signature, AST dump hash, imports)
+_load_times: Dict = {}  # breakdown of the last script load, see _print_load_times
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    # Modification time and size of a file, to detect a change without reading it
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
 
 
 def run(
@@ -24,14 +37,22 @@ def run(
     kwargs: Optional[Dict] = None,
     project: Any = None,
     _include_frame: bool = False,
+    reload: bool = False,
+    verbose: bool = False,
 ) -> Any:
     """Loads a project script and runs a method in it.
 
+    A script that is unchanged since an earlier run in the same process is not executed
+    again, so its module-level state (globals, a seeded `random`, ...) carries over from
+    the earlier runs.
+
     script_path: path of script to load
     method_name: name of method to run
     args: method args
     kwargs: method kwargs
     project: (deprecated)
+    reload: execute the script again even if it is unchanged, for a fresh module state
+    verbose: time the imports of the script and print where the load time went
 
     Returns: return value from called method
     """
@@ -40,7 +61,10 @@ def run(
     if kwargs is None:
         kwargs = {}
 
+    _load_times.clear()
+    start = time.perf_counter()
     script, project = _get_path(script_path)
+    _load_times["find"] = time.perf_counter() - start
 
     # temporarily add project objects to the main namespace, so the script can import them
     if project is not None:
@@ -57,7 +81,7 @@ def run(
     sys.path.insert(0, root_path)
 
     try:
-        module = _import_from_path(script)
+        module = _import_from_path(script, project, reload, verbose)
         name = module.__name__
 
         func = getattr(module, method_name, None)
@@ -71,6 +95,13 @@ def run(
             f"\nRunning '{color('bright blue')}{module_path}{color}::"
             f"{color('bright cyan')}{method_name}{color}'..."
         )
+        if verbose:
+            _print_load_times()
+        elif _load_times.get("cached"):
+            print(
+                f"{color('dark white')}Module unchanged since the last run, not executed again "
+                f"(run with reload=True for a fresh module state){color}"
+            )
 
         if not _include_frame:
             return func(*args, **kwargs)
@@ -155,34 +186,107 @@ def _get_path(path_str: str) -> Tuple[Path, Optional[Project]]:
     return path.resolve(), project
 
 
-def _import_from_path(path: Path) -> ModuleType:
-    # Imports a module from the given path
+def _import_from_path(
+    path: Path, project: Optional[Project] = None, reload: bool = False, timed: bool = False
+) -> ModuleType:
+    # Imports a module from the given path, executing it again only if the file changed,
+    # the script is run for a different project object or `reload` is set.
+    #
+    # An unchanged script is not executed again, so its module-level state persists
+    # between runs in the same process: globals changed by a run keep their values and
+    # module-level statements (e.g. seeding `random`) only take effect on the first run.
+    # `reload` executes it again in a new module object, as a fresh import does.
+    # The names a script imports from brownie are bound to the loaded project's objects,
+    # so the module is also executed again in a new module object when the project was
+    # closed and loaded again, or another project is active.
+    # With `timed` the imports the script executes are timed, see _timed_imports.
 
     import_str = "/" + "/".join(path.parts[1:-1] + (path.stem,)) + ".py"
 
-    if import_str in _import_cache:
-        importlib.reload(_import_cache[import_str])
+    start = time.perf_counter()
+    signature = _file_signature(import_str)
+    cached = _import_cache.get(import_str)
+    if cached is not None and (reload or cached[2] is not project):
+        cached = None
+    if cached is not None and cached[1] == signature:
+        _load_times["cached"] = True
     else:
         spec = importlib.util.spec_from_file_location("." + path.stem, import_str)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        _import_cache[import_str] = module
-    return _import_cache[import_str]
+        # a changed script is executed again in the same module object, as importlib.reload
+        module = importlib.util.module_from_spec(spec) if cached is None else cached[0]
+        if timed:
+            _load_times["imports"] = {}
+            with _timed_imports(spec.name, _load_times["imports"]):
+                spec.loader.exec_module(module)
+        else:
+            spec.loader.exec_module(module)
+        _import_cache[import_str] = (module, signature, project)
+    _load_times["import"] = time.perf_counter() - start
+    return _import_cache[import_str][0]
+
+
+@contextmanager
+def _timed_imports(module_name: str, times: Dict) -> Any:
+    # Adds up the time of each import statement executed by the module `module_name`.
+    # builtins.__import__ is replaced for the whole process while the module executes, so
+    # the imports of other threads also go through the wrapper - only used with verbose.
+    original_import = builtins.__import__
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):  # type: ignore
+        if globals is None or globals.get("__name__") != module_name:
+            return original_import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            times[name] = times.get(name, 0.0) + time.perf_counter() - start
+
+    builtins.__import__ = timed_import
+    try:
+        yield
+    finally:
+        builtins.__import__ = original_import
+
+
+def _print_load_times(slowest: int = 5) -> None:
+    # Prints where the time to load the script went: finding it, importing it (with its
+    # slowest imports) and hashing its AST
+    parts = [f"find {_load_times.get('find', 0.0):.3f}s"]
+    if "import" in _load_times:
+        cached = " (unchanged, not reloaded)" if _load_times.get("cached") else ""
+        parts.append(f"import {_load_times['import']:.3f}s{cached}")
+    if "ast_hash" in _load_times:
+        parts.append(f"AST hash {_load_times['ast_hash']:.3f}s")
+    total = sum(_load_times.get(i, 0.0) for i in ("find", "import", "ast_hash"))
+    print(f"Loaded in {total:.3f}s: " + ", ".join(parts))
+    imports = sorted(_load_times.get("imports", {}).items(), key=lambda i: -i[1])
+    if imports:
+        print(
+            "  slowest imports: "
+            + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in imports[:slowest])
+        )
 
 
 def _get_ast_hash(path: str) -> str:
-    # Generates a hash based on the AST of a script.
-    with Path(path).open() as fp:
-        ast_list = [ast.parse(fp.read(), path)]
+    # Generates a hash based on the AST of a script and its project-local imports.
+    # The hash is kept until the script or one of those imports changes.
+    start = time.perf_counter()
+    cached = _ast_hash_cache.get(path)
+    if cached is not None:
+        try:
+            unchanged = all(_file_signature(file) == sig for file, sig in cached[0])
+        except OSError:
+            unchanged = False
+        if unchanged:
+            _load_times["ast_hash"] = time.perf_counter() - start
+            return cached[1]
+
+    signature, digest, imports = _ast_dump(path)
+    signatures = [(path, signature)]
+    digests = [digest]
     base_path = str(check_for_project(path))
 
-    for obj in [
-        i for i in ast_list[0].body if isinstance(i, (ast.Import, ast.ImportFrom))
-    ]:
-        if isinstance(obj, ast.Import):
-            name = obj.names[0].name  # type: ignore
-        else:
-            name = obj.module  # type: ignore
+    for name in imports:
         try:
             origin = importlib.util.find_spec(name).origin  # type: ignore
         except Exception:
@@ -193,8 +297,31 @@ def _get_ast_hash(path: str) -> str:
             )
             continue
         if origin is not None and base_path in origin:
-            with open(origin) as fp:
-                ast_list.append(ast.parse(fp.read(), origin))
-
-    dump = "\n".join(ast.dump(i) for i in ast_list)
-    return sha1(dump.encode()).hexdigest()
+            signature, digest, _ = _ast_dump(origin)
+            signatures.append((origin, signature))
+            digests.append(digest)
+
+    # the AST dumps are hashed one file at a time, so a large data module is not kept in memory
+    ast_hash = sha1("\n".join(digests).encode()).hexdigest()
+    _ast_hash_cache[path] = (signatures, ast_hash)
+    _load_times["ast_hash"] = time.perf_counter() - start
+    return ast_hash
+
+
+def _ast_dump(path: str) -> Tuple[Tuple[int, int], str, List[str]]:
+    # Returns the file signature, hash of the AST dump and top level imported module names
+    # of a file, parsed again only if the file changed since the last call
+    signature = _file_signature(path)
+    cached = _ast_dump_cache.get(path)
+    if cached is None or cached[0] != signature:
+        with open(path) as fp:
+            tree = ast.parse(fp.read(), path)
+        imports = []
+        for obj in [i for i in tree.body if isinstance(i, (ast.Import, ast.ImportFrom))]:
+            if isinstance(obj, ast.Import):
+                imports.append(obj.names[0].name)  # type: ignore
+            else:
+                imports.append(obj.module)  # type: ignore
+        cached = (signature, sha1(ast.dump(tree).encode()).hexdigest(), imports)
+        _ast_dump_cache[path] = cached
+    return cached